@@ -0,0 +1,231 @@
+import os
+import glob
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute
+import pyarrow.parquet as pq
+
+from app.indice_ubicaciones import clave_celda, registrar_acceso, consultar_indice, desalojar
+
+DIRECTORIO_CLIMA = os.path.join("data", "clima")
+COLUMNA_TIEMPO = "time"
+FILAS_POR_GRUPO = 24 * 366  # Un año horario por row group para poder saltar años al filtrar
+MAXIMO_PARTES = 32  # Cantidad de archivos anexados antes de compactar la ubicación
+
+
+def clave_ubicacion(lat, lon):
+    """
+    Devuelve la clave de partición para una ubicación: la celda de la grilla
+    de OpenMeteo que la contiene, de modo que puntos cercanos compartan datos.
+    """
+    return clave_celda(lat, lon)
+
+
+def ruta_ubicacion(lat, lon, base=DIRECTORIO_CLIMA):
+    """
+    Devuelve el directorio de partición de una ubicación dentro del almacén.
+    """
+    return os.path.join(base, f"ubicacion={clave_ubicacion(lat, lon)}")
+
+
+def existe_clima(lat, lon, base=DIRECTORIO_CLIMA):
+    """
+    Indica si el almacén ya tiene datos para la ubicación.
+    """
+    return len(glob.glob(os.path.join(ruta_ubicacion(lat, lon, base), "*.parquet"))) > 0
+
+
+def _a_epoch(valor):
+    """
+    Convierte fechas (str, datetime o índice) a segundos UTC int64; las fechas sin zona se asumen UTC.
+    """
+    fechas = pd.DatetimeIndex(pd.to_datetime(np.atleast_1d(valor)))
+    if fechas.tz is not None:
+        fechas = fechas.tz_convert("UTC").tz_localize(None)
+    return fechas.as_unit("s").asi8.astype(np.int64)
+
+
+def _tabla_clima(datos):
+    """
+    Convierte datos climáticos en una tabla Arrow tipada.
+
+    Acepta un DataFrame con columna 'date' o datos columnares: un dict con
+    'time' (segundos UTC, int64) y un arreglo por variable. En el segundo
+    caso los arreglos float32 se envuelven sin copiarse.
+    """
+    if isinstance(datos, pd.DataFrame):
+        tiempo = _a_epoch(datos["date"])
+        variables = {variable: datos[variable].to_numpy(dtype=np.float32) for variable in datos.columns.drop("date")}
+    else:
+        tiempo = np.asarray(datos[COLUMNA_TIEMPO], dtype=np.int64)
+        variables = {variable: np.asarray(valores, dtype=np.float32) for variable, valores in datos.items()
+                     if variable != COLUMNA_TIEMPO}
+
+    columnas = {COLUMNA_TIEMPO: pa.array(tiempo, type=pa.int64())}
+    for variable, valores in variables.items():
+        columnas[variable] = pa.array(valores, type=pa.float32())
+    return pa.table(columnas)
+
+
+def _partes(directorio):
+    return sorted(glob.glob(os.path.join(directorio, "part-*.parquet")))
+
+
+def guardar_clima(lat, lon, datos, base=DIRECTORIO_CLIMA):
+    """
+    Guarda datos climáticos horarios en el almacén Parquet de la ubicación.
+
+    Las fechas se guardan como segundos UTC (int64) en la columna `time` y
+    las variables como float32.
+
+    Parámetros:
+        lat (float): Latitud.
+        lon (float): Longitud.
+        datos (pd.DataFrame o dict): Datos con columna 'date', o columnares con 'time' (ver `_tabla_clima`).
+        base (str): Directorio raíz del almacén.
+
+    Retorna:
+        str: Ruta del archivo Parquet escrito.
+    """
+    tabla = _tabla_clima(datos)
+
+    directorio = ruta_ubicacion(lat, lon, base)
+    os.makedirs(directorio, exist_ok=True)
+    for parte in _partes(directorio):
+        os.remove(parte)
+    archivo = os.path.join(directorio, "part-00000.parquet")
+    pq.write_table(tabla, archivo, row_group_size=FILAS_POR_GRUPO)
+
+    ultimo = pa.compute.max(tabla[COLUMNA_TIEMPO]).as_py()
+    registrar_acceso(base, clave_ubicacion(lat, lon), directorio, ultimo_tiempo=ultimo)
+    desalojar(base)
+    return archivo
+
+
+def ultimo_tiempo(lat, lon, base=DIRECTORIO_CLIMA):
+    """
+    Devuelve el último instante guardado para la ubicación (segundos UTC), o None.
+
+    Se toma del índice; si la ubicación no está registrada se lee de las
+    estadísticas de los archivos Parquet, sin leer los datos.
+    """
+    entrada = consultar_indice(base, clave_ubicacion(lat, lon))
+    if entrada is not None and "ultimo_tiempo" in entrada:
+        return entrada["ultimo_tiempo"]
+
+    ultimo = None
+    for parte in _partes(ruta_ubicacion(lat, lon, base)):
+        metadatos = pq.ParquetFile(parte).metadata
+        indice_columna = metadatos.schema.names.index(COLUMNA_TIEMPO)
+        for grupo in range(metadatos.num_row_groups):
+            estadisticas = metadatos.row_group(grupo).column(indice_columna).statistics
+            if estadisticas is not None and estadisticas.has_min_max:
+                ultimo = estadisticas.max if ultimo is None else max(ultimo, estadisticas.max)
+    return ultimo
+
+
+def anexar_clima(lat, lon, datos, base=DIRECTORIO_CLIMA):
+    """
+    Agrega al almacén solo las filas posteriores al último instante guardado.
+
+    Cada actualización se escribe como un archivo Parquet nuevo dentro de la
+    partición (sin reescribir lo existente); cuando hay más de MAXIMO_PARTES
+    archivos, la ubicación se compacta en uno solo.
+
+    Parámetros:
+        lat (float): Latitud.
+        lon (float): Longitud.
+        datos (pd.DataFrame o dict): Datos nuevos con columna 'date', o columnares con 'time'.
+        base (str): Directorio raíz del almacén.
+
+    Retorna:
+        int: Cantidad de filas agregadas.
+    """
+    ultimo = ultimo_tiempo(lat, lon, base)
+    if ultimo is None:
+        guardar_clima(lat, lon, datos, base)
+        return len(datos) if isinstance(datos, pd.DataFrame) else len(datos[COLUMNA_TIEMPO])
+
+    tabla = _tabla_clima(datos)
+    tabla = tabla.filter(pa.compute.greater(tabla[COLUMNA_TIEMPO], ultimo))
+    if tabla.num_rows == 0:
+        return 0
+
+    directorio = ruta_ubicacion(lat, lon, base)
+    partes = _partes(directorio)
+    siguiente = int(os.path.basename(partes[-1])[5:10]) + 1 if partes else 0
+    pq.write_table(tabla, os.path.join(directorio, f"part-{siguiente:05d}.parquet"),
+                   row_group_size=FILAS_POR_GRUPO)
+
+    if len(partes) + 1 > MAXIMO_PARTES:
+        compactar_clima(lat, lon, base)
+
+    nuevo_ultimo = pa.compute.max(tabla[COLUMNA_TIEMPO]).as_py()
+    registrar_acceso(base, clave_ubicacion(lat, lon), directorio, ultimo_tiempo=nuevo_ultimo)
+    return tabla.num_rows
+
+
+def compactar_clima(lat, lon, base=DIRECTORIO_CLIMA):
+    """
+    Reescribe todos los archivos de una ubicación en uno solo, ordenado por tiempo.
+    """
+    directorio = ruta_ubicacion(lat, lon, base)
+    partes = _partes(directorio)
+    tabla = pq.read_table(directorio).sort_by(COLUMNA_TIEMPO)
+    temporal = os.path.join(directorio, ".compactado.tmp")  # Oculto: pyarrow lo ignora al leer
+    pq.write_table(tabla, temporal, row_group_size=FILAS_POR_GRUPO)
+    for parte in partes:
+        os.remove(parte)
+    os.replace(temporal, os.path.join(directorio, "part-00000.parquet"))
+
+
+def cargar_clima(lat, lon, variables=None, desde=None, hasta=None, como_dataframe=True, base=DIRECTORIO_CLIMA):
+    """
+    Carga del almacén solo las variables y el rango de fechas pedidos.
+
+    Parámetros:
+        lat (float): Latitud.
+        lon (float): Longitud.
+        variables (list, opcional): Variables a leer (por defecto todas).
+        desde (str o datetime, opcional): Fecha inicial inclusiva (UTC).
+        hasta (str o datetime, opcional): Fecha final exclusiva (UTC).
+        como_dataframe (bool): Si es False devuelve la tabla Arrow sin convertir.
+        base (str): Directorio raíz del almacén.
+
+    Retorna:
+        pd.DataFrame o pa.Table: Datos con columna 'date' (UTC) y las variables pedidas,
+        o None si la ubicación no está en el almacén.
+    """
+    if not existe_clima(lat, lon, base):
+        return None
+
+    columnas = None if variables is None else [COLUMNA_TIEMPO] + list(variables)
+    filtros = []
+    if desde is not None:
+        filtros.append((COLUMNA_TIEMPO, ">=", int(_a_epoch(desde)[0])))
+    if hasta is not None:
+        filtros.append((COLUMNA_TIEMPO, "<", int(_a_epoch(hasta)[0])))
+
+    directorio = ruta_ubicacion(lat, lon, base)
+    tabla = pq.read_table(directorio, columns=columnas, filters=filtros or None)
+    registrar_acceso(base, clave_ubicacion(lat, lon), directorio)
+    tabla = tabla.sort_by(COLUMNA_TIEMPO)
+    if not como_dataframe:
+        return tabla
+
+    df = tabla.to_pandas()
+    df.insert(0, "date", pd.to_datetime(df.pop(COLUMNA_TIEMPO), unit="s", utc=True))
+    return df
+
+
+def exportar_csv(lat, lon, filename, base=DIRECTORIO_CLIMA):
+    """
+    Exporta los datos de una ubicación a CSV (formato que lee la API de R).
+    """
+    df = cargar_clima(lat, lon, base=base)
+    if df is None:
+        return None
+    os.makedirs(os.path.dirname(filename) or ".", exist_ok=True)
+    df.to_csv(filename, index=False)
+    return filename
@@ -0,0 +1,149 @@
+import os
+import json
+import numpy as np
+import pandas as pd
+from numpy.lib.format import open_memmap
+
+ARCHIVO_VALORES = "valores.npy"
+ARCHIVO_FECHAS = "fechas.npy"
+ARCHIVO_META = "meta.json"
+
+
+def _fechas_a_epoch(fechas):
+    """
+    Convierte un índice de fechas a segundos UTC desde 1970-01-01 (int64).
+    """
+    fechas = pd.DatetimeIndex(fechas)
+    if fechas.tz is not None:
+        fechas = fechas.tz_convert("UTC").tz_localize(None)
+    return fechas.as_unit("s").asi8.astype(np.int64)
+
+
+def crear_almacen(ruta, fechas, nsim, variable="value", dtype=np.float32):
+    """
+    Crea un almacén de simulaciones vacío y lo devuelve mapeado en memoria.
+
+    El almacén es un directorio con:
+        - valores.npy: matriz densa (escenario × paso de tiempo).
+        - fechas.npy: índice temporal compartido en segundos UTC (int64).
+        - meta.json: dimensiones y nombre de la variable.
+
+    Parámetros:
+        ruta (str): Directorio del almacén.
+        fechas (array-like): Fechas de la simulación (una por columna).
+        nsim (int): Número de escenarios (filas).
+        variable (str): Nombre de la variable simulada.
+        dtype: Tipo de dato de los valores (por defecto float32).
+
+    Retorna:
+        np.memmap: Matriz (nsim, len(fechas)) lista para escribir.
+    """
+    os.makedirs(ruta, exist_ok=True)
+    epoch = _fechas_a_epoch(fechas)
+    np.save(os.path.join(ruta, ARCHIVO_FECHAS), epoch)
+
+    meta = {"nsim": int(nsim), "pasos": int(len(epoch)), "variable": variable, "dtype": np.dtype(dtype).str}
+    with open(os.path.join(ruta, ARCHIVO_META), "w") as f:
+        json.dump(meta, f)
+
+    return open_memmap(os.path.join(ruta, ARCHIVO_VALORES), mode="w+", dtype=dtype, shape=(nsim, len(epoch)))
+
+
+def guardar_simulaciones(ruta, valores, fechas, variable="value"):
+    """
+    Guarda una matriz de escenarios (nsim, pasos) en un almacén de simulaciones.
+
+    Parámetros:
+        ruta (str): Directorio del almacén.
+        valores (np.ndarray): Matriz de valores simulados.
+        fechas (array-like): Fechas compartidas por todos los escenarios.
+        variable (str): Nombre de la variable simulada.
+
+    Retorna:
+        str: Ruta del almacén.
+    """
+    valores = np.asarray(valores)
+    if valores.ndim != 2 or valores.shape[1] != len(fechas):
+        raise ValueError("La matriz de valores debe tener forma (nsim, len(fechas)).")
+
+    destino = crear_almacen(ruta, fechas, valores.shape[0], variable=variable)
+    destino[:] = valores
+    destino.flush()
+    del destino
+    return ruta
+
+
+def abrir_simulaciones(ruta, modo="r"):
+    """
+    Abre un almacén de simulaciones sin cargarlo en memoria.
+
+    Parámetros:
+        ruta (str): Directorio del almacén.
+        modo (str): Modo del mapeo en memoria ("r" o "r+").
+
+    Retorna:
+        tuple: (np.memmap de forma (nsim, pasos), pd.DatetimeIndex con las fechas).
+    """
+    valores = np.load(os.path.join(ruta, ARCHIVO_VALORES), mmap_mode=modo)
+    epoch = np.load(os.path.join(ruta, ARCHIVO_FECHAS))
+    return valores, pd.to_datetime(epoch, unit="s")
+
+
+def leer_escenario(ruta, escenario):
+    """
+    Lee un único escenario del almacén.
+
+    Parámetros:
+        ruta (str): Directorio del almacén.
+        escenario (int): Índice del escenario (fila).
+
+    Retorna:
+        pd.Series: Valores del escenario indexados por fecha.
+    """
+    valores, fechas = abrir_simulaciones(ruta)
+    return pd.Series(np.array(valores[escenario]), index=fechas, name=escenario)
+
+
+def leer_anio(ruta, anio, escenarios=None):
+    """
+    Lee todos (o algunos) escenarios para un año concreto.
+
+    Parámetros:
+        ruta (str): Directorio del almacén.
+        anio (int): Año a leer.
+        escenarios (slice o array-like, opcional): Filas a leer (por defecto todas).
+
+    Retorna:
+        tuple: (np.ndarray de forma (escenarios, pasos del año), pd.DatetimeIndex del año).
+    """
+    valores, fechas = abrir_simulaciones(ruta)
+    columnas = np.flatnonzero(fechas.year == anio)
+    if len(columnas) == 0:
+        raise ValueError(f"El año {anio} no está en el almacén {ruta}.")
+
+    filas = slice(None) if escenarios is None else escenarios
+    return np.array(valores[filas, columnas[0]:columnas[-1] + 1]), fechas[columnas[0]:columnas[-1] + 1]
+
+
+def sumar_por_anio(ruta, factor=1.0, bloque=256):
+    """
+    Agrega cada escenario por año sin cargar el almacén completo.
+
+    Parámetros:
+        ruta (str): Directorio del almacén.
+        factor (float): Factor multiplicativo aplicado a la suma (por ejemplo, conversión a energía).
+        bloque (int): Cantidad de escenarios procesados por iteración.
+
+    Retorna:
+        tuple: (np.ndarray con los años, np.ndarray (nsim, años) con las sumas anuales).
+    """
+    valores, fechas = abrir_simulaciones(ruta)
+    anios = np.asarray(fechas.year)
+    cortes = np.concatenate(([0], np.flatnonzero(np.diff(anios)) + 1))
+
+    resultado = np.empty((valores.shape[0], len(cortes)))
+    for inicio in range(0, valores.shape[0], bloque):
+        filas = np.asarray(valores[inicio:inicio + bloque], dtype=np.float64)
+        resultado[inicio:inicio + bloque] = np.add.reduceat(filas, cortes, axis=1) * factor
+
+    return anios[cortes], resultado
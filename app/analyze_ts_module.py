@@ -34,7 +34,9 @@ def fitactf(actpnts, discrete=False):
     bounds = ([0.001, 0], [np.inf, np.inf])
 
     # Ajuste de la función actf a los puntos de autocorrelación
-    params, _ = curve_fit(actf, rhox, rhoz, p0=initial_params, bounds=bounds)
+    params, _ = curve_fit(actf, rhox, rhoz, p0=initial_params, bounds=bounds, max_nfev=20000)
+
+    return {"actfcoef": {"b": float(params[0]), "c": float(params[1])}, "actfpoints": actpnts}
 
 
 def analyze_ts(TS, season='month', dist='gamma', acsID='weibull', n_points=30, lag_max=30):
@@ -76,9 +78,6 @@ def analyze_ts(TS, season='month', dist='gamma', acsID='weibull', n_points=30, l
     }
 
 
-import matplotlib.pyplot as plt
-
-
 def report_ts(analyzed_ts, method='dist'):
     """
     Genera reportes de la serie analizada.
@@ -90,6 +89,7 @@ def report_ts(analyzed_ts, method='dist'):
     Retorna:
     - Gráficos o tablas según lo seleccionado.
     """
+    import matplotlib.pyplot as plt  # Solo para uso interactivo; el servidor no carga pyplot
 
     if method == 'stat':
         print("Estadísticas Descriptivas:\n", analyzed_ts["data"].describe())
@@ -143,10 +143,12 @@ def report_ts(analyzed_ts, method='dist'):
 #     return pd.DataFrame({'date': simulated_dates, 'value': simulated_values})
 #
 
+import threading
 import numpy as np
 import pandas as pd
-from scipy.special import erfcinv
-from scipy.integrate import quad
+from collections import OrderedDict
+from scipy.special import ndtr, ndtri
+import scipy.stats
 
 
 def moments(dist, distarg, raw=False, central=True, coef=False, distbounds=(-np.inf, np.inf), p0=0, order=[1, 2]):
@@ -184,65 +186,180 @@ def actf(rhox, b, c):
     rhoz = ((1 + b * rhox) ** (1 - c) - 1) / ((1 + b) ** (1 - c) - 1)
     return rhoz
 
+# Valores de rhoz en los que se evalúa la transformación de autocorrelación
+RHOZ_ACTF = np.concatenate((np.arange(0.1, 1.0, 0.1), [0.95]))
+
+# Nodos de la cuadratura de Gauss-Legendre por dimensión y límite de integración en z
+NODOS_ACTF = 128
+LIMITE_Z = 7.5
+_nodos_gl, _pesos_gl = np.polynomial.legendre.leggauss(NODOS_ACTF)
+
+
+def _cuantil_marginal(margdist, margarg, p0, z):
+    """
+    Transforma valores Gaussianos z en la marginal con probabilidad de cero p0:
+    x = F⁻¹((Φ(z) - p0) / (1 - p0)) si Φ(z) > p0, y 0 en otro caso.
+
+    Para "norm" acepta los parámetros del modelo ('mean', 'sd'); para el resto
+    de las distribuciones de scipy.stats, sus argumentos con nombre. Los
+    parámetros y p0 pueden ser arreglos que se difunden contra z.
+    """
+    u = (ndtr(z) - p0) / (1 - p0)
+    u_valido = np.clip(u, 1e-12, 1 - 1e-12)
+    if margdist == "norm" and "mean" in margarg:
+        x = norm.ppf(u_valido, loc=margarg["mean"], scale=margarg["sd"])
+    else:
+        x = getattr(scipy.stats, margdist).ppf(u_valido, **margarg)
+    return np.where(u > 0, x, 0.0)
+
+
+def actpnts_lote(marginales, rhoz=RHOZ_ACTF):
+    """
+    Calcula los puntos de la transformación de autocorrelación de varias
+    marginales a la vez.
+
+    Cada E[X1·X2] es la integral doble de x(z1)·x(z2) contra la densidad
+    normal bivariada con correlación rhoz, sobre [Φ⁻¹(p0), LIMITE_Z]² (fuera
+    de ese dominio x = 0), con una grilla producto de Gauss-Legendre: los
+    cuantiles se evalúan una vez por nodo y la integral de todos los rhoz y
+    todas las marginales es una sola contracción de tensores. La media y la varianza usan los mismos nodos.
+
+    Parámetros:
+        marginales (list): Tuplas (margdist, margarg, p0).
+        rhoz (array): Correlaciones Gaussianas a evaluar.
+
+    Retorna:
+        np.ndarray: Matriz (marginales, rhoz) con los valores de rhox.
+    """
+    rhoz = np.asarray(rhoz, dtype=float)[None, :, None, None]
+    p0 = np.array([m[2] for m in marginales], dtype=float)
+
+    # Nodos y pesos de cada marginal en [Φ⁻¹(p0), LIMITE_Z]
+    inferior = np.where(p0 > 0, ndtri(np.clip(p0, 1e-300, 1)), -LIMITE_Z)[:, None]
+    mitad = (LIMITE_Z - inferior) / 2
+    z = inferior + mitad * (_nodos_gl + 1)
+    pesos = mitad * _pesos_gl
+
+    # Cuantiles en los nodos; las marginales de una misma familia se evalúan juntas
+    q = np.empty_like(z)
+    familias = {}
+    for i, (margdist, margarg, _) in enumerate(marginales):
+        familias.setdefault((margdist, tuple(sorted(margarg))), []).append(i)
+    for (margdist, nombres), indices in familias.items():
+        args = {k: np.array([marginales[i][1][k] for i in indices], dtype=float)[:, None] for k in nombres}
+        q[indices] = _cuantil_marginal(margdist, args, p0[indices, None], z[indices])
+
+    qw = q * pesos * norm.pdf(z)
+    mu1 = qw.sum(axis=1)
+    mu2 = (qw * q).sum(axis=1)
+
+    # Densidad condicional φ((z2 - rhoz·z1) / √(1 - rhoz²)) / √(1 - rhoz²)
+    escala = np.sqrt(1 - rhoz ** 2)
+    condicional = norm.pdf((z[:, None, None, :] - rhoz * z[:, None, :, None]) / escala) / escala
+    cruzado = np.einsum("mi,mrij,mj->mr", qw, condicional, q * pesos)
+    return (cruzado - mu1[:, None] ** 2) / (mu2 - mu1 ** 2)[:, None]
+
+
 def actpnts(margdist, margarg, p0=0, distbounds=(-np.inf, np.inf)):
     """
     Calcula puntos de correlación activa según la distribución marginal.
 
     Parámetros:
-        margdist (str): Tipo de distribución ("beta", "normal", etc.).
+        margdist (str): Tipo de distribución ("beta", "norm", etc.).
         margarg (dict): Parámetros de la distribución.
         p0 (float): Probabilidad de cero.
-        distbounds (tuple): Límites de la distribución.
+        distbounds (tuple): Límites de la distribución (no usados por la cuadratura).
 
     Retorna:
         pd.DataFrame: DataFrame con valores de rhoz y rhox.
     """
+    return pd.DataFrame({"rhoz": RHOZ_ACTF, "rhox": actpnts_lote([(margdist, margarg, p0)])[0]})
 
-    # Definir la tabla de rhoz inicial
-    rho = pd.DataFrame({
-        "rhoz": np.concatenate((np.arange(0.1, 1.0, 0.1), [0.95])),
-        "rhox": np.zeros(10)
-    })
 
-    # Determinar límites de integración
-    _min = -7.5 if p0 == 0 else -np.sqrt(2) * erfcinv(2 * p0)
-    _max = 7.5
+def _clave_marginal(margdist, margarg, p0):
+    return margdist, tuple(sorted((k, float(v)) for k, v in margarg.items())), float(p0)
 
-    # Obtener momentos estadísticos de la distribución
-    m = moments(dist=margdist, distarg=margarg, raw=False, central=True, coef=False, distbounds=distbounds, p0=p0,
-                order=[1, 2])
 
-    # Calcular rhox
-    for i in range(len(rho)):
-        rhoz_value = rho.loc[i, "rhoz"]
+MAXIMO_COEFICIENTES = 4096  # Marginales memorizadas (las menos usadas recientemente se descartan)
+_coeficientes_memoria = OrderedDict()
+_bloqueo_coeficientes = threading.Lock()
 
-        def inner_integral(y):
-            return quad(lambda x: acti(x, y, rhoz_value, p0, margdist, margarg), _min, _max, limit=10000, epsrel=1e-5)[
-                0]
 
-        temp = quad(lambda y: inner_integral(y), _min, _max, limit=10000, epsrel=1e-5)[0]
+def coeficientes_actf_lote(marginales):
+    """
+    Devuelve los coeficientes (b, c) de la transformación de autocorrelación
+    de cada marginal.
 
-        # Calcular rhox
-        rho.loc[i, "rhox"] = (temp - m[0]["mu1"] ** 2) / m[0]["mu2"]
+    Los coeficientes se memorizan por los parámetros de la marginal (hasta
+    MAXIMO_COEFICIENTES, compartidos entre hilos); las que no están en
+    memoria se calculan juntas con `actpnts_lote`, fuera del lock, y se
+    ajustan con `fitactf`.
 
-    return rho
+    Parámetros:
+        marginales (list): Tuplas (margdist, margarg, p0).
+
+    Retorna:
+        list: Diccionarios {"b", "c"} en el mismo orden.
+    """
+    claves = [_clave_marginal(*m) for m in marginales]
+    coeficientes = {}
+    with _bloqueo_coeficientes:
+        for clave in dict.fromkeys(claves):
+            if clave in _coeficientes_memoria:
+                _coeficientes_memoria.move_to_end(clave)
+                coeficientes[clave] = _coeficientes_memoria[clave]
+
+    faltantes = [c for c in dict.fromkeys(claves) if c not in coeficientes]
+    if faltantes:
+        rhox = actpnts_lote([(d, dict(a), p0) for d, a, p0 in faltantes])
+        for clave, fila in zip(faltantes, rhox):
+            puntos = pd.DataFrame({"rhoz": RHOZ_ACTF, "rhox": fila})
+            coeficientes[clave] = fitactf(puntos)["actfcoef"]
+        with _bloqueo_coeficientes:
+            for clave in faltantes:
+                _coeficientes_memoria[clave] = coeficientes[clave]
+                _coeficientes_memoria.move_to_end(clave)
+            while len(_coeficientes_memoria) > MAXIMO_COEFICIENTES:
+                _coeficientes_memoria.popitem(last=False)
+    return [coeficientes[c] for c in claves]
 
 
 import numpy as np
 import pandas as pd
+from scipy.linalg import hankel, toeplitz
+from scipy.signal import lfilter
 
 
 def YW(acs_values):
     """
     Función auxiliar que representa el Yule-Walker para estimar coeficientes AR.
+
+    Resuelve el sistema toeplitz(acs[0:p]) · alpha = acs[1:p+1], igual que
+    `CoSMoS:::YW`, donde `acs_values` incluye el lag 0.
     """
+    acs_values = np.asarray(acs_values, dtype=float)
     p = len(acs_values) - 1
-    r = np.array(acs_values[1:])
-    R = np.array([acs_values[:p]]).T
+    R = toeplitz(acs_values[:p])
+    r = acs_values[1:p + 1]
     alpha = np.linalg.pinv(R) @ r  # Pseudoinversa para evitar singularidad
     return alpha.flatten()
 
 
+def acffgn(t, H, **kwargs):
+    """
+    Estructura de autocorrelación del ruido Gaussiano fraccional (fGn).
+
+    Parámetros:
+        t (array-like): Lags.
+        H (float): Coeficiente de Hurst (0 < H < 1).
+
+    Retorna:
+        np.ndarray: Autocorrelación para cada lag.
+    """
+    t = np.abs(np.asarray(t, dtype=float))
+    return 0.5 * (np.abs(t - 1) ** (2 * H) - 2 * t ** (2 * H) + (t + 1) ** (2 * H))
+
+
 def acs(id, **kwargs):
     """
     Llama dinámicamente a una función 'acf' específica basada en el ID.
@@ -269,60 +386,119 @@ def AR1(p, acs):
     return np.random.normal(0, np.sqrt(1 - np.sum(acs[1:p + 1] * acs[1:p + 1])), p)
 
 
-def seasonal_ar(x, ACS, season="month"):
+def AR1_batch(nsim, p, rho, rng=None):
     """
-    Simula una serie temporal con autocorrelación estacional.
+    Genera `nsim` series AR(1) de largo `p` con correlación de lag 1 `rho`.
+
+    Se usa para inicializar la recursión estacional, como `AR1` en CoSMoS.
 
     Parámetros:
-        x (pd.Series o array-like): Fechas de la serie temporal.
-        ACS (dict): Estructura de autocorrelación para cada temporada.
-        season (str, opcional): Tipo de estacionalidad (por defecto "month").
+        nsim (int): Número de realizaciones.
+        p (int): Largo de cada serie.
+        rho (float): Autocorrelación de lag 1.
+        rng (np.random.Generator, int o None): Generador o semilla.
 
     Retorna:
-        pd.DataFrame: DataFrame con fechas, valores Gaussianos generados y su temporada.
+        np.ndarray: Matriz (nsim, p) de valores Gaussianos estándar.
     """
+    rng = np.random.default_rng(rng)
+    e = rng.standard_normal((nsim, p))
+    e[:, 1:] *= np.sqrt(1 - rho ** 2)
+    return lfilter([1.0], [1.0, -rho], e, axis=1)
 
-    # Crear DataFrame con fechas y estacionalidad
-    time = pd.DataFrame({"time": x})
-    time["year"] = time["time"].dt.year
-    time["season"] = time["time"].dt.month if season == "month" else time["time"].dt.day
-    time["n"] = time.groupby(["year", "season"])["time"].transform("count")
 
-    # Convertir estructura de autocorrelación
-    alpha = {key: YW(value) for key, value in ACS.items()}
+def _season_numbers(ACS, season="month"):
+    """
+    Mapea cada número de temporada a su clave en ACS.
 
-    # Obtener primera simulación
-    first_season = time["season"].iloc[0]
-    season_key = [key for key in ACS.keys() if key.endswith(str(first_season))][0]
-    out_values = pd.DataFrame({"value": AR1(len(alpha[season_key]), ACS[season_key][1])})
-    out_values["id"] = 0
+    Acepta claves enteras (1..12) o con prefijo (por ejemplo "month1").
+    """
+    keys = {}
+    for key in ACS:
+        if isinstance(key, (int, np.integer)):
+            keys[int(key)] = key
+        else:
+            keys[int(str(key).split(season)[-1])] = key
+    return keys
 
-    esd = [np.sqrt(1 - np.sum(alpha[key] * ACS[key][1:])) for key in alpha]
 
-    # Simulación de la serie estacional
-    for season_value in time["season"].unique():
-        if season_value not in [int(key.split(season)[-1]) for key in ACS.keys()]:
-            continue
+def seasonal_ar_batch(x, ACS, nsim, season="month", rng=None):
+    """
+    Simula `nsim` series Gaussianas con autocorrelación estacional en un solo paso.
 
-        season_key = [key for key in ACS.keys() if key.endswith(str(season_value))][0]
-        p = len(alpha[season_key])
-        val = out_values["value"].iloc[-p:].to_numpy()
-        aux = len(val)
-        n = time[time["season"] == season_value]["n"].iloc[0]
-        gn = np.random.normal(0, esd[season_value - 1], n + p)
+    La recursión AR de cada bloque (año, temporada) se aplica a todas las
+    realizaciones a la vez con `scipy.signal.lfilter` sobre el eje de tiempo,
+    encadenando el estado con los últimos `p` valores del bloque anterior.
+    Los valores se escriben en un buffer preasignado.
 
-        a_rev = alpha[season_key][::-1]
-        for i in range(p, n + p):
-            val = np.append(val, np.sum(val[i - p:i] * a_rev) + gn[i])
+    Parámetros:
+        x (pd.Series, pd.DatetimeIndex o array-like): Fechas de la serie temporal.
+        ACS (dict): Estructura de autocorrelación (incluyendo lag 0) para cada temporada.
+        nsim (int): Número de realizaciones.
+        season (str, opcional): Tipo de estacionalidad (por defecto "month").
+        rng (np.random.Generator, int o None): Generador o semilla.
 
-        new_data = pd.DataFrame({"value": val[p:], "id": season_value})
-        out_values = pd.concat([out_values, new_data], ignore_index=True)
+    Retorna:
+        np.ndarray: Matriz (nsim, len(x)) con los valores Gaussianos simulados.
+    """
+    rng = np.random.default_rng(rng)
+    dates = pd.DatetimeIndex(x)
+    seasons = np.asarray(dates.month if season == "month" else dates.day)
+    keys = _season_numbers(ACS, season)
+
+    # Coeficientes AR, desvío de la innovación y matriz de estado por temporada
+    alpha, esd, state = {}, {}, {}
+    for s, key in keys.items():
+        acs_values = np.asarray(ACS[key], dtype=float)
+        alpha[s] = YW(acs_values)
+        esd[s] = np.sqrt(max(1 - np.sum(alpha[s] * acs_values[1:len(alpha[s]) + 1]), 0))
+        state[s] = hankel(alpha[s])
+
+    n = len(dates)
+    p = max(len(a) for a in alpha.values())
+    out = np.empty((nsim, p + n))
+
+    # Valores iniciales
+    out[:, :p] = AR1_batch(nsim, p, np.asarray(ACS[keys[seasons[0]]], dtype=float)[1], rng)
+
+    # Bloques contiguos de (año, temporada)
+    codes = np.asarray(dates.year) * 100 + seasons
+    cuts = np.concatenate(([0], np.flatnonzero(np.diff(codes)) + 1, [n]))
+
+    for start, end in zip(cuts[:-1], cuts[1:]):
+        s = seasons[start]
+        if s not in alpha:
+            raise ValueError(f"No hay estructura de autocorrelación para la temporada {s}.")
+        a = alpha[s]
+        q = len(a)
+        # Estado inicial del filtro a partir de los últimos q valores (más reciente primero)
+        previous = out[:, p + start - q:p + start][:, ::-1]
+        zi = previous @ state[s]
+        gn = rng.normal(0, esd[s], (nsim, end - start))
+        out[:, p + start:p + end], _ = lfilter([1.0], np.concatenate(([1.0], -a)), gn, axis=1, zi=zi)
+
+    return out[:, p:]
+
+
+def seasonal_ar(x, ACS, season="month"):
+    """
+    Simula una serie temporal con autocorrelación estacional.
 
-    # Construir el DataFrame final
-    out_values = out_values[out_values["id"] != 0]
-    result = pd.DataFrame({"date": x, "gauss": out_values["value"], "season": out_values["id"]})
+    Parámetros:
+        x (pd.Series o array-like): Fechas de la serie temporal.
+        ACS (dict): Estructura de autocorrelación para cada temporada.
+        season (str, opcional): Tipo de estacionalidad (por defecto "month").
+
+    Retorna:
+        pd.DataFrame: DataFrame con fechas, valores Gaussianos generados y su temporada.
+    """
+    dates = pd.DatetimeIndex(x)
+    # La semilla se toma del generador global para respetar np.random.seed()
+    seed = np.random.randint(0, 2 ** 31 - 1)
+    gauss = seasonal_ar_batch(dates, ACS, nsim=1, season=season, rng=seed)[0]
+    seasons = dates.month if season == "month" else dates.day
 
-    return result
+    return pd.DataFrame({"date": dates, "gauss": gauss, "season": np.asarray(seasons)})
 
 
 def simulate_ts(aTS, from_date=None, to_date=None):
@@ -0,0 +1,132 @@
+import os
+import json
+import hashlib
+import threading
+from collections import OrderedDict
+
+from app.almacen_clima import ruta_ubicacion, DIRECTORIO_CLIMA
+from app.indice_ubicaciones import clave_celda, bloqueo_celda
+from app.simulacion import serie_diaria, ajustar_modelo, DIST, ACS_ID, SEASON, LAG_MAX
+
+DIRECTORIO_MODELOS = os.path.join("data", "modelos")
+# Modelos conservados en memoria y en disco; se descartan primero los usados hace más tiempo
+MAXIMO_MODELOS_MEMORIA = int(os.environ.get("LCOE_MODELOS_MEMORIA", 256))
+MAXIMO_MODELOS_DISCO = int(os.environ.get("LCOE_MODELOS_DISCO", 4096))
+
+_modelos_memoria = OrderedDict()
+_bloqueo_memoria = threading.Lock()
+
+
+def huella_datos(lat, lon):
+    """
+    Huella de los datos climáticos de la celda: cambia cuando se agregan o
+    reescriben archivos en el almacén, lo que invalida los modelos ajustados.
+    """
+    directorio = ruta_ubicacion(lat, lon)
+    if not os.path.isdir(directorio):
+        return None
+    partes = sorted((e.name, e.stat().st_size, e.stat().st_mtime_ns) for e in os.scandir(directorio)
+                    if e.name.endswith(".parquet"))
+    return hashlib.sha256(json.dumps(partes).encode()).hexdigest()[:16]
+
+
+def clave_modelo(lat, lon, desde=None, hasta=None, dist=DIST, acsID=ACS_ID, season=SEASON, lag_max=LAG_MAX):
+    """
+    Clave del modelo en la caché: celda, rango de datos y parámetros del ajuste.
+    """
+    parametros = {"desde": None if desde is None else str(desde), "hasta": None if hasta is None else str(hasta),
+                  "dist": dist, "acsID": acsID, "season": season, "lag_max": lag_max}
+    resumen = hashlib.sha256(json.dumps(parametros, sort_keys=True).encode()).hexdigest()[:16]
+    return f"{clave_celda(lat, lon)}_{resumen}"
+
+
+def desalojar_modelos(directorio=DIRECTORIO_MODELOS, maximo=MAXIMO_MODELOS_DISCO, base_clima=DIRECTORIO_CLIMA):
+    """
+    Elimina los modelos guardados de celdas que ya no están en el almacén
+    climático (no se pueden volver a validar) y, si siguen siendo más de
+    `maximo`, los usados hace más tiempo.
+
+    Retorna:
+        list: Nombres de los archivos eliminados.
+    """
+    if not os.path.isdir(directorio):
+        return []
+    modelos = [e for e in os.scandir(directorio) if e.name.endswith(".json")]
+    sin_datos = [e for e in modelos
+                 if not os.path.isdir(os.path.join(base_clima, f"ubicacion={e.name.rsplit('_', 1)[0]}"))]
+    vigentes = sorted((e for e in modelos if e not in sin_datos), key=lambda e: e.stat().st_mtime)
+
+    eliminados = []
+    for entrada in sin_datos + vigentes[:max(len(vigentes) - maximo, 0)]:
+        try:
+            os.remove(entrada.path)
+            eliminados.append(entrada.name)
+        except FileNotFoundError:
+            pass
+    return eliminados
+
+
+def obtener_modelo(lat, lon, desde=None, hasta=None, dist=DIST, acsID=ACS_ID, season=SEASON, lag_max=LAG_MAX,
+                   directorio=DIRECTORIO_MODELOS):
+    """
+    Devuelve el modelo ajustado de la celda, reutilizando el guardado si los
+    datos climáticos no cambiaron desde el ajuste.
+
+    Los modelos se guardan como JSON en `directorio` (y en memoria) con la
+    huella de los datos usados; si la huella actual es distinta, el modelo se
+    vuelve a ajustar y se sobrescribe. En memoria se conservan los
+    MAXIMO_MODELOS_MEMORIA usados más recientemente; en disco, ver
+    `desalojar_modelos`.
+
+    Parámetros:
+        lat, lon (float): Ubicación.
+        desde, hasta (str, opcional): Rango de datos usados para el ajuste.
+        dist, acsID, season, lag_max: Parámetros de `ajustar_modelo`.
+        directorio (str): Carpeta de la caché en disco.
+
+    Retorna:
+        dict: Modelo ajustado, o None si no hay datos climáticos.
+    """
+    clave = clave_modelo(lat, lon, desde, hasta, dist, acsID, season, lag_max)
+    huella = huella_datos(lat, lon)
+    if huella is None:
+        return None
+
+    with _bloqueo_memoria:
+        entrada = _modelos_memoria.get(clave)
+        if entrada is not None and entrada["huella"] == huella:
+            _modelos_memoria.move_to_end(clave)
+            return entrada["modelo"]
+
+    archivo = os.path.join(directorio, f"{clave}.json")
+    nuevo = False
+    with bloqueo_celda(f"modelo_{clave}"):
+        try:
+            with open(archivo) as f:
+                entrada = json.load(f)
+            os.utime(archivo)  # Usado recientemente para el desalojo
+        except FileNotFoundError:
+            pass
+
+        if entrada is None or entrada["huella"] != huella:
+            data_daily = serie_diaria(lat, lon, desde=desde, hasta=hasta)
+            if data_daily is None:
+                return None
+            entrada = {"huella": huella, "modelo": ajustar_modelo(data_daily, dist, acsID, season, lag_max)}
+
+            # El lock es de este proceso: los procesos del mapa pueden escribir el mismo modelo a la vez
+            os.makedirs(directorio, exist_ok=True)
+            temporal = f"{archivo}.{os.getpid()}.{threading.get_ident()}.tmp"
+            with open(temporal, "w") as f:
+                json.dump(entrada, f)
+            os.replace(temporal, archivo)
+            nuevo = True
+
+    with _bloqueo_memoria:
+        _modelos_memoria[clave] = entrada
+        _modelos_memoria.move_to_end(clave)
+        while len(_modelos_memoria) > MAXIMO_MODELOS_MEMORIA:
+            _modelos_memoria.popitem(last=False)
+    if nuevo:
+        desalojar_modelos(directorio)
+    return entrada["modelo"]
@@ -0,0 +1,64 @@
+import os
+import json
+import time
+import hashlib
+import threading
+from collections import OrderedDict
+
+# Vigencia y cantidad máxima de resultados guardados
+TTL_SEGUNDOS = float(os.environ.get("LCOE_CACHE_TTL", 3600))
+MAXIMO_ENTRADAS = int(os.environ.get("LCOE_CACHE_ENTRADAS", 1024))
+
+
+def clave_pedido(tipo, parametros):
+    """
+    Resumen canónico de un pedido ya validado: dos pedidos con el mismo tipo
+    y los mismos parámetros (sin importar el orden de las claves) tienen la
+    misma clave.
+    """
+    return hashlib.sha256(json.dumps({"tipo": tipo, "parametros": parametros}, sort_keys=True).encode()).hexdigest()
+
+
+class CacheResultados:
+    """
+    Caché en memoria de respuestas con vencimiento (TTL) y desalojo LRU.
+    """
+
+    def __init__(self, maximo=MAXIMO_ENTRADAS, ttl=TTL_SEGUNDOS):
+        self.maximo = maximo
+        self.ttl = ttl
+        self.entradas = OrderedDict()
+        self.bloqueo = threading.Lock()
+
+    def obtener(self, clave):
+        """
+        Devuelve el resultado guardado, o None si no existe o venció.
+        """
+        with self.bloqueo:
+            entrada = self.entradas.get(clave)
+            if entrada is None:
+                return None
+            vence, valor = entrada
+            if vence < time.monotonic():
+                del self.entradas[clave]
+                return None
+            self.entradas.move_to_end(clave)
+            return valor
+
+    def guardar(self, clave, valor):
+        """
+        Guarda un resultado; si se supera el máximo se descarta el menos usado.
+        """
+        with self.bloqueo:
+            self.entradas[clave] = (time.monotonic() + self.ttl, valor)
+            self.entradas.move_to_end(clave)
+            while len(self.entradas) > self.maximo:
+                self.entradas.popitem(last=False)
+
+    def descartar(self, clave):
+        with self.bloqueo:
+            self.entradas.pop(clave, None)
+
+    def limpiar(self):
+        with self.bloqueo:
+            self.entradas.clear()
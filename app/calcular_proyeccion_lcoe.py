@@ -1,4 +1,31 @@
+import os
+import time
 import requests
+import numpy as np
+
+from app.indice_ubicaciones import clave_celda, bloqueo_celda, registrar_acceso, desalojar
+from app.simulacion_paralela import simular_paralelo
+from app.cache_modelos import obtener_modelo
+from app.cache_resultados import clave_pedido
+from app.lcoe import muestrear_parametros, lcoe_montecarlo, lcoe_anualizado, resumen_lcoe, CAPEX_TRIANGULAR, WACC_UNIFORME
+from app.lcoe_flujo import lcoe_escenarios
+
+# Motor de simulación de /procesar: "python" (en proceso) o "r" (API plumber)
+BACKEND_SIMULACION = os.environ.get("LCOE_BACKEND", "python")
+
+# Parámetros de la simulación, iguales a los de src/scripts/api.R
+NSIM = 1000
+SEMILLA = 1995
+INICIO_SIMULACION = "2025-01-01"
+
+# Máximo de escenarios por pedido del Monte Carlo en Python (la energía y el descuento son matrices nsim × años)
+NSIM_MAXIMO = 100_000
+
+# Almacenes de simulaciones de /procesar, dentro de data_dir, con su propio índice LRU
+DIRECTORIO_SIMULACIONES = "simulaciones"
+LIMITE_BYTES_SIMULACIONES = int(os.environ.get("LCOE_LIMITE_SIMULACIONES", 2 * 1024 ** 3))
+ARCHIVO_COMPLETO = "completo"  # Marca de un almacén con todos sus escenarios escritos
+
 
 def calcular_lcoe_r(data_dir, input_file, capital_cost, operating_cost, energy_production, discount_rate, lifetime, projection_date):
     """
@@ -36,3 +63,126 @@ def calcular_lcoe_r(data_dir, input_file, capital_cost, operating_cost, energy_p
         return response.json()
     except requests.exceptions.RequestException as e:
         return {"error": f"Error al conectar con la API de R: {e}"}
+
+
+def calcular_lcoe_py(data_dir, lat, lon, capital_cost, operating_cost, energy_production, discount_rate, lifetime,
+                     projection_date, nsim=NSIM, seed=SEMILLA, progreso=None):
+    """
+    Versión en proceso de la API de R: ajusta el modelo CoSMoS (norm, fgn,
+    mensual) sobre la radiación diaria del almacén climático (o lo toma de la
+    caché de modelos si los datos no cambiaron), simula `nsim` escenarios
+    repartidos entre procesos y calcula el LCOE, sin levantar R ni escribir CSV.
+
+    Parámetros:
+        - data_dir (str): Carpeta donde se guarda el almacén de simulaciones.
+        - lat, lon (float): Ubicación (se usa su celda en el almacén climático).
+        - progreso (callable, opcional): Recibe la fracción de escenarios simulados.
+        - Resto: Igual que `calcular_lcoe_r`.
+
+    Retorna:
+        - Un diccionario con la misma forma que la respuesta de la API de R.
+    """
+    try:
+        t0 = time.perf_counter()
+
+        modelo = obtener_modelo(lat, lon)
+        if modelo is None:
+            return {"error": "Error: No hay datos climáticos para la ubicación."}
+
+        # Un almacén por simulación distinta (celda, horizonte, escenarios, semilla y modelo ajustado): otro
+        # pedido de la misma celda no sobrescribe el archivo al que apunta un resultado anterior
+        clave = clave_pedido("simulacion", {"celda": clave_celda(lat, lon), "desde": INICIO_SIMULACION,
+                                            "hasta": str(projection_date), "nsim": int(nsim), "seed": int(seed),
+                                            "modelo": clave_pedido("modelo", modelo)})[:16]
+        clave_almacen = f"{clave_celda(lat, lon)}_{clave}"
+        base = os.path.join(data_dir, DIRECTORIO_SIMULACIONES)
+        output_file_path = os.path.join(base, f"clima_{clave_almacen}_py")
+        with bloqueo_celda(clave_almacen):  # Trabajos concurrentes del mismo pedido
+            # Un almacén completo con la misma clave ya tiene exactamente estos escenarios
+            completo = os.path.join(output_file_path, ARCHIVO_COMPLETO)
+            if not os.path.exists(completo):
+                simular_paralelo(modelo, INICIO_SIMULACION, projection_date, output_file_path, nsim=nsim,
+                                 semilla=seed, progreso=progreso)
+                open(completo, "w").close()
+            elif progreso is not None:
+                progreso(1.0)
+
+            # Los almacenes se desalojan por LRU como las celdas del almacén climático; el lock protege al actual
+            registrar_acceso(base, clave_almacen, output_file_path)
+            desalojar(base, LIMITE_BYTES_SIMULACIONES)
+        execution_time = time.perf_counter() - t0
+
+        # Cálculo del LCOE
+        lcoe = lcoe_anualizado(capital_cost, operating_cost, energy_production, discount_rate / 100, lifetime)
+
+        return {
+            "message": "Proceso completado",
+            "output_file": output_file_path,
+            "execution_time_seconds": execution_time,
+            "lcoe": lcoe
+        }
+    except Exception as e:
+        return {"error": f"Error: {e}"}
+
+
+def calcular_lcoe_montecarlo(lat=None, lon=None, projection_date=None, nsim=NSIM, seed=SEMILLA,
+                             capex=CAPEX_TRIANGULAR, wacc=WACC_UNIFORME, energia=None, anios=None,
+                             incluir_escenarios=False, sistema=None):
+    """
+    Versión en Python del Monte Carlo de src/scripts/LCOE.R: CAPEX triangular,
+    WACC uniforme y LCOE de todos los escenarios en una sola operación.
+
+    La energía anual puede venir dada (`energia` y `anios`) o simularse para
+    la ubicación con el modelo de la celda, desde el inicio de la simulación
+    hasta `projection_date`, sin guardar las series diarias.
+
+    Parámetros:
+        - lat, lon (float, opcional): Ubicación a simular.
+        - projection_date (str, opcional): Fecha final de la simulación.
+        - nsim (int): Número de escenarios.
+        - seed (int): Semilla de parámetros y simulaciones.
+        - capex (tuple): (mínimo, moda, máximo) del CAPEX en US$/kW.
+        - wacc (tuple): (mínimo, máximo) del WACC como fracción.
+        - energia (list, opcional): Energía anual en kWh, un perfil (años) o una matriz (nsim × años).
+        - anios (list, opcional): Años de las columnas de `energia`.
+        - incluir_escenarios (bool): Si es True, devuelve el LCOE de cada escenario.
+        - sistema (dict, opcional): Sistema fotovoltaico de `sistema_fv`, usado al simular la energía.
+
+    Retorna:
+        - Un diccionario con el resumen del LCOE (US$/MWh) o un mensaje de error interno.
+
+    Lanza:
+        - ValueError: Si los parámetros son inválidos (nsim fuera de 1..NSIM_MAXIMO, CAPEX o WACC
+          inconsistentes, o energía con otra forma).
+    """
+    t0 = time.perf_counter()
+    if not 1 <= nsim <= NSIM_MAXIMO:
+        raise ValueError(f"nsim debe estar entre 1 y {NSIM_MAXIMO}.")
+    parametros = muestrear_parametros(nsim, seed, capex, wacc)
+    if energia is not None:
+        energia = np.asarray(energia, dtype=float)
+        if anios is None or energia.ndim == 0 or energia.shape[-1] != len(anios) or energia.ndim > 2 or \
+                (energia.ndim == 2 and energia.shape[0] != nsim):
+            raise ValueError("La energía debe tener forma (años) o (nsim, años) y coincidir con 'anios'.")
+
+    try:
+        if energia is not None:
+            lcoe = lcoe_montecarlo(energia, parametros["inv"], parametros["rate"], anios)
+        else:
+            modelo = obtener_modelo(lat, lon)
+            if modelo is None:
+                return {"error": "Error: No hay datos climáticos para la ubicación."}
+            lcoe, _ = lcoe_escenarios(modelo, INICIO_SIMULACION, projection_date, parametros["inv"],
+                                      parametros["rate"], nsim=nsim, semilla=seed, sistema=sistema)
+
+        resultado = {
+            "message": "Proceso completado",
+            "nsim": nsim,
+            "resumen": resumen_lcoe(lcoe),
+            "execution_time_seconds": time.perf_counter() - t0
+        }
+        if incluir_escenarios:
+            resultado["lcoe"] = np.asarray(lcoe).tolist()
+        return resultado
+    except Exception as e:
+        return {"error": f"Error: {e}"}
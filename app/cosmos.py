@@ -4,21 +4,17 @@ import numpy as np
 import matplotlib.pyplot as plt
 
 # Importar las funciones convertidas a Python
-from analyze_ts_module import analyze_ts, report_ts, simulate_ts  # Suponiendo que guardaste las funciones en un módulo
+from app.analyze_ts_module import analyze_ts, report_ts, simulate_ts  # Suponiendo que guardaste las funciones en un módulo
+from app.almacen_simulaciones import guardar_simulaciones
+from app.almacen_clima import cargar_clima
+from app.modelo_fv import energia, HORAS_SOL_DIA
 
-# 📌 Cargar datos desde CSV
-csv_file = "../data/clima_-34.028193_-55.393066.csv"
-data = pd.read_csv(csv_file)
-
-# 📌 Convertir la columna de fecha a datetime
-data['date'] = pd.to_datetime(data['date'])
-
-# 📌 Seleccionar columnas relevantes
-data = data[['date', 'shortwave_radiation']]
+# 📌 Cargar datos desde el almacén climático (solo la columna necesaria, fechas ya tipadas)
+data = cargar_clima(-34.028193, -55.393066, variables=['shortwave_radiation'], base="data/clima")
 
 # 📌 Promedio diario de radiación de onda corta
 data_daily = data.groupby('date').agg({'shortwave_radiation': 'sum'}).reset_index()
-data_daily['output'] = data_daily['shortwave_radiation'] * 0.153 * 6.545  # Factor de eficiencia y tamaño del arreglo
+data_daily['output'] = energia(data_daily['shortwave_radiation'].to_numpy(), horas=HORAS_SOL_DIA)  # kWh del sistema por defecto
 
 # **✅ Corrección: Renombrar la columna 'shortwave_radiation' a 'value'**
 data_daily = data_daily.rename(columns={'shortwave_radiation': 'value'})
@@ -51,14 +47,11 @@ start_date = datetime(2024, 1, 1)
 end_date = datetime(2044, 12, 31)
 nsim = 1000  # Número de simulaciones
 
-sim_radiation = []
+sim_dates = pd.date_range(start_date, end_date, freq='D')
+sim_radiation = np.empty((nsim, len(sim_dates)), dtype=np.float32)  # Matriz escenario × día
 for i in range(nsim):
     sim_df = simulate_ts(shra_adj, from_date=start_date, to_date=end_date)
-    sim_df['id'] = str(i)  # Identificador de simulación
-    sim_radiation.append(sim_df)
-
-# 📌 **Combinar todas las simulaciones**
-DBRadiationSimDaily = pd.concat(sim_radiation, ignore_index=True)
+    sim_radiation[i] = sim_df['value'].to_numpy()
 
 # 📌 **Calcular tiempo total de simulación**
 end_time = datetime.now()  # Marca de fin
@@ -67,9 +60,8 @@ print(f"⏳ Tiempo total de simulación: {elapsed_time}")
 
 # 📊 **Graficar las series simuladas**
 plt.figure(figsize=(12, 5))
-for sim_id in np.random.choice(DBRadiationSimDaily['id'].unique(), 10, replace=False):
-    subset = DBRadiationSimDaily[DBRadiationSimDaily['id'] == sim_id]
-    plt.plot(subset['date'], subset['value'], alpha=0.3)
+for sim_id in np.random.choice(nsim, 10, replace=False):
+    plt.plot(sim_dates, sim_radiation[sim_id], alpha=0.3)
 
 plt.xlabel('Fecha')
 plt.ylabel('Radiación Simulada')
@@ -77,7 +69,8 @@ plt.title('Simulación de Radiación Solar (2024-2044)')
 plt.grid()
 plt.show()
 
-# 📌 **Exportar los resultados a CSV**
-DBRadiationSimDaily.to_csv("../data/salida_clima_-34.028193_-55.393066.csv", index=False)
+# 📌 **Exportar los resultados al almacén de simulaciones (escenario × día, float32)**
+guardar_simulaciones("data/salida_clima_-34.028193_-55.393066", sim_radiation, sim_dates,
+                     variable="shortwave_radiation")
 
-print("✅ Simulación completada y resultados guardados en CSV.")
+print("✅ Simulación completada y resultados guardados en el almacén de simulaciones.")
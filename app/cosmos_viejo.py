@@ -5,6 +5,7 @@ import pycosmos
 import pandas as pd
 import numpy as np
 from fontTools.misc.plistlib import end_date
+from app.modelo_fv import energia, HORAS_SOL_DIA
 ''''
 
 def simular_datos_climaticos(csv_file, end_date):
@@ -69,7 +70,7 @@ data = data[['date', 'anio', 'mes', 'dia', 'shortwave_radiation']]
 
 # Promedio diario de radiación de onda corta
 data_daily = data.groupby('date').agg({'shortwave_radiation': 'sum'}).reset_index()
-data_daily['output'] = data_daily['shortwave_radiation'] * 0.153 * 6.545
+data_daily['output'] = energia(data_daily['shortwave_radiation'].to_numpy(), horas=HORAS_SOL_DIA)
 
 # Visualización rápida de la serie temporal
 plt.figure(figsize=(12, 5))
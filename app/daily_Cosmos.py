@@ -1,58 +1,42 @@
-import pandas as pd
+from datetime import datetime
 import numpy as np
-import matplotlib.pyplot as plt
-import statsmodels.api as sm
-from scipy.stats import norm
-from tqdm import tqdm
-from datetime import datetime, timedelta
 import time  # 📌 Importar módulo para medición de tiempo
-
-# 📌 **Cargar datos del archivo CSV**
-csv_input = "../data/clima_-34.028193_-55.393066.csv"
-data = pd.read_csv(csv_input)
-
-# 📌 **Convertir fecha y extraer año, mes, día y hora**
-data['date'] = pd.to_datetime(data['date'])
-data['anio'] = data['date'].dt.year
-data['mes'] = data['date'].dt.month
-data['dia'] = data['date'].dt.day
-data['hora'] = data['date'].dt.hour  # Extraer la hora
-
-# 📌 **Seleccionar columnas relevantes**
-data = data[['date', 'anio', 'mes', 'dia', 'hora', 'shortwave_radiation']]
-
-# 📌 **Promedio por hora de radiación de onda corta**
-data_hourly = data.groupby('date').agg({'shortwave_radiation': 'sum'}).reset_index()
-data_hourly['value'] = data_hourly['shortwave_radiation']
-data_hourly['output'] = data_hourly['value'] * 0.153 * 6.545  # Factor eficiencia 15.3%, 6.545m²
-
-# 📌 **Ajuste de Distribución Normal**
-mu, sigma = norm.fit(data_hourly['value'])  # Ajuste a una distribución normal
-print(f"📌 Parámetros de la distribución Normal: Media={mu:.2f}, Desviación={sigma:.2f}")
+from app.almacen_clima import cargar_clima
+from app.almacen_simulaciones import abrir_simulaciones
+from app.geometria_solar import geometria_celda, irradiancia_plano
+from app.modelo_fv import energia, energia_anual, HORAS_SOL_DIA
+from app.simulacion import ajustar_modelo
+from app.simulacion_horaria import perfil_horario
+from app.simulacion_paralela import simular_paralelo
+
+# 📌 **Cargar datos del almacén climático (solo la columna necesaria, fechas ya tipadas)**
+data = cargar_clima(-34.028193, -55.393066, variables=['shortwave_radiation'], base="data/clima")
+
+# 📌 **Totales diarios (día UTC) y perfil horario medio por mes**
+data_daily = data.groupby(data['date'].dt.tz_localize(None).dt.normalize()).agg({'shortwave_radiation': 'sum'})
+data_daily = data_daily.reset_index().rename(columns={'shortwave_radiation': 'value'})
+data_daily['output'] = energia(data_daily['value'].to_numpy(), horas=HORAS_SOL_DIA)  # kWh del sistema por defecto
+perfil = perfil_horario(data)  # Fracción del total diario por (mes, hora); cero de noche
+
+# 📌 **Ajuste del modelo diario (marginal y autocorrelación por mes)**
+modelo = ajustar_modelo(data_daily)
+print(f"📌 Modelo ajustado: {modelo['dist']} / {modelo['acsID']} por {modelo['season']}")
 
 # 📌 **Simulación de la radiación solar 2024-2044 por Hora**
-np.random.seed(1995)  # Establecer semilla para reproducibilidad
-
-start_date = datetime(2024, 1, 1, 0, 0)  # Empezar a las 00:00
-end_date = datetime(2044, 12, 31, 23, 0)  # Terminar a las 23:00
-hours_to_simulate = int((end_date - start_date).total_seconds() / 3600)  # Total de horas a simular
-
+start_date = datetime(2024, 1, 1)
+end_date = datetime(2044, 12, 31)
 nsim = 1000  # Número de simulaciones
-sim_radiation = []
+
+# 📌 **Almacén mapeado en memoria (escenario × hora, float32, índice horario compartido)**
+output_store = "data/salida_clima_-34.028193_-55.393066"
 
 # 📌 **Iniciar medición de tiempo para la simulación**
 start_sim_time = time.time()
 
 print("🔄 Simulando series temporales (por hora)...")
 
-for i in tqdm(range(nsim)):
-    # Generar datos simulados usando la distribución ajustada (Normal)
-    sim_dates = pd.date_range(start=start_date, periods=hours_to_simulate, freq='H')
-    sim_values = np.random.normal(mu, sigma, hours_to_simulate)  # Generar datos sintéticos por hora
-
-    # Crear DataFrame de simulación
-    sim_df = pd.DataFrame({'date': sim_dates, 'value': sim_values, 'id': str(i)})
-    sim_radiation.append(sim_df)
+# Totales diarios simulados por bloques de escenarios y repartidos en horas con el perfil
+simular_paralelo(modelo, start_date, end_date, output_store, nsim=nsim, semilla=1995, perfil=perfil)
 
 # 📌 **Terminar medición de tiempo para la simulación**
 end_sim_time = time.time()
@@ -63,25 +47,26 @@ sim_seconds = int(total_sim_time % 60)
 # 📌 **Imprimir el tiempo total de simulación**
 print(f"⏳ Tiempo total de simulación: {sim_minutes} minutos y {sim_seconds} segundos.")
 
-# 📌 **Iniciar medición de tiempo para la combinación y guardado en CSV**
+# 📌 **Iniciar medición de tiempo para el agregado**
 start_save_time = time.time()
 
-print("🔄 Combinando simulaciones y guardando en archivo CSV...")
-
-# 📌 **Combinar todas las simulaciones**
-DBRadiationSimHourly = pd.concat(sim_radiation, ignore_index=True)
+print("🔄 Agregando energía anual desde el almacén...")
 
-# 📌 **Exportar los resultados a CSV**
-output_csv = "../data/salida_clima_-34.028193_-55.393066.csv"
-DBRadiationSimHourly.to_csv(output_csv, index=False)
+# 📌 **Energía anual por escenario (kWh): radiación en el plano de los paneles y modelo del sistema, por bloques**
+sim_radiation, sim_dates = abrir_simulaciones(output_store)
+geometria = geometria_celda(-34.028193, -55.393066, start_date, end_date)
+bloques = [energia_anual(irradiancia_plano(sim_radiation[i:i + 64], geometria), np.asarray(sim_dates.year))
+           for i in range(0, nsim, 64)]
+anios, energia_escenarios = bloques[0][0], np.vstack([anuales for _, anuales in bloques])
+print(f"📌 Energía anual media: {energia_escenarios.mean():.1f} kWh ({anios[0]}-{anios[-1]})")
 
-# 📌 **Terminar medición de tiempo para la combinación y guardado**
+# 📌 **Terminar medición de tiempo para el agregado**
 end_save_time = time.time()
 total_save_time = end_save_time - start_save_time
 save_minutes = int(total_save_time // 60)
 save_seconds = int(total_save_time % 60)
 
-# 📌 **Imprimir el tiempo total de combinación y guardado**
-print(f"⏳ Tiempo total de combinación y guardado: {save_minutes} minutos y {save_seconds} segundos.")
+# 📌 **Imprimir el tiempo total de agregado**
+print(f"⏳ Tiempo total de agregado: {save_minutes} minutos y {save_seconds} segundos.")
 
-print(f"✅ Simulación completada y resultados guardados en: {output_csv}")
+print(f"✅ Simulación completada y resultados guardados en: {output_store}")
@@ -0,0 +1,135 @@
+import time
+import argparse
+import threading
+import numpy as np
+import pandas as pd
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from app.generar_csv_climatico import sincronizar_clima_lote
+from app.om import SITIOS_POR_PEDIDO
+from app.indice_ubicaciones import celda, clave_celda, RESOLUCION_GRILLA
+from app.utils import URUGUAY_POLYGON, validate_coordinates_batch
+
+# Presupuesto por defecto de pedidos a la API de archivo de OpenMeteo
+PEDIDOS_POR_MINUTO = 60
+MAX_HILOS = 8
+
+
+class LimitadorTasa:
+    """
+    Limita la cantidad de pedidos por minuto compartida entre hilos (token bucket).
+    """
+
+    def __init__(self, pedidos_por_minuto=PEDIDOS_POR_MINUTO):
+        self.intervalo = 60.0 / pedidos_por_minuto
+        self.capacidad = max(1.0, pedidos_por_minuto / 60.0)
+        self.fichas = self.capacidad
+        self.ultimo = time.monotonic()
+        self.bloqueo = threading.Lock()
+
+    def esperar(self):
+        """
+        Bloquea hasta que haya presupuesto para un pedido más.
+        """
+        while True:
+            with self.bloqueo:
+                ahora = time.monotonic()
+                self.fichas = min(self.capacidad, self.fichas + (ahora - self.ultimo) / self.intervalo)
+                self.ultimo = ahora
+                if self.fichas >= 1:
+                    self.fichas -= 1
+                    return
+                espera = (1 - self.fichas) * self.intervalo
+            time.sleep(espera)
+
+
+def celdas_uruguay(resolucion=RESOLUCION_GRILLA):
+    """
+    Devuelve los centros de las celdas de la grilla que caen dentro de Uruguay
+    y fuera de las zonas excluidas.
+
+    Retorna:
+        list: Tuplas (lat, lon).
+    """
+    minx, miny, maxx, maxy = URUGUAY_POLYGON.bounds
+    lats, lons = celda(*np.meshgrid(np.arange(miny, maxy + resolucion, resolucion),
+                                    np.arange(minx, maxx + resolucion, resolucion), indexing="ij"), resolucion)
+    dentro = validate_coordinates_batch(lats, lons)
+    return list(zip(lats[dentro].tolist(), lons[dentro].tolist()))
+
+
+def descargar_sitios(coordenadas, end_date=None, max_hilos=MAX_HILOS, pedidos_por_minuto=PEDIDOS_POR_MINUTO,
+                     sitios_por_pedido=SITIOS_POR_PEDIDO):
+    """
+    Sincroniza el almacén climático para muchas ubicaciones en paralelo.
+
+    Las coordenadas se agrupan por celda de la grilla (una descarga por
+    celda) y en lotes de `sitios_por_pedido` celdas por pedido HTTP. Los
+    lotes se reparten en un pool acotado de hilos que comparten el cliente
+    HTTP de `app.om` y un presupuesto de pedidos por minuto: cada pedido
+    HTTP toma una ficha, incluso cuando un lote se parte en varios pedidos
+    por tener celdas con distinta fecha de inicio. Cada resultado se escribe
+    en el almacén apenas llega.
+
+    Parámetros:
+        coordenadas (iterable): Pares (lat, lon).
+        end_date (str, opcional): Fecha final (por defecto la última publicada).
+        max_hilos (int): Descargas simultáneas.
+        pedidos_por_minuto (float): Presupuesto de la API.
+        sitios_por_pedido (int): Celdas empaquetadas en cada pedido.
+
+    Retorna:
+        dict: Horas agregadas por celda (None si la descarga falló).
+    """
+    celdas = {}
+    for lat, lon in coordenadas:
+        celdas.setdefault(clave_celda(lat, lon), celda(lat, lon))
+    celdas = list(celdas.values())
+    lotes = [celdas[i:i + sitios_por_pedido] for i in range(0, len(celdas), sitios_por_pedido)]
+
+    limitador = LimitadorTasa(pedidos_por_minuto)
+
+    def tarea(lote):
+        return sincronizar_clima_lote(lote, end_date, sitios_por_pedido=sitios_por_pedido, limitador=limitador)
+
+    resultados = {}
+    with ThreadPoolExecutor(max_workers=max_hilos) as pool:
+        futuros = {pool.submit(tarea, lote): lote for lote in lotes}
+        for i, futuro in enumerate(as_completed(futuros), start=1):
+            lote = futuros[futuro]
+            try:
+                resultados.update(futuro.result())
+            except Exception as e:
+                print(f"Error al sincronizar el lote {lote}: {e}")
+                resultados.update({clave_celda(lat, lon): None for lat, lon in lote})
+            print(f"[{i}/{len(futuros)}] Lote de {len(lote)} celdas sincronizado.")
+
+    return resultados
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Descarga masiva de datos climáticos de OpenMeteo al almacén local.")
+    parser.add_argument("--csv", help="CSV con columnas lat y lon.")
+    parser.add_argument("--punto", nargs=2, type=float, action="append", metavar=("LAT", "LON"),
+                        help="Coordenada a descargar (se puede repetir).")
+    parser.add_argument("--uruguay", action="store_true", help="Todas las celdas de la grilla dentro de Uruguay.")
+    parser.add_argument("--end-date", default=None, help="Fecha final (YYYY-MM-DD).")
+    parser.add_argument("--hilos", type=int, default=MAX_HILOS)
+    parser.add_argument("--pedidos-por-minuto", type=float, default=PEDIDOS_POR_MINUTO)
+    parser.add_argument("--sitios-por-pedido", type=int, default=SITIOS_POR_PEDIDO)
+    args = parser.parse_args()
+
+    coordenadas = list(map(tuple, args.punto or []))
+    if args.csv:
+        sitios = pd.read_csv(args.csv)
+        coordenadas += list(zip(sitios["lat"], sitios["lon"]))
+    if args.uruguay:
+        coordenadas += celdas_uruguay()
+
+    if not coordenadas:
+        parser.error("Debe indicar --csv, --punto o --uruguay.")
+
+    resultados = descargar_sitios(coordenadas, args.end_date, args.hilos, args.pedidos_por_minuto,
+                                  args.sitios_por_pedido)
+    fallidas = [clave for clave, filas in resultados.items() if filas is None]
+    print(f"Celdas sincronizadas: {len(resultados) - len(fallidas)}; con error: {len(fallidas)}")
@@ -234,37 +234,202 @@ from retry_requests import retry
 import numpy as np
 import pycosmos
 
-from app.om import obtener_datos_climaticos
+from app.om import obtener_datos_climaticos, obtener_datos_climaticos_lote, ultima_fecha_archivo, \
+    FECHA_INICIO_HISTORICO, VARIABLES_HORARIAS, SITIOS_POR_PEDIDO
+from app.almacen_clima import existe_clima, guardar_clima, anexar_clima, ultimo_tiempo, exportar_csv, ruta_ubicacion, \
+    DIRECTORIO_CLIMA
+from app.indice_ubicaciones import celda, clave_celda, bloqueo_celda, celda_en_uso, consultar_indice, registrar_csv
+from app.cache_modelos import huella_datos
 
 
-def generar_csv(lat, lon, end_date):
+def _fecha_fin(end_date):
     """
-    Genera un archivo CSV con los datos climáticos obtenidos desde OpenMeteo
-    y lo guarda en la carpeta `data/`. Si ya existe, no lo recalcula.
+    Limita la fecha final pedida a la última fecha publicada en el archivo.
     """
+    disponible = ultima_fecha_archivo()
+    if end_date is None:
+        return disponible
+    return min(pd.Timestamp(end_date).strftime("%Y-%m-%d"), disponible)
 
-    filename = f"data/clima_{lat}_{lon}.csv"
 
-    # Si el archivo ya existe, no es necesario generarlo de nuevo
-    if os.path.exists(filename):
-        print(f"El archivo {filename} ya existe. Saltando generación.")
-        return filename
+def _recortar_faltantes(datos):
+    """
+    Elimina las horas finales sin ningún dato (el archivo las devuelve como NaN
+    hasta publicarlas), para no marcarlas como ya descargadas.
 
-    print("Generando el archivo de datos climáticos...")
+    Trabaja sobre los datos columnares de `app.om.arreglos_horarios`: el
+    recorte son vistas de los arreglos originales, sin copiarlos.
+    """
+    con_datos = np.zeros(len(datos["time"]), dtype=bool)
+    for variable in VARIABLES_HORARIAS:
+        con_datos |= ~np.isnan(datos[variable])
 
-    try:
-        historical_data = obtener_datos_climaticos(lat, lon, "2013-01-01")
-    except Exception as e:
-        print(f"Error en la conexión con OpenMeteo: {e}")
-        return None
+    fin = con_datos.nonzero()[0][-1] + 1 if con_datos.any() else 0
+    return {"time": datos["time"][:fin], **{variable: datos[variable][:fin] for variable in VARIABLES_HORARIAS}}
 
-    if historical_data is None or historical_data.empty:
-        print("Error: No se generó el archivo CSV debido a la falta de datos climáticos válidos.")
-        return None
 
-    # Guardar datos
-    os.makedirs("data", exist_ok=True)
-    historical_data.to_csv(filename, index=False)
-    print("Archivo de datos climáticos generado exitosamente.")
+def _fecha_inicio(lat, lon):
+    """
+    Primer día a descargar para la celda: el del instante siguiente al último guardado.
+    """
+    ultimo = ultimo_tiempo(lat, lon)
+    if ultimo is None:
+        return FECHA_INICIO_HISTORICO
+    return pd.to_datetime(ultimo + 3600, unit="s").strftime("%Y-%m-%d")
+
+
+def sincronizar_clima(lat, lon, end_date=None):
+    """
+    Actualiza de forma incremental los datos de la celda: descarga solo el
+    tramo posterior al último instante guardado y lo anexa al almacén.
+
+    Parámetros:
+        lat (float): Latitud.
+        lon (float): Longitud.
+        end_date (str, opcional): Fecha final (se limita a la última publicada).
+
+    Retorna:
+        int: Cantidad de horas agregadas, o None si hubo un error.
+    """
+    lat, lon = celda(lat, lon)
+
+    with bloqueo_celda(clave_celda(lat, lon)):
+        inicio = _fecha_inicio(lat, lon)
+        fin = _fecha_fin(end_date)
+
+        if inicio > fin:
+            print(f"La celda ({lat}, {lon}) ya está al día.")
+            return 0
+
+        try:
+            nuevos = obtener_datos_climaticos(lat, lon, fin, start_date=inicio, como_dataframe=False)
+        except Exception as e:
+            print(f"Error en la conexión con OpenMeteo: {e}")
+            return None
+
+        if nuevos is None or len(nuevos["time"]) == 0:
+            return 0
+
+        agregadas = anexar_clima(lat, lon, _recortar_faltantes(nuevos))
+        print(f"Celda ({lat}, {lon}): {agregadas} horas nuevas desde {inicio}.")
+        return agregadas
+
+
+def sincronizar_clima_lote(coordenadas, end_date=None, sitios_por_pedido=SITIOS_POR_PEDIDO, limitador=None):
+    """
+    Sincroniza varias celdas agrupándolas en pedidos multi-ubicación a
+    OpenMeteo: las celdas con el mismo tramo faltante se piden juntas y la
+    respuesta se reparte por celda antes de anexarla al almacén.
+
+    Parámetros:
+        coordenadas (list): Pares (lat, lon).
+        end_date (str, opcional): Fecha final (se limita a la última publicada).
+        sitios_por_pedido (int): Celdas empaquetadas en cada pedido.
+        limitador (LimitadorTasa, opcional): Presupuesto compartido; cada pedido HTTP toma una ficha.
+
+    Retorna:
+        dict: Horas agregadas por clave de celda (None si el pedido falló).
+    """
+    fin = _fecha_fin(end_date)
+    celdas = {clave_celda(lat, lon): celda(lat, lon) for lat, lon in coordenadas}
+
+    # Agrupar por fecha de inicio: un pedido por lote comparte el rango de fechas
+    grupos = {}
+    resultados = {}
+    for clave, (lat, lon) in celdas.items():
+        inicio = _fecha_inicio(lat, lon)
+        if inicio > fin:
+            resultados[clave] = 0
+        else:
+            grupos.setdefault(inicio, []).append((lat, lon))
+
+    for inicio, grupo in grupos.items():
+        try:
+            sitios = obtener_datos_climaticos_lote(grupo, fin, start_date=inicio, sitios_por_pedido=sitios_por_pedido,
+                                                   limitador=limitador)
+        except Exception as e:
+            print(f"Error en la conexión con OpenMeteo: {e}")
+            resultados.update({clave_celda(lat, lon): None for lat, lon in grupo})
+            continue
+
+        for datos in sitios:
+            lat, lon = datos["lat"], datos["lon"]
+            with bloqueo_celda(clave_celda(lat, lon)):
+                resultados[clave_celda(lat, lon)] = anexar_clima(lat, lon, _recortar_faltantes(datos))
+
+    return resultados
+
+
+def generar_clima(lat, lon, end_date, actualizar=False):
+    """
+    Obtiene los datos climáticos desde OpenMeteo y los guarda en el almacén
+    Parquet de la celda de la grilla que contiene a la ubicación. Si ya
+    existen, no los recalcula (salvo `actualizar=True`, que descarga solo el
+    tramo faltante); pedidos simultáneos a la misma celda comparten una
+    única descarga.
+
+    Retorna:
+        str: Directorio de la celda en el almacén, o None si no hubo datos.
+    """
+    lat, lon = celda(lat, lon)
+
+    if actualizar:
+        if sincronizar_clima(lat, lon, end_date) is None and not existe_clima(lat, lon):
+            return None
+        return ruta_ubicacion(lat, lon)
+
+    with bloqueo_celda(clave_celda(lat, lon)):
+        if existe_clima(lat, lon):
+            print(f"Los datos climáticos de la celda ({lat}, {lon}) ya están en el almacén. Saltando descarga.")
+            return ruta_ubicacion(lat, lon)
+
+        print("Generando los datos climáticos...")
+
+        try:
+            historical_data = obtener_datos_climaticos(lat, lon, _fecha_fin(end_date), como_dataframe=False)
+        except Exception as e:
+            print(f"Error en la conexión con OpenMeteo: {e}")
+            return None
+
+        historical_data = None if historical_data is None else _recortar_faltantes(historical_data)
+        if historical_data is None or len(historical_data["time"]) == 0:
+            print("Error: No se guardaron datos debido a la falta de datos climáticos válidos.")
+            return None
+
+        guardar_clima(lat, lon, historical_data)
+        print("Datos climáticos guardados exitosamente.")
+
+    return ruta_ubicacion(lat, lon)
+
+
+def generar_csv(lat, lon, end_date, actualizar=False):
+    """
+    Genera un archivo CSV con los datos climáticos de la ubicación en la
+    carpeta `data/` (formato que consume la API de R). Los datos se leen
+    del almacén Parquet, que se completa desde OpenMeteo si hace falta.
+    El nombre del archivo corresponde a la celda de la grilla.
+
+    El CSV se registra en la entrada de la celda del índice con la huella de
+    los datos exportados: se desaloja junto con la celda y se vuelve a
+    exportar cuando el almacén de la celda cambió.
+    """
+    clave = clave_celda(lat, lon)
+    filename = f"data/clima_{clave}.csv"
+
+    with celda_en_uso(clave):
+        # Si el archivo ya existe y corresponde a los datos actuales, no es necesario generarlo de nuevo
+        entrada = consultar_indice(DIRECTORIO_CLIMA, clave) or {}
+        huella = huella_datos(lat, lon)
+        if (os.path.exists(filename) and not actualizar and huella is not None
+                and entrada.get("csv", {}).get("huella") == huella):
+            print(f"El archivo {filename} ya existe. Saltando generación.")
+            return filename
+
+        if generar_clima(lat, lon, end_date, actualizar=actualizar) is None:
+            return None
+
+        exportar_csv(lat, lon, filename)
+        registrar_csv(DIRECTORIO_CLIMA, clave, filename, huella_datos(lat, lon))
+        print("Archivo de datos climáticos generado exitosamente.")
 
     return filename
@@ -0,0 +1,193 @@
+import threading
+import numpy as np
+import pandas as pd
+
+from app.indice_ubicaciones import celda, clave_celda
+
+CONSTANTE_SOLAR = 1361.0  # W/m²
+
+# Las variables horarias de OpenMeteo son medias de la hora anterior a la
+# marca de tiempo: la geometría se evalúa dentro de ese intervalo.
+DESFASE_MINUTOS = -30
+SUBPASOS = 4  # Instantes por hora promediados para la irradiancia extraterrestre
+
+# Plano de los paneles: inclinación (grados), azimut (grados desde el norte, horario; 0 = mirando al norte) y albedo
+INCLINACION = 30.0
+AZIMUT_PANEL = 0.0
+ALBEDO = 0.2
+
+# Por debajo de este coseno del cenit (≈ 86°) no se transpone la componente directa
+COSENO_CENIT_MINIMO = 0.065
+
+MAXIMO_EN_MEMORIA = 64
+_geometrias_memoria = {}
+_bloqueo_memoria = threading.Lock()
+
+
+def _a_segundos(tiempos):
+    """
+    Convierte fechas (índice, str o segundos UTC numéricos) a segundos UTC float64.
+    """
+    tiempos = np.atleast_1d(tiempos)
+    if np.issubdtype(tiempos.dtype, np.number):
+        return tiempos.astype(np.float64)
+    fechas = pd.DatetimeIndex(pd.to_datetime(tiempos))
+    if fechas.tz is not None:
+        fechas = fechas.tz_convert("UTC").tz_localize(None)
+    return fechas.as_unit("s").asi8.astype(np.float64)
+
+
+def _angulo_diario(segundos):
+    """
+    Ángulo del año (radianes) de Spencer para cada instante.
+    """
+    instantes = segundos.astype("datetime64[s]")
+    inicio_anio = instantes.astype("datetime64[Y]")
+    anio = inicio_anio.astype(np.int64) + 1970
+    bisiesto = (anio % 4 == 0) & ((anio % 100 != 0) | (anio % 400 == 0))
+    dia_del_anio = (instantes - inicio_anio).astype(np.float64) / 86400.0
+    return 2 * np.pi * dia_del_anio / np.where(bisiesto, 366.0, 365.0)
+
+
+def posicion_solar(lat, lon, tiempos):
+    """
+    Posición del sol con las series de Spencer (declinación y ecuación del
+    tiempo), para todos los instantes en una sola operación.
+
+    Parámetros:
+        lat, lon (float): Ubicación en grados.
+        tiempos (array-like): Instantes (fechas o segundos UTC).
+
+    Retorna:
+        dict: 'coseno_cenit', 'cenit' y 'azimut' (grados desde el norte, horario)
+        y 'extraterrestre_normal' (W/m²), un arreglo por instante.
+    """
+    segundos = _a_segundos(tiempos)
+    g = _angulo_diario(segundos)
+
+    declinacion = (0.006918 - 0.399912 * np.cos(g) + 0.070257 * np.sin(g) - 0.006758 * np.cos(2 * g)
+                   + 0.000907 * np.sin(2 * g) - 0.002697 * np.cos(3 * g) + 0.00148 * np.sin(3 * g))
+    ecuacion_tiempo = 229.18 * (0.000075 + 0.001868 * np.cos(g) - 0.032077 * np.sin(g)
+                                - 0.014615 * np.cos(2 * g) - 0.040849 * np.sin(2 * g))
+    excentricidad = (1.000110 + 0.034221 * np.cos(g) + 0.001280 * np.sin(g) + 0.000719 * np.cos(2 * g)
+                     + 0.000077 * np.sin(2 * g))
+
+    minutos_solares = np.mod(segundos, 86400.0) / 60.0 + ecuacion_tiempo + 4.0 * lon
+    angulo_horario = np.radians(minutos_solares / 4.0 - 180.0)
+    phi = np.radians(lat)
+
+    coseno_cenit = np.clip(np.sin(phi) * np.sin(declinacion) +
+                           np.cos(phi) * np.cos(declinacion) * np.cos(angulo_horario), -1.0, 1.0)
+    azimut = np.degrees(np.arctan2(np.sin(angulo_horario),
+                                   np.cos(angulo_horario) * np.sin(phi) - np.tan(declinacion) * np.cos(phi))) + 180.0
+    return {"coseno_cenit": coseno_cenit, "cenit": np.degrees(np.arccos(coseno_cenit)), "azimut": azimut,
+            "extraterrestre_normal": CONSTANTE_SOLAR * excentricidad}
+
+
+def geometria_horaria(lat, lon, tiempos, desfase_minutos=DESFASE_MINUTOS, subpasos=SUBPASOS):
+    """
+    Geometría solar de cada hora, equivalente a las columnas deterministas
+    de OpenMeteo (`is_day`, `terrestrial_radiation`).
+
+    Los ángulos se evalúan en el centro del intervalo de cada hora y la
+    irradiancia extraterrestre horizontal se promedia sobre `subpasos`
+    instantes, de modo que las horas del amanecer y del atardecer no quedan
+    en cero.
+
+    Parámetros:
+        lat, lon (float): Ubicación en grados.
+        tiempos (array-like): Marcas horarias (fechas o segundos UTC).
+        desfase_minutos (float): Centro del intervalo respecto de la marca.
+        subpasos (int): Instantes promediados por hora.
+
+    Retorna:
+        dict: 'time' (segundos UTC int64), 'coseno_cenit', 'cenit', 'azimut',
+        'extraterrestre_normal', 'extraterrestre' (horizontal, W/m²) y 'es_dia'.
+    """
+    segundos = _a_segundos(tiempos)
+    geometria = posicion_solar(lat, lon, segundos + desfase_minutos * 60.0)
+
+    desplazamientos = (np.arange(subpasos) + 0.5) / subpasos * 3600.0 - 1800.0
+    instantes = posicion_solar(lat, lon, (segundos[:, None] + desfase_minutos * 60.0 + desplazamientos).ravel())
+    horizontal = (np.maximum(instantes["coseno_cenit"], 0.0) * instantes["extraterrestre_normal"])
+    geometria["extraterrestre"] = horizontal.reshape(len(segundos), subpasos).mean(axis=1)
+    geometria["es_dia"] = geometria["extraterrestre"] > 0
+    geometria["time"] = segundos.astype(np.int64)
+    return geometria
+
+
+def geometria_celda(lat, lon, desde, hasta):
+    """
+    Geometría horaria del centro de la celda entre `desde` y `hasta` (días
+    completos, ambos inclusive), calculada una vez y guardada en memoria.
+
+    No depende de datos descargados, así que sirve igual para años futuros.
+
+    Retorna:
+        dict: Salida de `geometria_horaria`, con arreglos de solo lectura.
+    """
+    inicio, fin = pd.Timestamp(desde).normalize(), pd.Timestamp(hasta).normalize()
+    clave = (clave_celda(lat, lon), str(inicio), str(fin))
+    with _bloqueo_memoria:
+        if clave in _geometrias_memoria:
+            return _geometrias_memoria[clave]
+
+    tiempos = pd.date_range(inicio, fin + pd.Timedelta(hours=23), freq="h")
+    lat_c, lon_c = celda(lat, lon)
+    geometria = geometria_horaria(lat_c, lon_c, tiempos)
+    for arreglo in geometria.values():
+        arreglo.setflags(write=False)
+
+    with _bloqueo_memoria:
+        if len(_geometrias_memoria) >= MAXIMO_EN_MEMORIA:
+            _geometrias_memoria.pop(next(iter(_geometrias_memoria)))
+        _geometrias_memoria[clave] = geometria
+    return geometria
+
+
+def fraccion_difusa_erbs(kt):
+    """
+    Fracción difusa de la radiación global según Erbs et al. (1982) en
+    función del índice de claridad `kt`.
+    """
+    kt = np.asarray(kt)
+    intermedia = (((12.336 * kt - 16.638) * kt + 4.388) * kt - 0.1604) * kt + 0.9511  # Forma de Horner
+    return np.where(kt <= 0.22, 1.0 - 0.09 * kt, np.where(kt <= 0.8, intermedia, 0.165))
+
+
+def irradiancia_plano(ghi, geometria, inclinacion=INCLINACION, azimut=AZIMUT_PANEL, albedo=ALBEDO):
+    """
+    Irradiancia sobre el plano de los paneles a partir de la global horizontal.
+
+    La global se separa en directa y difusa con Erbs y se transpone con el
+    modelo isotrópico (directa + difusa de cielo + reflejada por el suelo).
+    `ghi` puede tener cualquier cantidad de dimensiones iniciales (por
+    ejemplo escenarios × horas); la geometría se comparte entre todas.
+
+    Parámetros:
+        ghi (np.ndarray): Global horizontal (..., horas) en W/m² o Wh/m² por hora.
+        geometria (dict): Salida de `geometria_horaria` o `geometria_celda` con las mismas horas.
+        inclinacion (float): Inclinación de los paneles en grados.
+        azimut (float): Orientación de los paneles en grados desde el norte.
+        albedo (float): Reflectividad del suelo.
+
+    Retorna:
+        np.ndarray: Irradiancia en el plano, con la forma y el tipo de `ghi`.
+    """
+    ghi = np.asarray(ghi)
+    tipo = ghi.dtype if np.issubdtype(ghi.dtype, np.floating) else np.dtype(np.float64)
+    coseno_cenit = geometria["coseno_cenit"].astype(tipo)
+    beta = np.radians(inclinacion)
+
+    extraterrestre = geometria["extraterrestre"].astype(tipo)
+    kt = np.clip(ghi / np.where(extraterrestre > 0, extraterrestre, np.inf), 0, 1)
+    difusa = fraccion_difusa_erbs(kt).astype(tipo) * ghi
+
+    coseno_incidencia = (coseno_cenit * np.cos(beta) + np.sin(np.radians(geometria["cenit"])) * np.sin(beta) *
+                         np.cos(np.radians(geometria["azimut"] - azimut))).astype(tipo)
+    factor_directa = np.where(coseno_cenit > COSENO_CENIT_MINIMO,
+                              np.maximum(coseno_incidencia, 0) / np.maximum(coseno_cenit, COSENO_CENIT_MINIMO), 0)
+
+    plano = (ghi - difusa) * factor_directa.astype(tipo) + difusa * tipo.type((1 + np.cos(beta)) / 2) + \
+        ghi * tipo.type(albedo * (1 - np.cos(beta)) / 2)
+    return np.maximum(plano, 0).astype(tipo, copy=False)
@@ -0,0 +1,135 @@
+import os
+import re
+import json
+import hashlib
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from matplotlib.figure import Figure
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+
+# Gráficos dibujados a la vez y cantidad de imágenes generadas que se conservan
+MAX_HILOS_GRAFICOS = int(os.environ.get("LCOE_HILOS_GRAFICOS", 2))
+MAXIMO_IMAGENES = int(os.environ.get("LCOE_MAXIMO_IMAGENES", 500))
+PREFIJO = "lcoe_"
+TIEMPO_ESPERA = 30  # Segundos máximos esperando un gráfico
+
+_pool = ThreadPoolExecutor(max_workers=MAX_HILOS_GRAFICOS, thread_name_prefix="grafico")
+_en_vuelo = {}
+_bloqueo = threading.Lock()
+
+
+def nombre_grafico(especificacion, prefijo=PREFIJO):
+    """
+    Nombre del archivo derivado del contenido del gráfico: la misma
+    especificación produce siempre el mismo archivo.
+    """
+    resumen = hashlib.sha256(json.dumps(especificacion, sort_keys=True).encode()).hexdigest()[:16]
+    return f"{prefijo}{resumen}.png"
+
+
+def _dibujar(especificacion, ruta):
+    """
+    Dibuja un gráfico de líneas con la API orientada a objetos de Matplotlib
+    (Figure + lienzo Agg), sin el estado global de pyplot.
+    """
+    figura = Figure(figsize=especificacion.get("tamano", (6.4, 4.8)))
+    FigureCanvasAgg(figura)
+    ejes = figura.add_subplot()
+    ejes.plot(especificacion["x"], especificacion["y"])
+    ejes.set_title(especificacion.get("titulo", ""))
+    ejes.set_xlabel(especificacion.get("etiqueta_x", ""))
+    ejes.set_ylabel(especificacion.get("etiqueta_y", ""))
+
+    temporal = f"{ruta}.{threading.get_ident()}.tmp"
+    figura.savefig(temporal, format="png")
+    os.replace(temporal, ruta)
+
+
+def desalojar_imagenes(directorio, maximo=MAXIMO_IMAGENES, prefijo=PREFIJO):
+    """
+    Elimina las imágenes generadas menos usadas hasta dejar `maximo`.
+
+    Solo se consideran los archivos con nombre por contenido (`prefijo` + 16
+    dígitos hexadecimales), nunca las imágenes fijas de la carpeta. Los
+    gráficos pedidos con nombre también llevan nombre por contenido, así que
+    entran en el desalojo.
+
+    Retorna:
+        list: Nombres de los archivos eliminados.
+    """
+    patron = re.compile(rf"^{re.escape(prefijo)}[0-9a-f]{{16}}\.png$")
+    generadas = [e for e in os.scandir(directorio) if patron.match(e.name)]
+    if len(generadas) <= maximo:
+        return []
+
+    generadas.sort(key=lambda e: e.stat().st_mtime)
+    eliminadas = []
+    for entrada in generadas[:len(generadas) - maximo]:
+        try:
+            os.remove(entrada.path)
+            eliminadas.append(entrada.name)
+        except FileNotFoundError:
+            pass
+    return eliminadas
+
+
+def renderizar(especificacion, directorio, nombre=None, prefijo=PREFIJO):
+    """
+    Devuelve el nombre de la imagen del gráfico, dibujándola solo si no existe.
+
+    Los gráficos se dibujan en un pool acotado de hilos; pedidos simultáneos
+    del mismo gráfico esperan un único dibujo. Reutilizar una imagen la marca
+    como usada recientemente para el desalojo.
+
+    El archivo siempre se nombra por contenido: un `nombre` pedido entra en el
+    resumen junto con la especificación, de modo que dos gráficos distintos
+    nunca comparten archivo ni dibujo en curso.
+
+    Parámetros:
+        especificacion (dict): 'x', 'y' y opcionalmente 'titulo', 'etiqueta_x', 'etiqueta_y', 'tamano'.
+        directorio (str): Carpeta de imágenes.
+        nombre (str, opcional): Nombre pedido por el cliente, que distingue el archivo de otro
+            con la misma especificación.
+        prefijo (str): Prefijo de los nombres por contenido.
+
+    Retorna:
+        str: Nombre del archivo dentro de `directorio`.
+    """
+    contenido = especificacion if not nombre else {**especificacion, "nombre": str(nombre)}
+    nombre = nombre_grafico(contenido, prefijo)
+    ruta = os.path.join(directorio, nombre)
+    try:
+        os.utime(ruta)
+        return nombre
+    except FileNotFoundError:
+        pass  # No existe o un desalojo concurrente la acaba de borrar: se vuelve a dibujar
+
+    os.makedirs(directorio, exist_ok=True)
+    with _bloqueo:
+        futuro = _en_vuelo.get(ruta)
+        if futuro is None:
+            futuro = _pool.submit(_dibujar, especificacion, ruta)
+            _en_vuelo[ruta] = futuro
+    try:
+        futuro.result(timeout=TIEMPO_ESPERA)
+    finally:
+        if futuro.done():
+            with _bloqueo:
+                if _en_vuelo.get(ruta) is futuro:
+                    del _en_vuelo[ruta]
+
+    desalojar_imagenes(directorio, prefijo=prefijo)
+    return nombre
+
+
+def grafico_lcoe(lcoe, directorio, nombre=None):
+    """
+    Gráfico de proyección del LCOE de /calcular_lcoe.
+
+    Retorna:
+        str: Nombre del archivo dentro de `directorio`.
+    """
+    lcoe = round(float(lcoe), 10)
+    especificacion = {"x": [1, 2, 3], "y": [lcoe, round(lcoe * 1.1, 10), round(lcoe * 0.9, 10)],
+                      "titulo": "LCOE Proyección"}
+    return renderizar(especificacion, directorio, nombre)
@@ -0,0 +1,195 @@
+import os
+import json
+import time
+import shutil
+import threading
+import numpy as np
+from contextlib import contextmanager
+
+# Resolución de la grilla del archivo de OpenMeteo (ERA5-Land, 0.1°). Dos puntos
+# dentro de la misma celda reciben exactamente la misma serie.
+RESOLUCION_GRILLA = 0.1
+
+# Tamaño máximo del almacén climático en disco antes de desalojar celdas
+LIMITE_BYTES_CLIMA = 2 * 1024 ** 3
+# Segundos desde el último acceso en que una celda no se desaloja: cubre las
+# lecturas de otros procesos (por ejemplo, los del pool del mapa), que el
+# registro de celdas en uso de este proceso no ve
+GRACIA_DESALOJO = 600
+
+ARCHIVO_INDICE = "indice.json"
+
+_bloqueo_indice = threading.Lock()
+_bloqueo_registro = threading.Lock()
+_bloqueos_celda = {}  # clave -> [lock, cantidad de usuarios]
+_usos_celda = {}  # clave -> cantidad de pedidos que están leyendo o simulando la celda
+
+
+def celda(lat, lon, resolucion=RESOLUCION_GRILLA):
+    """
+    Ajusta unas coordenadas al centro de la celda de la grilla.
+
+    Parámetros:
+        lat (float o array): Latitud.
+        lon (float o array): Longitud.
+        resolucion (float): Tamaño de celda en grados.
+
+    Retorna:
+        tuple: (lat, lon) del centro de la celda, redondeadas para que la clave sea estable.
+    """
+    decimales = max(0, int(np.ceil(-np.log10(resolucion))) + 1)
+    lat_c = np.round(np.round(np.asarray(lat, dtype=float) / resolucion) * resolucion, decimales)
+    lon_c = np.round(np.round(np.asarray(lon, dtype=float) / resolucion) * resolucion, decimales)
+    if lat_c.ndim == 0:
+        return float(lat_c), float(lon_c)
+    return lat_c, lon_c
+
+
+def clave_celda(lat, lon, resolucion=RESOLUCION_GRILLA):
+    """
+    Devuelve la clave de la celda que contiene a las coordenadas.
+    """
+    lat_c, lon_c = celda(lat, lon, resolucion)
+    return f"{lat_c}_{lon_c}"
+
+
+@contextmanager
+def bloqueo_celda(clave):
+    """
+    Toma el lock de una celda, para que pedidos concurrentes a la misma
+    celda esperen una única descarga en lugar de repetirla.
+
+    El lock existe solo mientras alguien lo usa o lo espera: al liberarlo
+    el último se quita del registro, que no crece con las claves vistas.
+    """
+    with _bloqueo_registro:
+        entrada = _bloqueos_celda.setdefault(clave, [threading.Lock(), 0])
+        entrada[1] += 1
+    try:
+        with entrada[0]:
+            yield
+    finally:
+        with _bloqueo_registro:
+            entrada[1] -= 1
+            if entrada[1] == 0:
+                del _bloqueos_celda[clave]
+
+
+@contextmanager
+def celda_en_uso(clave):
+    """
+    Marca una celda como en uso mientras dura el bloque, para que `desalojar`
+    no la elimine entre la descarga y la lectura o la simulación del pedido.
+    """
+    with _bloqueo_registro:
+        _usos_celda[clave] = _usos_celda.get(clave, 0) + 1
+    try:
+        yield
+    finally:
+        with _bloqueo_registro:
+            _usos_celda[clave] -= 1
+            if _usos_celda[clave] == 0:
+                del _usos_celda[clave]
+
+
+def _en_uso(clave):
+    with _bloqueo_registro:
+        return clave in _usos_celda or clave in _bloqueos_celda
+
+
+def _leer_indice(base):
+    ruta = os.path.join(base, ARCHIVO_INDICE)
+    if not os.path.exists(ruta):
+        return {}
+    with open(ruta) as f:
+        return json.load(f)
+
+
+def _escribir_indice(base, indice):
+    os.makedirs(base, exist_ok=True)
+    ruta = os.path.join(base, ARCHIVO_INDICE)
+    temporal = f"{ruta}.{os.getpid()}.{threading.get_ident()}.tmp"
+    with open(temporal, "w") as f:
+        json.dump(indice, f)
+    os.replace(temporal, ruta)
+
+
+def _tamano_directorio(directorio):
+    total = 0
+    for raiz, _, archivos in os.walk(directorio):
+        total += sum(os.path.getsize(os.path.join(raiz, a)) for a in archivos)
+    return total
+
+
+def registrar_acceso(base, clave, directorio, ultimo_tiempo=None):
+    """
+    Registra el uso de una celda en el índice (fecha de último acceso y tamaño
+    en disco). Si se indica `ultimo_tiempo` (segundos UTC), se guarda como el
+    último instante almacenado para la celda.
+    """
+    with _bloqueo_indice:
+        indice = _leer_indice(base)
+        entrada = indice.get(clave, {})
+        entrada.update({
+            "directorio": directorio,
+            "ultimo_acceso": time.time(),
+            "bytes": _tamano_directorio(directorio),
+        })
+        if ultimo_tiempo is not None:
+            entrada["ultimo_tiempo"] = int(ultimo_tiempo)
+        indice[clave] = entrada
+        _escribir_indice(base, indice)
+
+
+def registrar_csv(base, clave, archivo, huella):
+    """
+    Asocia a la celda su exportación CSV y la huella de los datos con que se
+    generó; el CSV ocupa lugar en el almacén y se desaloja junto con la celda.
+    """
+    with _bloqueo_indice:
+        indice = _leer_indice(base)
+        if clave not in indice:
+            return
+        indice[clave]["csv"] = {"archivo": archivo, "huella": huella, "bytes": os.path.getsize(archivo)}
+        _escribir_indice(base, indice)
+
+
+def consultar_indice(base, clave):
+    """
+    Devuelve la entrada del índice para una celda, o None si no está registrada.
+    """
+    with _bloqueo_indice:
+        return _leer_indice(base).get(clave)
+
+
+def desalojar(base, limite_bytes=LIMITE_BYTES_CLIMA):
+    """
+    Elimina las celdas usadas hace más tiempo (LRU), con su CSV exportado,
+    hasta que el almacén ocupe como máximo `limite_bytes`. No se eliminan las
+    celdas en uso (`celda_en_uso` o `bloqueo_celda`) ni las accedidas en los
+    últimos GRACIA_DESALOJO segundos.
+
+    Retorna:
+        list: Claves de las celdas eliminadas.
+    """
+    def _bytes(entrada):
+        return entrada["bytes"] + entrada.get("csv", {}).get("bytes", 0)
+
+    eliminadas = []
+    with _bloqueo_indice:
+        indice = _leer_indice(base)
+        total = sum(_bytes(entrada) for entrada in indice.values())
+        recientes = time.time() - GRACIA_DESALOJO
+        for clave, entrada in sorted(indice.items(), key=lambda item: item[1]["ultimo_acceso"]):
+            if total <= limite_bytes:
+                break
+            if entrada["ultimo_acceso"] > recientes or _en_uso(clave):
+                continue
+            shutil.rmtree(entrada["directorio"], ignore_errors=True)
+            if "csv" in entrada and os.path.exists(entrada["csv"]["archivo"]):
+                os.remove(entrada["csv"]["archivo"])
+            total -= _bytes(entrada)
+            del indice[clave]
+            eliminadas.append(clave)
+        _escribir_indice(base, indice)
+    return eliminadas
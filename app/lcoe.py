@@ -0,0 +1,140 @@
+import numpy as np
+
+# Parámetros de la simulación Monte Carlo de src/scripts/LCOE.R
+CAPEX_TRIANGULAR = (2230, 3190, 4150)  # Mínimo, moda y máximo en US$/kW
+WACC_UNIFORME = (0.04, 0.10)
+NSIM = 1000
+SEMILLA = 1995
+
+# Año de referencia del descuento (t = año - 2020)
+ANIO_BASE = 2020
+CUANTILES = (0.1, 0.5, 0.9)
+
+
+def muestrear_parametros(nsim=NSIM, semilla=SEMILLA, capex=CAPEX_TRIANGULAR, wacc=WACC_UNIFORME):
+    """
+    Genera los parámetros financieros de cada escenario: CAPEX triangular y WACC uniforme.
+
+    Parámetros:
+        nsim (int): Número de escenarios.
+        semilla (int o np.random.Generator): Semilla o generador.
+        capex (tuple): (mínimo, moda, máximo) del CAPEX en US$/kW.
+        wacc (tuple): (mínimo, máximo) del WACC como fracción.
+
+    Retorna:
+        dict: Arreglos 'inv' y 'rate' de largo nsim.
+    """
+    rng = np.random.default_rng(semilla)
+    minimo, moda, maximo = capex
+    return {"inv": rng.triangular(minimo, moda, maximo, nsim), "rate": rng.uniform(wacc[0], wacc[1], nsim)}
+
+
+def matriz_descuento(rate, anios, anio_base=ANIO_BASE):
+    """
+    Factores de descuento (1 + rate)^-(año - anio_base) de cada escenario y año.
+
+    Parámetros:
+        rate (float o array): WACC por escenario.
+        anios (array): Años de las columnas de energía.
+        anio_base (int): Año de referencia.
+
+    Retorna:
+        np.ndarray: Matriz (escenarios, años).
+    """
+    t = np.asarray(anios) - anio_base
+    return (1 + np.asarray(rate, dtype=float)[..., None]) ** -t
+
+
+def lcoe_montecarlo(energia, inv, rate, anios, anio_base=ANIO_BASE):
+    """
+    LCOE de todos los escenarios en una sola operación, como src/scripts/LCOE.R:
+    LCOE = inv / Σ energía·(1 + rate)^-(año - anio_base) · 1000.
+
+    Parámetros:
+        energia (array): Energía anual (escenarios, años), o un único perfil (años,)
+            compartido por todos los escenarios.
+        inv (float o array): CAPEX por escenario.
+        rate (float o array): WACC por escenario.
+        anios (array): Años de las columnas de energía.
+        anio_base (int): Año de referencia del descuento.
+
+    Retorna:
+        np.ndarray: LCOE por escenario.
+    """
+    energia = np.asarray(energia, dtype=float)
+    valor_presente = np.einsum("...j,...j->...", energia, matriz_descuento(rate, anios, anio_base))
+    return np.asarray(inv, dtype=float) / valor_presente * 1000
+
+
+def resumen_lcoe(lcoe, cuantiles=CUANTILES):
+    """
+    Estadísticas del LCOE por escenario: media, desvío y cuantiles.
+    """
+    lcoe = np.asarray(lcoe, dtype=float)
+    resumen = {"media": float(lcoe.mean()), "desvio": float(lcoe.std())}
+    resumen.update({f"p{round(p * 100)}": float(v) for p, v in zip(cuantiles, np.quantile(lcoe, cuantiles))})
+    return resumen
+
+
+def factor_anualidad(tasa, vida):
+    """
+    Factor de anualidad A = Σ_{t=1..vida} (1 + tasa)^-t, elemento a elemento,
+    con la forma cerrada A = (1 - (1 + tasa)^-vida) / tasa (y A = vida con
+    tasa 0), que es exacta también para vidas útiles no enteras.
+
+    Parámetros:
+        tasa (float o array): Tasa de descuento como fracción.
+        vida (int, float o array): Vida útil en años.
+
+    Retorna:
+        np.ndarray: Factores de anualidad con la forma difundida de las entradas.
+    """
+    tasa, vida = np.broadcast_arrays(np.asarray(tasa, dtype=float), np.asarray(vida, dtype=float))
+    with np.errstate(divide="ignore", invalid="ignore"):
+        return np.where(tasa == 0, vida, -np.expm1(-vida * np.log1p(tasa)) / tasa)
+
+
+def lcoe_anualizado(capital_cost, operating_cost, energy_production, tasa, vida):
+    """
+    LCOE con costos y energía anuales constantes, para cualquier combinación
+    de escalares y arreglos:
+
+        LCOE = (C + O·A) / (E·A) = (C / A + O) / E,   A = factor_anualidad(tasa, vida)
+
+    Parámetros:
+        capital_cost (float o array): Costo de capital (US$/kW).
+        operating_cost (float o array): Costo operativo anual (US$/kW/año).
+        energy_production (float o array): Energía anual (kWh/año).
+        tasa (float o array): Tasa de descuento como fracción.
+        vida (int, float o array): Vida útil en años.
+
+    Retorna:
+        float o np.ndarray: LCOE por combinación de parámetros.
+    """
+    anualidad = factor_anualidad(tasa, vida)
+    lcoe = (np.asarray(capital_cost, dtype=float) / anualidad + np.asarray(operating_cost, dtype=float)) / \
+        np.asarray(energy_production, dtype=float)
+    return float(lcoe) if lcoe.ndim == 0 else lcoe
+
+
+def barrido_lcoe(tasas, vidas, capital_cost, operating_cost, energy_production):
+    """
+    LCOE sobre la grilla tasas × vidas útiles × costos de capital. Los
+    factores de anualidad se evalúan con la forma cerrada sobre la grilla
+    tasas × vidas, sin materializar la suma año por año.
+
+    Parámetros:
+        tasas (array): Tasas de descuento como fracción.
+        vidas (array): Vidas útiles enteras en años.
+        capital_cost (array): Costos de capital (US$/kW).
+        operating_cost (float): Costo operativo anual (US$/kW/año).
+        energy_production (float): Energía anual (kWh/año).
+
+    Retorna:
+        np.ndarray: Grilla (tasas, vidas, costos de capital).
+    """
+    tasas = np.atleast_1d(np.asarray(tasas, dtype=float))
+    vidas = np.atleast_1d(np.asarray(vidas, dtype=float))
+    anualidad = factor_anualidad(tasas[:, None], vidas[None, :])
+    capital = np.atleast_1d(np.asarray(capital_cost, dtype=float))
+    return (capital / anualidad[..., None] + operating_cost) / energy_production
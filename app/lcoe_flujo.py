@@ -0,0 +1,164 @@
+import os
+import time
+import argparse
+import numpy as np
+
+from app.simulacion import simular_modelo, fechas_simulacion
+from app.simulacion_paralela import BLOQUE_ESCENARIOS, MAX_PROCESOS, mapear_en_pool
+from app.lcoe import lcoe_montecarlo, muestrear_parametros, ANIO_BASE, CUANTILES
+from app.modelo_fv import energia_anual, HORAS_SOL_DIA
+
+
+# Veces que se actualizan los cuantiles parciales a lo largo de una corrida
+# (además del final): cada actualización recorre todos los escenarios ya calculados.
+ACTUALIZACIONES_CUANTILES = 20
+
+
+def _energia_bloque(modelo, desde, hasta, n, semilla, sistema):
+    """
+    Simula un bloque de escenarios y lo reduce de inmediato a energía anual.
+    """
+    fechas, valores = simular_modelo(modelo, desde, hasta, nsim=n, rng=np.random.default_rng(semilla))
+    return energia_anual(valores, np.asarray(fechas.year), sistema, horas=HORAS_SOL_DIA)[1]
+
+
+def anios_simulacion(desde, hasta):
+    """
+    Años cubiertos por la simulación, en el orden de las columnas de energía.
+    """
+    return np.unique(np.asarray(fechas_simulacion(desde, hasta).year))
+
+
+def energia_anual_en_flujo(modelo, desde, hasta, nsim=1000, semilla=1995, sistema=None,
+                           max_procesos=MAX_PROCESOS, bloque=BLOQUE_ESCENARIOS):
+    """
+    Genera la energía anual de los escenarios bloque a bloque, sin guardar
+    las series diarias.
+
+    Los bloques y sus semillas son los mismos que usa `simular_paralelo`, por
+    lo que la radiación es la de su almacén. La conversión a energía usa el
+    modelo del sistema de `app/modelo_fv.py`. Los bloques corren en el pool
+    compartido de `app/simulacion_paralela.py` y cada uno devuelve solo la
+    matriz (bloque × años).
+
+    Parámetros:
+        modelo (dict): Salida de `ajustar_modelo`.
+        desde, hasta (str o datetime): Rango de fechas a simular.
+        nsim (int): Número de escenarios.
+        semilla (int): Semilla raíz.
+        sistema (dict, opcional): Configuración de `sistema_fv` (por defecto SISTEMA).
+        max_procesos (int): Bloques pendientes a la vez (1 simula en el proceso actual).
+        bloque (int): Escenarios por bloque.
+
+    Genera:
+        tuple: (índice del primer escenario del bloque, np.ndarray (bloque, años)).
+    """
+    inicios = list(range(0, nsim, bloque))
+    semillas = np.random.SeedSequence(semilla).spawn(len(inicios))
+    tamanos = [min(bloque, nsim - inicio) for inicio in inicios]
+    tareas = [(modelo, desde, hasta, n, s, sistema) for n, s in zip(tamanos, semillas)]
+    yield from zip(inicios, mapear_en_pool(_energia_bloque, tareas, max_procesos))
+
+
+def lcoe_en_flujo(modelo, desde, hasta, inv, rate, nsim=1000, semilla=1995, sistema=None,
+                  anio_base=ANIO_BASE, cuantiles=CUANTILES, max_procesos=MAX_PROCESOS, bloque=BLOQUE_ESCENARIOS,
+                  actualizaciones=ACTUALIZACIONES_CUANTILES):
+    """
+    Calcula el LCOE de cada escenario a medida que se simulan, como
+    src/scripts/LCOE.R: LCOE = inv / Σ energía·(1 + rate)^-(año - anio_base) · 1000.
+
+    Solo se conservan el LCOE por escenario y sus cuantiles; la memoria
+    usada por las series simuladas es la de un bloque, de modo que `nsim`
+    puede ser del orden de 100 000. Los cuantiles parciales se recalculan
+    cada nsim / `actualizaciones` escenarios (y al terminar), no después de
+    cada bloque, así que su costo total no crece con nsim².
+
+    Parámetros:
+        modelo (dict): Salida de `ajustar_modelo`.
+        desde, hasta (str o datetime): Rango de fechas a simular.
+        inv (float o array): CAPEX por escenario (US$/kW).
+        rate (float o array): WACC por escenario (fracción).
+        nsim (int): Número de escenarios.
+        semilla (int): Semilla raíz.
+        sistema (dict, opcional): Configuración de `sistema_fv` (por defecto SISTEMA).
+        anio_base (int): Año de referencia del descuento.
+        cuantiles (tuple): Probabilidades de los cuantiles a seguir.
+        max_procesos (int): Procesos simultáneos.
+        bloque (int): Escenarios por bloque.
+        actualizaciones (int): Veces que se informan cuantiles parciales.
+
+    Genera:
+        dict: En cada actualización y al final, 'escenarios' procesados,
+        'cuantiles' parciales y 'lcoe' (vista de los escenarios ya calculados).
+    """
+    inv = np.broadcast_to(np.asarray(inv, dtype=float), (nsim,))
+    rate = np.broadcast_to(np.asarray(rate, dtype=float), (nsim,))
+    anios = anios_simulacion(desde, hasta)
+
+    intervalo = max(bloque, -(-nsim // max(1, actualizaciones)))
+    proxima = intervalo
+
+    lcoe = np.empty(nsim)
+    for inicio, energia in energia_anual_en_flujo(modelo, desde, hasta, nsim, semilla, sistema, max_procesos,
+                                                  bloque):
+        fin = inicio + len(energia)
+        lcoe[inicio:fin] = lcoe_montecarlo(energia, inv[inicio:fin], rate[inicio:fin], anios, anio_base)
+        if fin >= proxima or fin == nsim:
+            proxima = fin + intervalo
+            yield {"escenarios": fin, "cuantiles": dict(zip(cuantiles, np.quantile(lcoe[:fin], cuantiles))),
+                   "lcoe": lcoe[:fin]}
+
+
+def lcoe_escenarios(modelo, desde, hasta, inv, rate, nsim=1000, **kwargs):
+    """
+    Consume `lcoe_en_flujo` y devuelve el resultado final.
+
+    Retorna:
+        tuple: (np.ndarray con el LCOE de cada escenario, dict de cuantiles).
+    """
+    estado = None
+    for estado in lcoe_en_flujo(modelo, desde, hasta, inv, rate, nsim=nsim, **kwargs):
+        pass
+    return estado["lcoe"], estado["cuantiles"]
+
+
+if __name__ == "__main__":
+    from app.cache_modelos import obtener_modelo
+    from app.modelo_fv import sistema_fv
+
+    parser = argparse.ArgumentParser(description="LCOE por escenario sin guardar las simulaciones diarias.")
+    parser.add_argument("lat", type=float)
+    parser.add_argument("lon", type=float)
+    parser.add_argument("--capex", type=float, help="CAPEX fijo en US$/kW (por defecto triangular 2230/3190/4150).")
+    parser.add_argument("--wacc", type=float, help="WACC fijo (por defecto uniforme entre 0.04 y 0.10).")
+    parser.add_argument("--desde", default="2024-01-01")
+    parser.add_argument("--hasta", default="2044-12-31")
+    parser.add_argument("--nsim", type=int, default=1000)
+    parser.add_argument("--semilla", type=int, default=1995)
+    parser.add_argument("--procesos", type=int, default=MAX_PROCESOS)
+    parser.add_argument("--kwp", type=float, help="Potencia pico del sistema en kW (por defecto eficiencia × área).")
+    parser.add_argument("--degradacion", type=float, help="Degradación anual del sistema (fracción).")
+    parser.add_argument("--salida", help="Archivo .npy donde guardar el LCOE por escenario.")
+    args = parser.parse_args()
+
+    modelo = obtener_modelo(args.lat, args.lon)
+    if modelo is None:
+        raise SystemExit("No hay datos climáticos para la ubicación.")
+
+    parametros = muestrear_parametros(args.nsim, args.semilla)
+    inv = parametros["inv"] if args.capex is None else args.capex
+    rate = parametros["rate"] if args.wacc is None else args.wacc
+
+    cambios = {"kwp": args.kwp, "degradacion_anual": args.degradacion}
+    sistema = sistema_fv(**{clave: valor for clave, valor in cambios.items() if valor is not None})
+
+    t0 = time.perf_counter()
+    for estado in lcoe_en_flujo(modelo, args.desde, args.hasta, inv, rate, nsim=args.nsim,
+                                semilla=args.semilla, sistema=sistema, max_procesos=args.procesos):
+        resumen = ", ".join(f"P{int(p * 100)}={v:.1f}" for p, v in estado["cuantiles"].items())
+        print(f"[{estado['escenarios']}/{args.nsim}] {resumen}")
+
+    print(f"LCOE de {args.nsim} escenarios en {time.perf_counter() - t0:.2f} s.")
+    if args.salida:
+        os.makedirs(os.path.dirname(args.salida) or ".", exist_ok=True)
+        np.save(args.salida, estado["lcoe"])
@@ -0,0 +1,241 @@
+import os
+import json
+import math
+import time
+import argparse
+import numpy as np
+
+from app.cache_modelos import obtener_modelo
+from app.cache_resultados import clave_pedido
+from app.calcular_proyeccion_lcoe import INICIO_SIMULACION
+from app.indice_ubicaciones import celda, clave_celda, celda_en_uso, RESOLUCION_GRILLA
+from app.lcoe import muestrear_parametros, CAPEX_TRIANGULAR, WACC_UNIFORME, SEMILLA, CUANTILES
+from app.lcoe_flujo import lcoe_escenarios
+from app.simulacion_paralela import MAX_PROCESOS, mapear_en_pool
+from app.utils import URUGUAY_POLYGON, validate_coordinates_batch
+
+RESOLUCION_MAPA = RESOLUCION_GRILLA
+NSIM_MAPA = 256  # Escenarios por celda
+NSIM_MAXIMO_MAPA = 4096  # Se multiplica por la cantidad de celdas (hasta MAXIMO_CELDAS)
+HASTA_MAPA = "2044-12-31"
+MAXIMO_CELDAS = 20_000
+
+DIRECTORIO_MAPAS = os.path.join("data", "mapas")
+ARCHIVO_RASTER = "lcoe.npy"
+ARCHIVO_META = "meta.json"
+
+
+def grilla(bbox=None, resolucion=RESOLUCION_MAPA):
+    """
+    Centros de la grilla dentro de un recuadro, alineados a múltiplos de la resolución.
+
+    Parámetros:
+        bbox (tuple, opcional): (oeste, sur, este, norte) en grados (por defecto Uruguay).
+        resolucion (float): Paso de la grilla en grados.
+
+    Retorna:
+        tuple: (latitudes de las filas, de norte a sur; longitudes de las columnas, de oeste a este).
+    """
+    oeste, sur, este, norte = URUGUAY_POLYGON.bounds if bbox is None else (float(v) for v in bbox)
+    if not (oeste < este and sur < norte and resolucion > 0):
+        raise ValueError("El recuadro debe ser (oeste, sur, este, norte) con oeste < este y sur < norte.")
+    with np.errstate(over="ignore"):
+        indices = np.array([oeste, sur, este, norte]) / resolucion
+    if not (np.isfinite(resolucion) and np.isfinite(indices).all()):
+        raise ValueError("El recuadro y la resolución deben dar una grilla finita.")
+
+    # Índices extremos de la grilla; las celdas se cuentan antes de crear los arreglos
+    oeste_i, sur_i, este_i, norte_i = indices.tolist()
+    norte_i, sur_i = math.floor(norte_i + 1e-9), math.ceil(sur_i - 1e-9)
+    oeste_i, este_i = math.ceil(oeste_i - 1e-9), math.floor(este_i + 1e-9)
+    celdas = max(norte_i - sur_i + 1, 0) * max(este_i - oeste_i + 1, 0)
+    if celdas > MAXIMO_CELDAS:
+        raise ValueError(f"La grilla tiene {celdas} celdas (máximo {MAXIMO_CELDAS}).")
+
+    filas = np.arange(norte_i, sur_i - 1, -1)
+    columnas = np.arange(oeste_i, este_i + 1)
+    lats, lons = celda(filas * resolucion, columnas * resolucion, resolucion)
+    return np.atleast_1d(lats), np.atleast_1d(lons)
+
+
+def _cuantiles_celda(lat, lon, hasta, inv, rate, nsim, semilla, sistema, cuantiles):
+    """
+    Cuantiles del LCOE de una celda, con el modelo de la caché. NaN si no hay datos climáticos.
+    """
+    with celda_en_uso(clave_celda(lat, lon)):
+        modelo = obtener_modelo(lat, lon)
+    if modelo is None:
+        return np.full(len(cuantiles), np.nan)
+    lcoe, _ = lcoe_escenarios(modelo, INICIO_SIMULACION, hasta, inv, rate, nsim=nsim, semilla=semilla,
+                              sistema=sistema, max_procesos=1)
+    return np.quantile(lcoe, cuantiles)
+
+
+def parametros_mapa(bbox=None, resolucion=RESOLUCION_MAPA, hasta=HASTA_MAPA, nsim=NSIM_MAPA, semilla=SEMILLA,
+                    capex=CAPEX_TRIANGULAR, wacc=WACC_UNIFORME, sistema=None, cuantiles=CUANTILES):
+    """
+    Parámetros canónicos del mapa; su resumen identifica el mapa en disco.
+    """
+    return {
+        "bbox": [float(v) for v in (URUGUAY_POLYGON.bounds if bbox is None else bbox)],
+        "resolucion": float(resolucion),
+        "hasta": str(hasta),
+        "nsim": int(nsim),
+        "semilla": int(semilla),
+        "capex": [float(v) for v in capex],
+        "wacc": [float(v) for v in wacc],
+        "sistema": sistema,
+        "cuantiles": [float(p) for p in cuantiles],
+    }
+
+
+def clave_mapa(parametros):
+    """
+    Clave del mapa en disco: resumen de sus parámetros canónicos.
+    """
+    return clave_pedido("mapa_lcoe", parametros)[:16]
+
+
+def cargar_mapa(clave, directorio=DIRECTORIO_MAPAS):
+    """
+    Abre un mapa ya calculado.
+
+    Retorna:
+        tuple: (np.memmap (cuantiles, filas, columnas) float32, dict de metadatos), o None si no existe.
+    """
+    ruta = os.path.join(directorio, os.path.basename(clave))
+    if not os.path.exists(os.path.join(ruta, ARCHIVO_META)):
+        return None
+    with open(os.path.join(ruta, ARCHIVO_META)) as f:
+        meta = json.load(f)
+    return np.load(os.path.join(ruta, ARCHIVO_RASTER), mmap_mode="r"), meta
+
+
+def calcular_mapa(parametros=None, descargar=False, recalcular=False, max_procesos=MAX_PROCESOS,
+                  directorio=DIRECTORIO_MAPAS, progreso=None):
+    """
+    Mapa de LCOE sobre una grilla: cuantiles del LCOE de cada celda válida.
+
+    Las celdas se filtran de una vez con `validate_coordinates_batch` y se
+    reparten en el pool de procesos compartido; cada una usa el modelo
+    ajustado de la caché y el LCOE por escenario en flujo, con los mismos
+    CAPEX y WACC muestreados en todas las celdas, de modo que el mapa
+    compara solo las ubicaciones.
+    El resultado se guarda como un arreglo float32 (cuantiles, filas,
+    columnas), con NaN fuera del país o sin datos, y un meta.json; pedir
+    de nuevo el mismo mapa devuelve el guardado salvo con `recalcular`
+    (por ejemplo, después de descargar el clima de más celdas).
+
+    Parámetros:
+        parametros (dict, opcional): Salida de `parametros_mapa`.
+        descargar (bool): Sincronizar antes el clima de las celdas con la descarga masiva.
+        recalcular (bool): Ignorar el mapa guardado.
+        max_procesos (int): Celdas pendientes a la vez.
+        directorio (str): Carpeta de los mapas.
+        progreso (callable, opcional): Recibe la fracción de celdas calculadas.
+
+    Retorna:
+        dict: Metadatos del mapa (clave, ejes, cuantiles y conteo de celdas).
+    """
+    parametros = parametros or parametros_mapa()
+    clave = clave_mapa(parametros)
+    existente = None if recalcular else cargar_mapa(clave, directorio)
+    if existente is not None:
+        return existente[1]
+
+    t0 = time.perf_counter()
+    lats, lons = grilla(parametros["bbox"], parametros["resolucion"])
+    lat_grilla, lon_grilla = np.meshgrid(lats, lons, indexing="ij")
+    validas = validate_coordinates_batch(lat_grilla, lon_grilla)
+    filas, columnas = np.nonzero(validas)
+    coordenadas = list(zip(lats[filas].tolist(), lons[columnas].tolist()))
+
+    if descargar and coordenadas:
+        from app.descarga_masiva import descargar_sitios
+        descargar_sitios(coordenadas)
+
+    financieros = muestrear_parametros(parametros["nsim"], parametros["semilla"], tuple(parametros["capex"]),
+                                       tuple(parametros["wacc"]))
+    cuantiles = tuple(parametros["cuantiles"])
+    argumentos = [(lat, lon, parametros["hasta"], financieros["inv"], financieros["rate"], parametros["nsim"],
+                   parametros["semilla"], parametros["sistema"], cuantiles) for lat, lon in coordenadas]
+
+    raster = np.full((len(cuantiles), len(lats), len(lons)), np.nan, dtype=np.float32)
+    for i, valores in enumerate(mapear_en_pool(_cuantiles_celda, argumentos, max_procesos)):
+        raster[:, filas[i], columnas[i]] = valores
+        if progreso is not None:
+            progreso((i + 1) / len(argumentos))
+
+    meta = {
+        "clave": clave,
+        "parametros": parametros,
+        "lats": lats.tolist(),
+        "lons": lons.tolist(),
+        "forma": list(raster.shape),
+        "celdas_validas": len(coordenadas),
+        "celdas_con_datos": int(np.isfinite(raster[0]).sum()),
+        "tiempo_segundos": time.perf_counter() - t0,
+    }
+
+    ruta = os.path.join(directorio, clave)
+    os.makedirs(ruta, exist_ok=True)
+    temporal = os.path.join(ruta, f"{ARCHIVO_RASTER}.{os.getpid()}.tmp")
+    with open(temporal, "wb") as f:
+        np.save(f, raster)
+    os.replace(temporal, os.path.join(ruta, ARCHIVO_RASTER))
+    temporal = os.path.join(ruta, f"{ARCHIVO_META}.{os.getpid()}.tmp")
+    with open(temporal, "w") as f:
+        json.dump(meta, f)
+    os.replace(temporal, os.path.join(ruta, ARCHIVO_META))
+    return meta
+
+
+def mapa_geojson(raster, meta, decimales=2):
+    """
+    Capa GeoJSON del mapa: un polígono por celda con datos y sus cuantiles
+    del LCOE (US$/MWh) como propiedades.
+
+    Retorna:
+        dict: FeatureCollection.
+    """
+    raster = np.asarray(raster)
+    lats, lons = np.asarray(meta["lats"]), np.asarray(meta["lons"])
+    medio = meta["parametros"]["resolucion"] / 2
+    nombres = [f"p{round(p * 100)}" for p in meta["parametros"]["cuantiles"]]
+
+    filas, columnas = np.nonzero(np.isfinite(raster).all(axis=0))
+    valores = np.round(raster[:, filas, columnas].astype(float), decimales).T.tolist()
+    features = []
+    for lat, lon, celda_valores in zip(lats[filas].tolist(), lons[columnas].tolist(), valores):
+        oeste, este, sur, norte = (round(v, 6) for v in (lon - medio, lon + medio, lat - medio, lat + medio))
+        features.append({
+            "type": "Feature",
+            "geometry": {"type": "Polygon",
+                         "coordinates": [[[oeste, sur], [este, sur], [este, norte], [oeste, norte], [oeste, sur]]]},
+            "properties": {"lat": lat, "lon": lon, **dict(zip(nombres, celda_valores))},
+        })
+    return {"type": "FeatureCollection", "features": features}
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Mapa de LCOE (P10/P50/P90) sobre una grilla de Uruguay.")
+    parser.add_argument("--bbox", nargs=4, type=float, metavar=("OESTE", "SUR", "ESTE", "NORTE"))
+    parser.add_argument("--resolucion", type=float, default=RESOLUCION_MAPA)
+    parser.add_argument("--hasta", default=HASTA_MAPA)
+    parser.add_argument("--nsim", type=int, default=NSIM_MAPA)
+    parser.add_argument("--semilla", type=int, default=SEMILLA)
+    parser.add_argument("--procesos", type=int, default=MAX_PROCESOS)
+    parser.add_argument("--descargar", action="store_true", help="Sincronizar antes el clima de las celdas.")
+    parser.add_argument("--recalcular", action="store_true", help="Ignorar el mapa guardado.")
+    parser.add_argument("--geojson", help="Archivo donde guardar la capa GeoJSON.")
+    args = parser.parse_args()
+
+    parametros = parametros_mapa(args.bbox, args.resolucion, args.hasta, args.nsim, args.semilla)
+    meta = calcular_mapa(parametros, descargar=args.descargar, recalcular=args.recalcular,
+                         max_procesos=args.procesos,
+                         progreso=lambda fraccion: print(f"\r{fraccion:.0%}", end="", flush=True))
+    print(f"\nMapa {meta['clave']}: {meta['celdas_con_datos']}/{meta['celdas_validas']} celdas con datos.")
+    if args.geojson:
+        raster, meta = cargar_mapa(meta["clave"])
+        with open(args.geojson, "w") as f:
+            json.dump(mapa_geojson(raster, meta), f)
@@ -0,0 +1,146 @@
+import numpy as np
+from functools import lru_cache
+
+IRRADIANCIA_STC = 1000.0  # W/m² de las condiciones estándar de ensayo
+TEMPERATURA_STC = 25.0  # °C
+HORAS_SOL_DIA = 12  # Horas sobre las que se reparte un total diario al estimar la irradiancia media
+
+# Sistema por defecto: el arreglo de los scripts originales (15,3% de eficiencia y 6,545 m²)
+# con pérdidas térmicas, del inversor y degradación anual típicas.
+SISTEMA = {
+    "eficiencia": 0.153,
+    "area": 6.545,  # m²
+    "kwp": None,  # Potencia pico en kW; si se indica, reemplaza eficiencia × área
+    "coef_temperatura": -0.004,  # Variación relativa de potencia por °C
+    "noct": 45.0,  # Temperatura nominal de operación de la celda (°C)
+    "temperatura_ambiente": 17.0,  # °C
+    "perdidas_inversor": 0.04,
+    "degradacion_anual": 0.005,
+}
+
+
+def sistema_fv(**cambios):
+    """
+    Arma la configuración del sistema a partir de SISTEMA.
+
+    Parámetros:
+        **cambios: Valores a reemplazar (mismas claves que SISTEMA).
+
+    Retorna:
+        dict: Configuración completa y validada.
+    """
+    sistema = dict(SISTEMA)
+    for clave, valor in cambios.items():
+        if clave not in SISTEMA:
+            raise ValueError(f"Parámetro del sistema desconocido: {clave}")
+        sistema[clave] = None if valor is None else float(valor)
+
+    if not 0 < sistema["eficiencia"] <= 1:
+        raise ValueError("La eficiencia debe estar entre 0 y 1.")
+    if sistema["kwp"] is None and not sistema["area"] > 0:
+        raise ValueError("El área debe ser positiva.")
+    if sistema["kwp"] is not None and not sistema["kwp"] > 0:
+        raise ValueError("La potencia pico debe ser positiva.")
+    for clave in ("perdidas_inversor", "degradacion_anual"):
+        if not 0 <= sistema[clave] < 1:
+            raise ValueError(f"{clave} debe estar entre 0 y 1.")
+    return sistema
+
+
+def potencia_pico(sistema=None):
+    """
+    Potencia pico del arreglo en kW (eficiencia × área × 1 kW/m², o `kwp`).
+    """
+    sistema = sistema or SISTEMA
+    if sistema["kwp"] is not None:
+        return float(sistema["kwp"])
+    return float(sistema["eficiencia"] * sistema["area"] * IRRADIANCIA_STC / 1000)
+
+
+def factor_temperatura(irradiancia, sistema=None):
+    """
+    Factor de pérdida térmica con la temperatura de celda del modelo NOCT:
+    Tc = Ta + (NOCT - 20) / 800 · G.
+
+    Parámetros:
+        irradiancia (array): Irradiancia media en W/m².
+        sistema (dict, opcional): Configuración de `sistema_fv`.
+
+    Retorna:
+        np.ndarray: Factor multiplicativo (≥ 0) con la forma de `irradiancia`.
+    """
+    sistema = sistema or SISTEMA
+    irradiancia = np.asarray(irradiancia)
+    tipo = irradiancia.dtype if np.issubdtype(irradiancia.dtype, np.floating) else np.dtype(np.float64)
+    pendiente = tipo.type(sistema["coef_temperatura"] * (sistema["noct"] - 20) / 800)
+    base = tipo.type(1 + sistema["coef_temperatura"] * (sistema["temperatura_ambiente"] - TEMPERATURA_STC))
+    return np.maximum(base + pendiente * irradiancia, 0)
+
+
+def energia(irradiancia, sistema=None, horas=1):
+    """
+    Energía entregada por el sistema en cada paso, para cualquier forma de
+    arreglo (por ejemplo escenarios × tiempo) en una sola operación.
+
+    Parámetros:
+        irradiancia (array): Irradiación de cada paso en Wh/m² (horaria o diaria).
+        sistema (dict, opcional): Configuración de `sistema_fv`.
+        horas (float): Horas de sol del paso, para estimar la irradiancia media
+            del derrateo térmico (1 para series horarias, HORAS_SOL_DIA para diarias).
+
+    Retorna:
+        np.ndarray: Energía en kWh con la forma y el tipo de `irradiancia`.
+    """
+    sistema = sistema or SISTEMA
+    irradiancia = np.asarray(irradiancia)
+    tipo = irradiancia.dtype if np.issubdtype(irradiancia.dtype, np.floating) else np.dtype(np.float64)
+    nominal = tipo.type(potencia_pico(sistema) / IRRADIANCIA_STC * (1 - sistema["perdidas_inversor"]))
+    return irradiancia * factor_temperatura(irradiancia / tipo.type(horas), sistema) * nominal
+
+
+@lru_cache(maxsize=256)
+def _multiplicadores(anios, anio_inicio, degradacion):
+    multiplicadores = (1 - degradacion) ** (np.array(anios) - anio_inicio)
+    multiplicadores.setflags(write=False)
+    return multiplicadores
+
+
+def multiplicadores_degradacion(anios, sistema=None, anio_inicio=None):
+    """
+    Fracción de la capacidad inicial que conserva el sistema cada año:
+    (1 - degradación)^(año - año de inicio). Se calcula una vez por conjunto
+    de años y se comparte entre todos los escenarios.
+
+    Parámetros:
+        anios (array): Años de las columnas de energía.
+        sistema (dict, opcional): Configuración de `sistema_fv`.
+        anio_inicio (int, opcional): Año de instalación (por defecto el primero).
+
+    Retorna:
+        np.ndarray: Multiplicador por año (solo lectura).
+    """
+    sistema = sistema or SISTEMA
+    anios = tuple(int(a) for a in np.atleast_1d(anios))
+    return _multiplicadores(anios, anios[0] if anio_inicio is None else int(anio_inicio),
+                            float(sistema["degradacion_anual"]))
+
+
+def energia_anual(irradiancia, anios, sistema=None, horas=1, anio_inicio=None):
+    """
+    Energía anual del sistema a partir de la irradiación simulada.
+
+    Parámetros:
+        irradiancia (array): Irradiación (..., pasos) en Wh/m².
+        anios (array): Año de cada paso (columnas ordenadas por fecha).
+        sistema (dict, opcional): Configuración de `sistema_fv`.
+        horas (float): Horas de sol de cada paso (ver `energia`).
+        anio_inicio (int, opcional): Año de instalación para la degradación.
+
+    Retorna:
+        tuple: (np.ndarray con los años, np.ndarray (..., años) con la energía en kWh).
+    """
+    anios = np.asarray(anios)
+    cortes = np.concatenate(([0], np.flatnonzero(np.diff(anios)) + 1))
+    por_paso = energia(irradiancia, sistema, horas)
+    anuales = np.add.reduceat(por_paso, cortes, axis=-1, dtype=np.float64)
+    return anios[cortes], anuales * multiplicadores_degradacion(anios[cortes], sistema, anio_inicio)
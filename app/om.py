@@ -1,58 +1,156 @@
 import os
+import threading
 import openmeteo_requests
 import requests_cache
+import numpy as np
 import pandas as pd
+from requests.adapters import HTTPAdapter
 from retry_requests import retry
 
-def obtener_datos_climaticos(lat, lon, end_date):
+URL_ARCHIVO = "https://archive-api.open-meteo.com/v1/archive"
+
+# Primer día de la serie histórica y demora con la que el archivo publica datos (ERA5)
+FECHA_INICIO_HISTORICO = "2013-01-01"
+RETRASO_ARCHIVO_DIAS = 5
+
+# Conexiones HTTP reutilizables por el cliente compartido
+TAMANO_POOL = 16
+
+_cliente = None
+_bloqueo_cliente = threading.Lock()
+
+
+def obtener_cliente():
     """
-    Obtiene datos climáticos de OpenMeteo para la latitud y longitud dadas,
-    con un rango de fechas desde 2013-01-01 hasta el end_date proporcionado.
+    Devuelve el cliente de OpenMeteo compartido por todo el proceso.
+
+    Se crea una sola vez, con caché, reintentos y un pool de conexiones
+    HTTP que se reutiliza entre pedidos (también desde varios hilos).
     """
-    start_date = "2013-01-01"
+    global _cliente
+    with _bloqueo_cliente:
+        if _cliente is None:
+            cache_session = requests_cache.CachedSession('.cache', expire_after=-1)
+            retry_session = retry(cache_session, retries=5, backoff_factor=0.2)
+            reintentos = retry_session.get_adapter(URL_ARCHIVO).max_retries
+            adaptador = HTTPAdapter(max_retries=reintentos, pool_connections=TAMANO_POOL, pool_maxsize=TAMANO_POOL)
+            retry_session.mount("http://", adaptador)
+            retry_session.mount("https://", adaptador)
+            _cliente = openmeteo_requests.Client(session=retry_session)
+        return _cliente
+
 
-    # Configurar la sesión con caché y reintentos
-    cache_session = requests_cache.CachedSession('.cache', expire_after=-1)
-    retry_session = retry(cache_session, retries=5, backoff_factor=0.2)
-    openmeteo = openmeteo_requests.Client(session=retry_session)
+def ultima_fecha_archivo():
+    """
+    Devuelve la última fecha (YYYY-MM-DD) que el archivo de OpenMeteo tiene publicada.
+    """
+    return (pd.Timestamp.now(tz="UTC") - pd.Timedelta(days=RETRASO_ARCHIVO_DIAS)).strftime("%Y-%m-%d")
 
-    url = "https://archive-api.open-meteo.com/v1/archive"
-    params = {
+
+# Variables horarias pedidas al archivo. Las deterministas (`is_day`,
+# `terrestrial_radiation`) no se descargan: se calculan con app/geometria_solar.py.
+VARIABLES_HORARIAS = [
+    "sunshine_duration", "shortwave_radiation", "direct_radiation",
+    "shortwave_radiation_instant", "direct_radiation_instant"
+]
+
+# Ubicaciones empaquetadas en cada pedido HTTP del modo por lotes
+SITIOS_POR_PEDIDO = 10
+
+
+def _parametros(lat, lon, end_date, start_date):
+    return {
         "latitude": lat,
         "longitude": lon,
         "start_date": start_date,
         "end_date": end_date,
-        "hourly": [
-            "is_day", "sunshine_duration", "shortwave_radiation", "direct_radiation", "terrestrial_radiation",
-            "shortwave_radiation_instant", "direct_radiation_instant", "terrestrial_radiation_instant"
-        ],
+        "hourly": VARIABLES_HORARIAS,
         "timezone": "auto"
     }
 
-    responses = openmeteo.weather_api(url, params=params)
+
+def arreglos_horarios(response):
+    """
+    Extrae los datos horarios de una respuesta de OpenMeteo como arreglos NumPy.
+
+    Los valores son vistas sobre el buffer FlatBuffers de la respuesta (no se
+    copian) y el tiempo se devuelve en segundos UTC (int64).
+
+    Retorna:
+        dict: 'time' y un arreglo por variable de VARIABLES_HORARIAS.
+    """
+    hourly = response.Hourly()
+    datos = {"time": np.arange(hourly.Time(), hourly.TimeEnd(), hourly.Interval(), dtype=np.int64)}
+    for i, var in enumerate(VARIABLES_HORARIAS):
+        datos[var] = hourly.Variables(i).ValuesAsNumpy()
+    return datos
+
+
+def obtener_datos_climaticos(lat, lon, end_date, start_date=FECHA_INICIO_HISTORICO, como_dataframe=True):
+    """
+    Obtiene datos climáticos de OpenMeteo para la latitud y longitud dadas,
+    con un rango de fechas desde start_date (por defecto 2013-01-01) hasta
+    el end_date proporcionado.
+
+    Con `como_dataframe=False` devuelve los datos columnares de
+    `arreglos_horarios` (vistas sobre la respuesta, tiempo en int64), que el
+    almacén climático escribe sin copias intermedias; el DataFrame solo se
+    arma cuando se pide.
+    """
+    # Sesión compartida con caché, reintentos y pool de conexiones
+    openmeteo = obtener_cliente()
+
+    responses = openmeteo.weather_api(URL_ARCHIVO, params=_parametros(lat, lon, end_date, start_date))
     response = responses[0]
 
     # Procesar datos horarios
-    hourly = response.Hourly()
-    hourly_data = {
-        "date": pd.date_range(
-            start=pd.to_datetime(hourly.Time(), unit="s", utc=True),
-            end=pd.to_datetime(hourly.TimeEnd(), unit="s", utc=True),
-            freq=pd.Timedelta(seconds=hourly.Interval()),
-            inclusive="left"
-        )
-    }
+    hourly_data = arreglos_horarios(response)
+    if not como_dataframe:
+        return hourly_data
+
+    hourly_data["date"] = pd.to_datetime(hourly_data.pop("time"), unit="s", utc=True)
+
+    return pd.DataFrame(data=hourly_data, columns=["date"] + VARIABLES_HORARIAS)
+
+
+def obtener_datos_climaticos_lote(coordenadas, end_date, start_date=FECHA_INICIO_HISTORICO,
+                                  sitios_por_pedido=SITIOS_POR_PEDIDO, limitador=None):
+    """
+    Obtiene datos climáticos para varias ubicaciones empaquetando hasta
+    `sitios_por_pedido` coordenadas en cada pedido HTTP (listas separadas por
+    comas de latitud y longitud), con el mismo rango de fechas para todas.
+
+    Parámetros:
+        coordenadas (list): Pares (lat, lon).
+        end_date (str): Fecha final (YYYY-MM-DD).
+        start_date (str): Fecha inicial (YYYY-MM-DD).
+        sitios_por_pedido (int): Ubicaciones por pedido.
+        limitador (LimitadorTasa, opcional): Presupuesto de pedidos; se toma una ficha por pedido HTTP.
+
+    Retorna:
+        list: Un diccionario por ubicación, en el orden de entrada, con 'lat' y
+        'lon' pedidas, 'time' (segundos UTC) y las variables como vistas sobre
+        la respuesta (ver `arreglos_horarios`).
+    """
+    openmeteo = obtener_cliente()
+
+    resultados = []
+    for inicio in range(0, len(coordenadas), sitios_por_pedido):
+        grupo = coordenadas[inicio:inicio + sitios_por_pedido]
+        lats = ",".join(str(lat) for lat, _ in grupo)
+        lons = ",".join(str(lon) for _, lon in grupo)
+        if limitador is not None:
+            limitador.esperar()
+        responses = openmeteo.weather_api(URL_ARCHIVO, params=_parametros(lats, lons, end_date, start_date))
 
-    # Asignar valores a las variables
-    variables = [
-        "is_day", "sunshine_duration", "shortwave_radiation", "direct_radiation", "terrestrial_radiation",
-        "shortwave_radiation_instant", "direct_radiation_instant", "terrestrial_radiation_instant"
-    ]
+        # Una respuesta por ubicación, en el mismo orden del pedido
+        for (lat, lon), response in zip(grupo, responses):
+            datos = arreglos_horarios(response)
+            datos["lat"], datos["lon"] = lat, lon
+            resultados.append(datos)
 
-    for i, var in enumerate(variables):
-        hourly_data[var] = hourly.Variables(i).ValuesAsNumpy()
+    return resultados
 
-    return pd.DataFrame(data=hourly_data)
 
 def generar_csv(lat, lon, end_date):
     """
@@ -8,6 +8,8 @@ import os
 
 csv_file = os.path.abspath("../data/clima_-34.028193_-55.393066.csv")
 output_file = os.path.abspath("../data/salida_clima_-34.028193_-55.393066.csv")
+# Modelo del sistema fotovoltaico compartido con los scripts de R (mismos valores que app/modelo_fv.py)
+modelo_fv = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src", "scripts", "modelo_fv.R")
 
 # Script en R para ejecutar desde Python
 r_script = """
@@ -55,7 +57,7 @@ data <- data %>%
 data_daily <- data %>%
   group_by(date) %>%
   summarise(value = sum(shortwave_radiation, na.rm = TRUE)) %>%
-  mutate(output = value * 0.153 * 6.545)
+  mutate(output = energia_fv(value, horas = HORAS_SOL_DIA))
 
 # Verificar si hay valores nulos o anómalos en data_daily
 print(summary(data_daily))
@@ -104,7 +106,8 @@ ggplot(DBRadiationSimDaily) +
 write_csv(DBRadiationSimDaily, output_file)
 """
 
-# Ejecutar el script en R desde Python
+# Ejecutar el script en R desde Python, con energia_fv ya definida
+ro.r["source"](os.path.normpath(modelo_fv))
 ro.r(r_script)
 
 print(f"Simulación completada. Resultados guardados en {output_file}")
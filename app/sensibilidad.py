@@ -1,67 +1,239 @@
+import os
+import json
+import copy
+import hashlib
+import threading
 import numpy as np
-import matplotlib.pyplot as plt
 import warnings
 from SALib.sample.sobol import sample
 from SALib.analyze import sobol
 
+from app.lcoe import lcoe_anualizado
+
 # Ignorar advertencias innecesarias
 warnings.simplefilter(action="ignore", category=FutureWarning)
 
-# Función para calcular el LCOE
-def calcular_lcoe(capital_cost, operating_cost, energy_production, discount_rate, lifetime):
-    discount_rate = discount_rate / 100  # Convertir porcentaje a decimal
-    num = capital_cost + operating_cost * sum(1 / ((1 + discount_rate) ** np.arange(1, lifetime + 1)))
-    denom = energy_production * sum(1 / ((1 + discount_rate) ** np.arange(1, lifetime + 1)))
-    return num / denom
-
-# Definir el problema para el análisis de sensibilidad
-problem = {
+# Definición por defecto del problema para el análisis de sensibilidad
+PROBLEMA = {
     "num_vars": 5,
     "names": ["Capital Cost", "Operating Cost", "Energy Production", "Discount Rate", "Lifetime"],
     "bounds": [[500, 5000], [5, 50], [1000, 20000], [4, 10], [15, 25]]
 }
+N_MUESTRAS = 1024  # Potencia de 2 (1024 para evitar advertencias de Sobol)
+MAXIMO_MUESTRAS = 2 ** 18
+SEMILLA = 1995
+
+DIRECTORIO_SENSIBILIDAD = os.path.join("data", "sensibilidad")
+MAXIMO_EN_MEMORIA = 256
+_resultados_memoria = {}
+_energias_memoria = {}  # Energía por escenario de cada sitio simulado (ver `energia_sitio`)
+_bloqueo_memoria = threading.Lock()
+
+
+# Función para calcular el LCOE
+def calcular_lcoe(capital_cost, operating_cost, energy_production, discount_rate, lifetime):
+    # discount_rate en porcentaje; acepta escalares o arreglos (una sola llamada vectorizada). La vida útil se
+    # redondea hacia arriba, como la suma original sobre np.arange(1, lifetime + 1)
+    return lcoe_anualizado(capital_cost, operating_cost, energy_production, np.asarray(discount_rate) / 100,
+                           np.ceil(lifetime))
+
+
+def definir_problema(bounds=None, energia=None):
+    """
+    Arma el problema de SALib a partir del problema por defecto.
+
+    Parámetros:
+        bounds (dict, opcional): Límites [mínimo, máximo] por nombre de variable.
+        energia (array, opcional): Energía anual simulada del sitio (kWh/año por
+            escenario). Si se indica, "Energy Production" pasa a tener una
+            distribución normal con la media y el desvío de esos escenarios.
+
+    Retorna:
+        dict: Problema de SALib.
+    """
+    problema = copy.deepcopy(PROBLEMA)
+    for nombre, limites in (bounds or {}).items():
+        if nombre not in problema["names"]:
+            raise ValueError(f"Variable desconocida: {nombre}")
+        minimo, maximo = (float(v) for v in limites)
+        if not minimo < maximo:
+            raise ValueError(f"Límites inválidos para {nombre}: {limites}")
+        problema["bounds"][problema["names"].index(nombre)] = [minimo, maximo]
+
+    if energia is not None:
+        energia = np.asarray(energia, dtype=float)
+        problema["dists"] = ["unif"] * problema["num_vars"]
+        indice = problema["names"].index("Energy Production")
+        problema["dists"][indice] = "norm"
+        problema["bounds"][indice] = [float(energia.mean()), float(max(energia.std(), 1e-9))]
+    return problema
+
+
+def clave_problema(problema, n=N_MUESTRAS, segundo_orden=True, semilla=SEMILLA):
+    """
+    Resumen de la definición del problema y del muestreo, usado como clave de la caché.
+    """
+    definicion = {"problema": problema, "n": int(n), "segundo_orden": bool(segundo_orden), "semilla": semilla}
+    return hashlib.sha256(json.dumps(definicion, sort_keys=True).encode()).hexdigest()[:16]
+
+
+def evaluar_modelo(param_values):
+    """
+    Evalúa el LCOE sobre toda la matriz de muestras (muestras × variables) en una sola llamada.
+    """
+    return calcular_lcoe(*np.asarray(param_values, dtype=float).T)
+
+
+def analizar_sensibilidad(problema=None, n=N_MUESTRAS, segundo_orden=True, semilla=SEMILLA,
+                          directorio=DIRECTORIO_SENSIBILIDAD):
+    """
+    Análisis de sensibilidad de Sobol del LCOE.
+
+    Los resultados se guardan en memoria y como JSON en `directorio`, con la
+    definición del problema como clave: pedir dos veces el mismo problema no
+    vuelve a muestrear ni a evaluar el modelo.
+
+    Parámetros:
+        problema (dict, opcional): Problema de SALib (por defecto PROBLEMA).
+        n (int): Muestras base de Sobol (potencia de 2, hasta MAXIMO_MUESTRAS).
+        segundo_orden (bool): Calcular también los índices de segundo orden.
+        semilla (int): Semilla del muestreo y del bootstrap.
+        directorio (str): Carpeta de la caché en disco.
+
+    Retorna:
+        dict: Índices S1 y ST (con sus intervalos), porcentajes de contribución
+        y la variable de mayor impacto.
+    """
+    problema = copy.deepcopy(problema or PROBLEMA)  # SALib agrega claves al problema al muestrear
+    n = int(n)
+    if n < 2 or n > MAXIMO_MUESTRAS or n & (n - 1):
+        raise ValueError(f"n debe ser una potencia de 2 entre 2 y {MAXIMO_MUESTRAS}.")
+
+    clave = clave_problema(problema, n, segundo_orden, semilla)
+    with _bloqueo_memoria:
+        if clave in _resultados_memoria:
+            return _resultados_memoria[clave]
+
+    archivo = os.path.join(directorio, f"{clave}.json")
+    if os.path.exists(archivo):
+        with open(archivo) as f:
+            resultado = json.load(f)
+    else:
+        # Generar muestras usando Sobol y evaluar el modelo en todas a la vez
+        param_values = sample(problema, n, calc_second_order=segundo_orden, seed=semilla)
+        Y = evaluar_modelo(param_values)
+        Si = sobol.analyze(problema, Y, calc_second_order=segundo_orden, seed=semilla)
+
+        ST_percent = Si["ST"] * 100
+        max_index = int(np.argmax(ST_percent))
+        resultado = {
+            "problema": {k: v for k, v in problema.items() if k != "sample_scaled"},
+            "n": n,
+            "evaluaciones": int(len(Y)),
+            "S1": Si["S1"].tolist(),
+            "S1_conf": Si["S1_conf"].tolist(),
+            "ST": Si["ST"].tolist(),
+            "ST_conf": Si["ST_conf"].tolist(),
+            "S1_percent": (Si["S1"] * 100).tolist(),
+            "ST_percent": ST_percent.tolist(),
+            "variable_principal": problema["names"][max_index],
+            "contribucion_principal": float(ST_percent[max_index]),
+            "lcoe_medio": float(np.mean(Y)),
+        }
+
+        os.makedirs(directorio, exist_ok=True)
+        temporal = f"{archivo}.{os.getpid()}.tmp"
+        with open(temporal, "w") as f:
+            json.dump(resultado, f)
+        os.replace(temporal, archivo)
+
+    with _bloqueo_memoria:
+        if len(_resultados_memoria) >= MAXIMO_EN_MEMORIA:
+            _resultados_memoria.pop(next(iter(_resultados_memoria)))
+        _resultados_memoria[clave] = resultado
+    return resultado
+
+
+def energia_sitio(lat, lon, hasta, nsim=1000, semilla=SEMILLA):
+    """
+    Energía anual media de cada escenario simulado para la ubicación (kWh/año),
+    para usar como entrada de producción en `definir_problema`. Solo se
+    promedian los años simulados completos: un primer o último año parcial
+    bajaría la media.
+
+    La energía queda en memoria con la celda, el modelo (parámetros y huella
+    de los datos), el horizonte, nsim y la semilla como clave, así que pedir
+    otra vez el mismo sitio no vuelve a simular.
+
+    Retorna:
+        np.ndarray: Energía anual media por escenario, o None si no hay datos climáticos.
+    """
+    from app.cache_modelos import obtener_modelo, clave_modelo, huella_datos
+    from app.cache_resultados import clave_pedido
+    from app.indice_ubicaciones import bloqueo_celda
+    from app.lcoe_flujo import energia_anual_en_flujo
+    from app.simulacion import fechas_simulacion
+    from app.calcular_proyeccion_lcoe import INICIO_SIMULACION
+
+    anios, dias = np.unique(np.asarray(fechas_simulacion(INICIO_SIMULACION, hasta).year), return_counts=True)
+    completos = dias == np.where((anios % 4 == 0) & ((anios % 100 != 0) | (anios % 400 == 0)), 366, 365)
+    if not completos.any():
+        raise ValueError(f"La simulación hasta {hasta} no cubre ningún año completo.")
+
+    huella = huella_datos(lat, lon)
+    if huella is None:
+        return None
+    clave = clave_pedido("energia_sitio", {"modelo": clave_modelo(lat, lon), "huella": huella, "hasta": str(hasta),
+                                           "nsim": int(nsim), "semilla": int(semilla)})
 
-# Generar muestras usando Sobol (1024 para evitar advertencias)
-param_values = sample(problem, 1024)
+    with bloqueo_celda(f"energia_{clave}"):  # Pedidos simultáneos del mismo sitio simulan una sola vez
+        with _bloqueo_memoria:
+            if clave in _energias_memoria:
+                return _energias_memoria[clave]
 
-# Evaluar el modelo en las muestras
-Y = np.array([calcular_lcoe(*params) for params in param_values])
+        modelo = obtener_modelo(lat, lon)
+        if modelo is None:
+            return None
+        energia = np.concatenate([bloque[:, completos].mean(axis=1) for _, bloque in
+                                  energia_anual_en_flujo(modelo, INICIO_SIMULACION, hasta, nsim=nsim,
+                                                         semilla=semilla)])
+        energia.setflags(write=False)
 
-# Realizar el análisis de sensibilidad de Sobol
-Si = sobol.analyze(problem, Y)
+        with _bloqueo_memoria:
+            if len(_energias_memoria) >= MAXIMO_EN_MEMORIA:
+                _energias_memoria.pop(next(iter(_energias_memoria)))
+            _energias_memoria[clave] = energia
+    return energia
 
-# Extraer contribución de la varianza
-S1 = Si['S1']  # Efecto individual de cada variable
-ST = Si['ST']  # Efecto total (incluyendo interacciones)
 
-# Convertir a porcentaje
-S1_percent = S1 * 100
-ST_percent = ST * 100
+if __name__ == "__main__":
+    import matplotlib.pyplot as plt
 
-# Determinar la variable con mayor impacto
-max_index = np.argmax(ST_percent)
-max_var = problem["names"][max_index]
-max_contribution = ST_percent[max_index]
+    problem = PROBLEMA
+    resultado = analizar_sensibilidad(problem, N_MUESTRAS)
+    S1_percent = np.array(resultado["S1_percent"])
+    ST_percent = np.array(resultado["ST_percent"])
 
-# Imprimir resultados
-print("\n🔹 Análisis de Sensibilidad de Sobol - Contribución de la Varianza al LCOE:")
-for i, name in enumerate(problem["names"]):
-    print(f"{name}: {S1_percent[i]:.2f}% (S1), {ST_percent[i]:.2f}% (ST)")
+    # Imprimir resultados
+    print("\n🔹 Análisis de Sensibilidad de Sobol - Contribución de la Varianza al LCOE:")
+    for i, name in enumerate(problem["names"]):
+        print(f"{name}: {S1_percent[i]:.2f}% (S1), {ST_percent[i]:.2f}% (ST)")
 
-print(f"\n✅ La variable con mayor impacto en el LCOE es **{max_var}** con una contribución del **{max_contribution:.2f}%**.")
+    print(f"\n✅ La variable con mayor impacto en el LCOE es **{resultado['variable_principal']}** con una "
+          f"contribución del **{resultado['contribucion_principal']:.2f}%**.")
 
-# 📊 Gráfico de sensibilidad
-plt.figure(figsize=(10, 6))
-plt.bar(problem["names"], ST_percent, color="skyblue", edgecolor="black")
-plt.xlabel("Variables de Entrada del LCOE")
-plt.ylabel("Contribución a la Varianza (%)")
-plt.title("Análisis de Sensibilidad del LCOE")
-plt.xticks(rotation=20)
-plt.grid(axis="y", linestyle="--", alpha=0.7)
+    # 📊 Gráfico de sensibilidad
+    plt.figure(figsize=(10, 6))
+    plt.bar(problem["names"], ST_percent, color="skyblue", edgecolor="black")
+    plt.xlabel("Variables de Entrada del LCOE")
+    plt.ylabel("Contribución a la Varianza (%)")
+    plt.title("Análisis de Sensibilidad del LCOE")
+    plt.xticks(rotation=20)
+    plt.grid(axis="y", linestyle="--", alpha=0.7)
 
-# Mostrar el valor en cada barra
-for i, v in enumerate(ST_percent):
-    plt.text(i, v + 1, f"{v:.2f}%", ha="center", fontsize=12, fontweight="bold")
+    # Mostrar el valor en cada barra
+    for i, v in enumerate(ST_percent):
+        plt.text(i, v + 1, f"{v:.2f}%", ha="center", fontsize=12, fontweight="bold")
 
-# Mostrar gráfico
-plt.show()
+    # Mostrar gráfico
+    plt.show()
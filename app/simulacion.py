@@ -0,0 +1,231 @@
+import argparse
+import numpy as np
+import pandas as pd
+from scipy.stats import norm
+from scipy.optimize import minimize_scalar
+
+from app.analyze_ts_module import acs, actf, coeficientes_actf_lote, seasonal_ar_batch
+from app.almacen_clima import cargar_clima
+from app.almacen_simulaciones import abrir_simulaciones
+
+# Parámetros usados por la API de R: analyzeTS(dist = "norm", acsID = "fgn", season = "month")
+DIST = "norm"
+ACS_ID = "fgn"
+SEASON = "month"
+LAG_MAX = 30
+MINIMO_DIAS_TEMPORADA = 28  # Días con datos por temporada para ajustar la marginal y la autocorrelación
+
+
+def serie_diaria(lat, lon, variable="shortwave_radiation", desde=None, hasta=None):
+    """
+    Suma diaria (día UTC) de una variable horaria del almacén climático,
+    igual que el agrupamiento por fecha de la API de R.
+
+    Retorna:
+        pd.DataFrame: Columnas 'date' y 'value', o None si no hay datos.
+    """
+    df = cargar_clima(lat, lon, variables=[variable], desde=desde, hasta=hasta)
+    if df is None or df.empty:
+        return None
+
+    dias = df["date"].dt.tz_localize(None).dt.normalize()
+    diaria = df[variable].groupby(dias).sum(min_count=1).astype(np.float64)
+    return pd.DataFrame({"date": diaria.index, "value": diaria.to_numpy()})
+
+
+def _acf_empirica(x, lag_max):
+    """
+    Autocorrelación empírica (estimador sesgado, como `stats::acf` de R).
+    Los lags sin pares (serie más corta que `lag_max`) quedan en cero.
+    """
+    x = np.asarray(x, dtype=float)
+    x = x[~np.isnan(x)] - np.nanmean(x)
+    n = len(x)
+    denom = np.dot(x, x)
+    return np.array([np.dot(x[:n - k], x[k:]) / denom if k < n else 0.0 for k in range(lag_max + 1)])
+
+
+def _ajustar_acs(eacs, acsID):
+    """
+    Ajusta por mínimos cuadrados el parámetro del modelo de autocorrelación.
+    """
+    if acsID != "fgn":
+        raise ValueError(f"Modelo de autocorrelación {acsID} no soportado por el motor Python.")
+
+    lag = np.arange(len(eacs))
+    ajuste = minimize_scalar(lambda H: np.sum((acs(id="fgn", t=lag[1:], H=H) - eacs[1:]) ** 2),
+                             bounds=(0.001, 0.999), method="bounded")
+    return {"H": float(ajuste.x)}
+
+
+def ajustar_modelo(TS, dist=DIST, acsID=ACS_ID, season=SEASON, lag_max=LAG_MAX):
+    """
+    Ajusta por temporada la distribución marginal y la estructura de
+    autocorrelación de una serie diaria, equivalente a `CoSMoS::analyzeTS`.
+
+    Parámetros:
+        TS (pd.DataFrame): Serie con columnas 'date' y 'value'.
+        dist (str): Distribución marginal (por ahora "norm").
+        acsID (str): Modelo de autocorrelación (por ahora "fgn").
+        season (str): Estacionalidad ("month").
+        lag_max (int): Máximo lag de la autocorrelación.
+
+    Retorna:
+        dict: Modelo serializable con los parámetros de cada temporada.
+
+    Lanza:
+        ValueError: Si alguna temporada tiene menos de MINIMO_DIAS_TEMPORADA días
+        válidos (por ejemplo, una celda recién sincronizada con menos de un año de historia).
+    """
+    if dist != "norm":
+        raise ValueError(f"Distribución {dist} no soportada por el motor Python.")
+
+    fechas = pd.DatetimeIndex(TS["date"])
+    temporadas = np.asarray(fechas.month if season == "month" else fechas.day)
+    valores = TS["value"].to_numpy(dtype=float)
+
+    validos = np.bincount(temporadas[~np.isnan(valores)], minlength=13 if season == "month" else 32)[1:]
+    faltantes = [int(s) for s in np.flatnonzero(validos < MINIMO_DIAS_TEMPORADA) + 1]
+    if faltantes:
+        raise ValueError(f"La serie tiene menos de {MINIMO_DIAS_TEMPORADA} días con datos en las temporadas "
+                         f"{faltantes}; el ajuste necesita al menos un año completo de historia.")
+
+    parametros = {}
+    for s in np.unique(temporadas):
+        x = valores[temporadas == s]
+        x = x[~np.isnan(x)]
+        p0 = float(np.mean(x == 0))
+        positivos = x[x > 0] if p0 > 0 else x
+        eacs = _acf_empirica(x, lag_max)
+        parametros[str(s)] = {
+            "mean": float(np.mean(positivos)),
+            "sd": float(np.std(positivos, ddof=1)),
+            "p0": p0,
+            "eACS": eacs.tolist(),
+            "acs": _ajustar_acs(eacs, acsID),
+        }
+
+    return {"dist": dist, "acsID": acsID, "season": season, "lag_max": lag_max, "temporadas": parametros}
+
+
+def estructura_acs(modelo):
+    """
+    Estructura de autocorrelación Gaussiana de cada temporada del modelo.
+
+    Para marginales normales sin ceros la transformación de autocorrelación
+    es la identidad. En el resto de las temporadas la ACS del modelo se
+    transforma con `actf`, cuyos coeficientes se obtienen para todas las
+    temporadas de una vez (y quedan memorizados) con `coeficientes_actf_lote`.
+    """
+    lag = np.arange(modelo["lag_max"] + 1)
+    estructura = {s: acs(id=modelo["acsID"], t=lag, **p["acs"]) for s, p in modelo["temporadas"].items()}
+
+    transformar = [s for s, p in modelo["temporadas"].items() if modelo["dist"] != "norm" or p["p0"] > 0]
+    marginales = [(modelo["dist"], {"mean": modelo["temporadas"][s]["mean"], "sd": modelo["temporadas"][s]["sd"]},
+                   modelo["temporadas"][s]["p0"]) for s in transformar]
+    for s, coef in zip(transformar, coeficientes_actf_lote(marginales)):
+        estructura[s] = actf(estructura[s], coef["b"], coef["c"])
+    return estructura
+
+
+def fechas_simulacion(desde, hasta):
+    """
+    Fechas diarias simuladas entre `desde` y `hasta` (ambas inclusive).
+    """
+    return pd.date_range(pd.Timestamp(desde).normalize(), pd.Timestamp(hasta).normalize(), freq="D")
+
+
+def simular_modelo(modelo, desde, hasta, nsim=1000, rng=None):
+    """
+    Simula `nsim` escenarios diarios del modelo, equivalente a llamar
+    `nsim` veces a `CoSMoS::simulateTS`, en una sola pasada vectorizada.
+
+    Parámetros:
+        modelo (dict): Salida de `ajustar_modelo`.
+        desde (str o datetime): Fecha inicial.
+        hasta (str o datetime): Fecha final.
+        nsim (int): Número de escenarios.
+        rng (np.random.Generator, int o None): Generador o semilla.
+
+    Retorna:
+        tuple: (pd.DatetimeIndex con las fechas, np.ndarray (nsim, días) float32).
+    """
+    fechas = fechas_simulacion(desde, hasta)
+    gauss = seasonal_ar_batch(fechas, estructura_acs(modelo), nsim, season=modelo["season"], rng=rng)
+
+    # Parámetros de la marginal para cada día
+    temporadas = np.asarray(fechas.month if modelo["season"] == "month" else fechas.day)
+    faltantes = [int(s) for s in np.unique(temporadas) if str(s) not in modelo["temporadas"]]
+    if faltantes:
+        raise ValueError(f"El modelo no tiene parámetros para las temporadas {faltantes}.")
+    tabla = {campo: np.array([modelo["temporadas"].get(str(s), {}).get(campo, np.nan)
+                              for s in range(1, temporadas.max() + 1)])
+             for campo in ("mean", "sd", "p0")}
+    media, desvio, p0 = (tabla[campo][temporadas - 1] for campo in ("mean", "sd", "p0"))
+
+    if not np.any(p0 > 0):
+        # Sin ceros la transformación Φ⁻¹(Φ(z)) es la identidad
+        return fechas, (gauss * desvio + media).astype(np.float32)
+
+    uval = (norm.cdf(gauss) - p0) / (1 - p0)
+    valores = np.where(uval > 0, norm.ppf(np.clip(uval, 1e-12, 1 - 1e-12)) * desvio + media, 0.0)
+    return fechas, valores.astype(np.float32)
+
+
+def estadisticas_mensuales(valores, fechas):
+    """
+    Media, desvío y autocorrelación de lag 1 (entre días consecutivos del
+    mismo mes) de cada mes, sobre todos los escenarios juntos.
+
+    Parámetros:
+        valores (array): Escenarios (nsim, días) o una serie (días,).
+        fechas (pd.DatetimeIndex): Fecha de cada columna.
+
+    Retorna:
+        pd.DataFrame: Columnas 'media', 'desvio' y 'acf1', indexadas por mes.
+    """
+    valores = np.atleast_2d(np.asarray(valores, dtype=np.float64))
+    filas = []
+    for mes in range(1, 13):
+        columnas = np.flatnonzero(fechas.month == mes)
+        x = valores[:, columnas]
+        consecutivos = columnas[1:] - columnas[:-1] == 1
+        a, b = x[:, :-1][:, consecutivos], x[:, 1:][:, consecutivos]
+        filas.append({"mes": mes, "media": x.mean(), "desvio": x.std(),
+                      "acf1": np.corrcoef(a.ravel(), b.ravel())[0, 1]})
+    return pd.DataFrame(filas).set_index("mes")
+
+
+def comparar_con_r(ruta_r, ruta_py):
+    """
+    Compara estadísticas mensuales de dos almacenes de simulaciones (por
+    ejemplo, la salida de la API de R y la del motor Python).
+
+    Retorna:
+        pd.DataFrame: Media, desvío y autocorrelación de lag 1 por mes para
+        cada motor, y la diferencia relativa de cada estadística.
+    """
+    tablas = {}
+    for motor, ruta in (("r", ruta_r), ("py", ruta_py)):
+        valores, fechas = abrir_simulaciones(ruta)
+        tablas[motor] = estadisticas_mensuales(valores, fechas)
+
+    tabla = pd.concat(tablas, axis=1).swaplevel(axis=1)
+    for estadistica in ("media", "desvio", "acf1"):
+        tabla[(estadistica, "dif_rel")] = (tabla[(estadistica, "py")] - tabla[(estadistica, "r")]).abs() / \
+            tabla[(estadistica, "r")].abs()
+    return tabla.sort_index(axis=1)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compara las simulaciones del motor Python con la referencia de R.")
+    parser.add_argument("ruta_r", help="Almacén de simulaciones generado por la API de R.")
+    parser.add_argument("ruta_py", help="Almacén de simulaciones generado por el motor Python.")
+    parser.add_argument("--tolerancia", type=float, default=0.05, help="Diferencia relativa máxima aceptada.")
+    args = parser.parse_args()
+
+    tabla = comparar_con_r(args.ruta_r, args.ruta_py)
+    print(tabla.round(4).to_string())
+    peor = tabla.xs("dif_rel", axis=1, level=1).max().max()
+    print(f"Diferencia relativa máxima: {peor:.4f}")
+    raise SystemExit(0 if peor <= args.tolerancia else 1)
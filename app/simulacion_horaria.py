@@ -0,0 +1,118 @@
+import threading
+import numpy as np
+import pandas as pd
+
+from app.almacen_clima import cargar_clima
+from app.indice_ubicaciones import clave_celda
+from app.simulacion import simular_modelo, fechas_simulacion
+
+HORAS_DIA = 24
+
+_perfiles_memoria = {}
+_bloqueo_memoria = threading.Lock()
+
+
+def perfil_horario(datos, variable="shortwave_radiation"):
+    """
+    Fracción del total diario que corresponde a cada hora (UTC), por mes.
+
+    Es el perfil medio de cielo observado: las horas sin sol (`is_day` = 0)
+    tienen radiación media nula y quedan en cero, de modo que el perfil
+    respeta el ciclo diurno de cada mes. Cada fila suma 1, así que
+    desagregar un total diario con el perfil conserva el total.
+
+    Parámetros:
+        datos (pd.DataFrame): Datos horarios con columna 'date' (UTC) y la variable.
+        variable (str): Variable horaria a usar.
+
+    Retorna:
+        np.ndarray: Matriz (12 meses, 24 horas) en float64.
+    """
+    fechas = pd.DatetimeIndex(datos["date"])
+    if fechas.tz is not None:
+        fechas = fechas.tz_convert("UTC")
+    valores = datos[variable].to_numpy(dtype=np.float64)
+    validos = ~np.isnan(valores)
+
+    celda = (np.asarray(fechas.month) - 1) * HORAS_DIA + np.asarray(fechas.hour)
+    suma = np.bincount(celda[validos], weights=valores[validos], minlength=12 * HORAS_DIA).reshape(12, HORAS_DIA)
+    total = suma.sum(axis=1, keepdims=True)
+
+    # Meses sin datos: reparto uniforme, para no perder energía
+    return np.where(total > 0, suma / np.where(total > 0, total, 1), 1 / HORAS_DIA)
+
+
+def obtener_perfil(lat, lon, variable="shortwave_radiation", desde=None, hasta=None):
+    """
+    Perfil horario de la celda, calculado una vez a partir del almacén
+    climático y guardado en memoria.
+
+    Retorna:
+        np.ndarray: Matriz (12, 24) de solo lectura, o None si no hay datos climáticos.
+    """
+    clave = (clave_celda(lat, lon), variable, None if desde is None else str(desde),
+             None if hasta is None else str(hasta))
+    with _bloqueo_memoria:
+        if clave in _perfiles_memoria:
+            return _perfiles_memoria[clave]
+
+    datos = cargar_clima(lat, lon, variables=[variable], desde=desde, hasta=hasta)
+    if datos is None or datos.empty:
+        return None
+    perfil = perfil_horario(datos, variable)
+    perfil.setflags(write=False)
+
+    with _bloqueo_memoria:
+        _perfiles_memoria[clave] = perfil
+    return perfil
+
+
+def fechas_horarias(desde, hasta):
+    """
+    Índice horario compartido por todos los escenarios: las 24 horas de cada
+    día simulado entre `desde` y `hasta` (ambos inclusive).
+    """
+    dias = fechas_simulacion(desde, hasta)
+    return pd.date_range(dias[0], periods=len(dias) * HORAS_DIA, freq="h")
+
+
+def desagregar(valores, fechas, perfil):
+    """
+    Reparte totales diarios en horas con el perfil de su mes, para todos los
+    escenarios en una sola operación.
+
+    Parámetros:
+        valores (np.ndarray): Totales diarios (escenarios, días).
+        fechas (pd.DatetimeIndex): Fechas diarias de las columnas.
+        perfil (np.ndarray): Salida de `perfil_horario` (12, 24).
+
+    Retorna:
+        np.ndarray: Valores horarios (escenarios, días · 24) en float32.
+    """
+    valores = np.asarray(valores)
+    fracciones = np.asarray(perfil, dtype=np.float32)[np.asarray(fechas.month) - 1]
+    horarios = valores[..., None].astype(np.float32) * fracciones
+    return horarios.reshape(*valores.shape[:-1], -1)
+
+
+def simular_horario(modelo, perfil, desde, hasta, nsim=1000, rng=None):
+    """
+    Simula `nsim` escenarios horarios: totales diarios de `simular_modelo`
+    repartidos en horas con el perfil de cada mes.
+
+    La autocorrelación y la distribución de los totales diarios son las del
+    modelo diario, y la energía de cada día se conserva. Con la misma semilla
+    las sumas diarias coinciden con la simulación diaria.
+
+    Parámetros:
+        modelo (dict): Salida de `ajustar_modelo`.
+        perfil (np.ndarray): Salida de `perfil_horario` u `obtener_perfil`.
+        desde, hasta (str o datetime): Rango de fechas a simular.
+        nsim (int): Número de escenarios.
+        rng (np.random.Generator, int o None): Generador o semilla.
+
+    Retorna:
+        tuple: (pd.DatetimeIndex horario, np.ndarray (nsim, horas) float32).
+    """
+    fechas, diarios = simular_modelo(modelo, desde, hasta, nsim=nsim, rng=rng)
+    return fechas_horarias(desde, hasta), desagregar(diarios, fechas, perfil)
@@ -0,0 +1,178 @@
+import os
+import time
+import argparse
+import threading
+import numpy as np
+from collections import deque
+from multiprocessing import get_context, get_all_start_methods
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+from app.almacen_simulaciones import crear_almacen, abrir_simulaciones
+from app.simulacion import simular_modelo, fechas_simulacion
+from app.simulacion_horaria import simular_horario, fechas_horarias, obtener_perfil
+
+# Escenarios por bloque. El bloque es la unidad de semilla: mientras no cambie,
+# el resultado es idéntico bit a bit con cualquier cantidad de procesos.
+BLOQUE_ESCENARIOS = 32
+MAX_PROCESOS = int(os.environ.get("LCOE_PROCESOS", os.cpu_count() or 1))
+
+# Los procesos se inician con forkserver (o spawn donde no existe) y no con
+# fork: el servidor tiene hilos de Flask y de la cola de trabajos, y copiar
+# un proceso con hilos puede heredar locks tomados.
+METODO_INICIO = "forkserver" if "forkserver" in get_all_start_methods() else "spawn"
+
+_pool = None
+_bloqueo_pool = threading.Lock()
+
+
+def pool_procesos():
+    """
+    Pool de procesos compartido por todo el proceso, creado al primer uso.
+
+    Todas las simulaciones y trabajos concurrentes reparten sus tareas en
+    los mismos MAX_PROCESOS procesos, así que la cantidad de procesos no
+    crece con los pedidos simultáneos.
+    """
+    global _pool
+    with _bloqueo_pool:
+        if _pool is None:
+            _pool = ProcessPoolExecutor(max_workers=MAX_PROCESOS, mp_context=get_context(METODO_INICIO))
+        return _pool
+
+
+def _descartar_pool(pool):
+    """
+    Olvida un pool roto (por ejemplo, un proceso terminado por falta de memoria) para que el próximo uso cree otro.
+    """
+    global _pool
+    with _bloqueo_pool:
+        if _pool is pool:
+            _pool = None
+    pool.shutdown(wait=False, cancel_futures=True)
+
+
+def mapear_en_pool(funcion, tareas, max_procesos=MAX_PROCESOS):
+    """
+    Aplica `funcion` a cada tupla de argumentos de `tareas` en el pool
+    compartido y devuelve los resultados en orden, con a lo sumo
+    `max_procesos` tareas del llamador pendientes a la vez.
+
+    Con `max_procesos` 1 (o una sola tarea) todo corre en el proceso actual,
+    como dentro de un proceso del pool.
+
+    Genera:
+        El resultado de cada tarea, en el orden de `tareas`.
+    """
+    tareas = list(tareas)
+    if max_procesos <= 1 or len(tareas) <= 1:
+        for tarea in tareas:
+            yield funcion(*tarea)
+        return
+
+    pool = pool_procesos()
+    pendientes = deque()
+    try:
+        for tarea in tareas:
+            pendientes.append(pool.submit(funcion, *tarea))
+            if len(pendientes) >= max_procesos:
+                yield pendientes.popleft().result()
+        while pendientes:
+            yield pendientes.popleft().result()
+    except BrokenProcessPool:
+        _descartar_pool(pool)
+        raise
+    finally:
+        for futuro in pendientes:
+            futuro.cancel()
+
+
+def _simular_bloque(modelo, desde, hasta, ruta, inicio, fin, semilla, perfil=None):
+    """
+    Simula los escenarios [inicio, fin) y los escribe en su lugar del almacén.
+    """
+    rng = np.random.default_rng(semilla)
+    if perfil is None:
+        _, valores = simular_modelo(modelo, desde, hasta, nsim=fin - inicio, rng=rng)
+    else:
+        _, valores = simular_horario(modelo, perfil, desde, hasta, nsim=fin - inicio, rng=rng)
+    destino, _ = abrir_simulaciones(ruta, modo="r+")
+    destino[inicio:fin] = valores
+    destino.flush()
+    del destino
+    return inicio, fin
+
+
+def simular_paralelo(modelo, desde, hasta, ruta, nsim=1000, semilla=1995, max_procesos=MAX_PROCESOS,
+                     bloque=BLOQUE_ESCENARIOS, variable="shortwave_radiation", progreso=None, perfil=None):
+    """
+    Simula `nsim` escenarios repartiendo bloques de escenarios entre procesos.
+
+    El almacén de simulaciones se crea antes de lanzar los procesos y cada
+    uno escribe su bloque directamente en el archivo mapeado en memoria, sin
+    devolver los valores al proceso principal. Los bloques se reparten en el
+    pool compartido (`pool_procesos`). Cada bloque usa su propia
+    semilla, derivada con `np.random.SeedSequence(semilla).spawn`, por lo que
+    el resultado no depende de la cantidad de procesos ni del orden en que
+    terminan.
+
+    Con `perfil` la simulación es horaria: los totales diarios se reparten
+    con el perfil (mes × hora) y el almacén tiene 24 columnas por día. Las
+    semillas son las mismas, así que las sumas diarias coinciden con la
+    simulación diaria.
+
+    Parámetros:
+        modelo (dict): Salida de `ajustar_modelo`.
+        desde, hasta (str o datetime): Rango de fechas a simular.
+        ruta (str): Directorio del almacén de simulaciones.
+        nsim (int): Número de escenarios.
+        semilla (int): Semilla raíz.
+        max_procesos (int): Bloques pendientes a la vez (1 simula en el proceso actual).
+        bloque (int): Escenarios por bloque.
+        variable (str): Nombre de la variable simulada.
+        progreso (callable, opcional): Se llama con la fracción de bloques terminados.
+        perfil (np.ndarray, opcional): Perfil horario (12, 24) de `obtener_perfil`.
+
+    Retorna:
+        str: Ruta del almacén.
+    """
+    fechas = fechas_simulacion(desde, hasta) if perfil is None else fechas_horarias(desde, hasta)
+    destino = crear_almacen(ruta, fechas, nsim, variable=variable)
+    del destino
+
+    cortes = list(range(0, nsim, bloque))
+    semillas = np.random.SeedSequence(semilla).spawn(len(cortes))
+    tareas = [(modelo, desde, hasta, ruta, inicio, min(inicio + bloque, nsim), s, perfil)
+              for inicio, s in zip(cortes, semillas)]
+
+    for i, _ in enumerate(mapear_en_pool(_simular_bloque, tareas, max_procesos), start=1):
+        if progreso is not None:
+            progreso(i / len(tareas))
+
+    return ruta
+
+
+if __name__ == "__main__":
+    from app.cache_modelos import obtener_modelo
+
+    parser = argparse.ArgumentParser(description="Simula escenarios de radiación en paralelo para una ubicación.")
+    parser.add_argument("lat", type=float)
+    parser.add_argument("lon", type=float)
+    parser.add_argument("ruta", help="Directorio del almacén de simulaciones.")
+    parser.add_argument("--desde", default="2025-01-01")
+    parser.add_argument("--hasta", default="2044-12-31")
+    parser.add_argument("--nsim", type=int, default=1000)
+    parser.add_argument("--semilla", type=int, default=1995)
+    parser.add_argument("--procesos", type=int, default=MAX_PROCESOS)
+    parser.add_argument("--horario", action="store_true", help="Simular con resolución horaria.")
+    args = parser.parse_args()
+
+    modelo = obtener_modelo(args.lat, args.lon)
+    if modelo is None:
+        raise SystemExit("No hay datos climáticos para la ubicación.")
+    perfil = obtener_perfil(args.lat, args.lon) if args.horario else None
+
+    t0 = time.perf_counter()
+    simular_paralelo(modelo, args.desde, args.hasta, args.ruta, args.nsim, args.semilla, args.procesos,
+                     perfil=perfil)
+    print(f"{args.nsim} escenarios simulados en {time.perf_counter() - t0:.2f} s con {args.procesos} procesos.")
@@ -0,0 +1,124 @@
+import os
+import time
+import uuid
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from app.cache_resultados import clave_pedido
+
+# Trabajos ejecutados a la vez y tiempo que se conservan los terminados
+MAX_TRABAJOS = int(os.environ.get("LCOE_TRABAJOS", 2))
+RETENCION_SEGUNDOS = 3600
+
+PENDIENTE = "pendiente"
+EN_CURSO = "en_curso"
+COMPLETADO = "completado"
+ERROR = "error"
+
+
+class Trabajo:
+    """
+    Estado de un trabajo de la cola.
+    """
+
+    def __init__(self, tipo, clave):
+        self.id = uuid.uuid4().hex
+        self.tipo = tipo
+        self.clave = clave
+        self.estado = PENDIENTE
+        self.progreso = 0.0
+        self.mensaje = "En cola"
+        self.resultado = None
+        self.error = None
+        self.creado = time.time()
+        self.actualizado = self.creado
+
+    def informar(self, progreso, mensaje=None):
+        """
+        Actualiza el avance (entre 0 y 1) y, opcionalmente, el mensaje.
+        """
+        self.progreso = float(min(max(progreso, 0.0), 1.0))
+        if mensaje is not None:
+            self.mensaje = mensaje
+        self.actualizado = time.time()
+
+    def como_dict(self):
+        return {
+            "job_id": self.id,
+            "tipo": self.tipo,
+            "estado": self.estado,
+            "progreso": round(self.progreso, 4),
+            "mensaje": self.mensaje,
+            "error": self.error,
+            "creado": self.creado,
+            "actualizado": self.actualizado,
+        }
+
+
+class ColaTrabajos:
+    """
+    Cola de trabajos en segundo plano con un pool acotado de hilos.
+
+    Los pedidos idénticos mientras un trabajo está pendiente o en curso
+    reciben el mismo trabajo en lugar de repetir el cálculo. Los trabajos
+    terminados se conservan `retencion` segundos para poder consultar su
+    resultado.
+    """
+
+    def __init__(self, max_hilos=MAX_TRABAJOS, retencion=RETENCION_SEGUNDOS):
+        self.pool = ThreadPoolExecutor(max_workers=max_hilos, thread_name_prefix="trabajo")
+        self.retencion = retencion
+        self.trabajos = {}
+        self.en_vuelo = {}
+        self.bloqueo = threading.Lock()
+
+    def enviar(self, tipo, funcion, parametros):
+        """
+        Encola `funcion(parametros, informar)`, donde `informar(progreso, mensaje)`
+        actualiza el avance del trabajo.
+
+        Retorna:
+            tuple: (Trabajo, bool indicando si se reutilizó un trabajo en vuelo).
+        """
+        clave = clave_pedido(tipo, parametros)
+        with self.bloqueo:
+            self._limpiar()
+            existente = self.en_vuelo.get(clave)
+            if existente is not None:
+                return existente, True
+            trabajo = Trabajo(tipo, clave)
+            self.trabajos[trabajo.id] = trabajo
+            self.en_vuelo[clave] = trabajo
+
+        self.pool.submit(self._ejecutar, trabajo, funcion, parametros)
+        return trabajo, False
+
+    def obtener(self, job_id):
+        """
+        Devuelve el trabajo con ese id, o None si no existe o ya expiró.
+        """
+        with self.bloqueo:
+            return self.trabajos.get(job_id)
+
+    def _ejecutar(self, trabajo, funcion, parametros):
+        trabajo.estado = EN_CURSO
+        trabajo.informar(0.0, "En curso")
+        try:
+            trabajo.resultado = funcion(parametros, trabajo.informar)
+            trabajo.estado = COMPLETADO
+            trabajo.informar(1.0, "Completado")
+        except Exception as e:
+            trabajo.error = str(e)
+            trabajo.estado = ERROR
+            trabajo.informar(trabajo.progreso, "Error")
+        finally:
+            with self.bloqueo:
+                if self.en_vuelo.get(trabajo.clave) is trabajo:
+                    del self.en_vuelo[trabajo.clave]
+
+    def _limpiar(self):
+        limite = time.time() - self.retencion
+        vencidos = [job_id for job_id, t in self.trabajos.items()
+                    if t.estado in (COMPLETADO, ERROR) and t.actualizado < limite]
+        for job_id in vencidos:
+            del self.trabajos[job_id]
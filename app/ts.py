@@ -7,6 +7,9 @@ from statsmodels.tsa.stattools import acf, pacf
 from statsmodels.tsa.arima_process import ArmaProcess
 from datetime import datetime, timedelta
 
+from app.almacen_simulaciones import guardar_simulaciones
+from app.almacen_clima import cargar_clima
+
 
 def analyzeTS(df, column="value", dist="norm"):
     """
@@ -48,6 +51,8 @@ def analyzeTS(df, column="value", dist="norm"):
 def simulateTS(df, column="value", dist="norm", from_date=None, to_date=None, nsim=1000):
     """
     Simula una serie temporal basada en una distribución ajustada y autocorrelación.
+
+    Retorna una tupla (fechas, matriz) donde la matriz tiene forma (nsim, días) en float32.
     """
     data = df[column].dropna()
 
@@ -75,22 +80,19 @@ def simulateTS(df, column="value", dist="norm", from_date=None, to_date=None, ns
 
     if simulation_days <= 0:
         print("No es necesario realizar la simulación, el to_date ya está cubierto por los datos históricos.")
-        return pd.DataFrame()
+        return pd.DatetimeIndex([]), np.empty((0, 0), dtype=np.float32)
 
     simulated_dates = pd.date_range(start=max_date + timedelta(days=1), periods=simulation_days)
-    simulated_series = []
+    simulated_series = np.empty((nsim, simulation_days), dtype=np.float32)
     for i in range(nsim):
         simulated_values = arma_process.generate_sample(nsample=simulation_days)
-        simulated_values = dist_obj.ppf(stats.norm.cdf(simulated_values))
-        sim_df = pd.DataFrame({"date": simulated_dates, "value": simulated_values, "id": str(i)})
-        simulated_series.append(sim_df)
+        simulated_series[i] = dist_obj.ppf(stats.norm.cdf(simulated_values))
 
-    return pd.concat(simulated_series, ignore_index=True)
+    return simulated_dates, simulated_series
 
 
-# Cargar datos desde un CSV
-df = pd.read_csv("data/clima_-34.028193_-55.393066.csv")
-df["date"] = pd.to_datetime(df["date"])
+# Cargar datos desde el almacén climático
+df = cargar_clima(-34.028193, -55.393066, variables=["shortwave_radiation"])
 
 # Análisis de la serie temporal
 resultado = analyzeTS(df, column="shortwave_radiation", dist="norm")
@@ -100,18 +102,18 @@ print("Estadísticas descriptivas:", resultado["stats_summary"])
 # Simulación de datos futuros
 from_date = datetime(2024, 1, 1)
 to_date = datetime(2044, 12, 31)
-simulated_data = simulateTS(df, column="shortwave_radiation", dist="norm", from_date=from_date, to_date=to_date,
-                            nsim=1000)
+simulated_dates, simulated_data = simulateTS(df, column="shortwave_radiation", dist="norm", from_date=from_date,
+                                             to_date=to_date, nsim=1000)
 
 # Guardar resultados
 df.to_csv("data/analisis_clima_-34.028193_-55.393066.csv", index=False)
-simulated_data.to_csv("data/simulated_clima_-34.028193_-55.393066.csv", index=False)
+guardar_simulaciones("data/simulated_clima_-34.028193_-55.393066", simulated_data, simulated_dates,
+                     variable="shortwave_radiation")
 
 # Graficar simulaciones
 plt.figure(figsize=(12, 5))
-for sim_id in np.random.choice(simulated_data['id'].unique(), 10, replace=False):
-    subset = simulated_data[simulated_data['id'] == sim_id]
-    plt.plot(subset['date'], subset['value'], alpha=0.3)
+for sim_id in np.random.choice(len(simulated_data), 10, replace=False):
+    plt.plot(simulated_dates, simulated_data[sim_id], alpha=0.3)
 
 plt.xlabel('Fecha')
 plt.ylabel('Radiación Simulada')
@@ -1,25 +1,112 @@
-
-from shapely.geometry import Point, Polygon
+import os
+import json
+import threading
+import numpy as np
+import shapely
+from shapely.geometry import Point, Polygon, shape
+from app.lcoe import lcoe_anualizado
 
 URUGUAY_POLYGON = Polygon([
     (-58.5, -30.1), (-53.2, -30.1), (-53.2, -34.9), (-58.5, -34.9), (-58.5, -30.1)
 ])
+shapely.prepare(URUGUAY_POLYGON)
 
 RIVERS = [
     Polygon([(-57, -33), (-56.5, -33), (-56.5, -33.5), (-57, -33.5)]),
     Polygon([(-54, -31), (-53.5, -31), (-53.5, -31.5), (-54, -31.5)])
 ]
 
+# Zonas excluidas (ríos, lagos, áreas protegidas): FeatureCollection GeoJSON con la propiedad "tipo" en cada
+# feature. Si el archivo no existe se usan los RIVERS.
+EXCLUSION_ZONES_FILE = os.environ.get("LCOE_ZONAS_EXCLUIDAS", os.path.join("data", "zonas_excluidas.geojson"))
+EXCLUSION_MESSAGES = {
+    "rio": "Las coordenadas están sobre un río.",
+    "lago": "Las coordenadas están sobre un lago.",
+    "area_protegida": "Las coordenadas están en un área protegida.",
+}
+TILE_SIZE = 0.1  # Grados; los puntos se agrupan en teselas para consultar el STRtree
+
+_exclusion_indexes = {}
+_exclusion_lock = threading.Lock()
+
+def load_exclusion_zones(path=EXCLUSION_ZONES_FILE):
+    # Geometrías y tipos de las zonas excluidas, leídos del GeoJSON o tomados de RIVERS
+    if not os.path.exists(path):
+        return list(RIVERS), ["rio"] * len(RIVERS)
+    with open(path) as f:
+        features = json.load(f)["features"]
+    zones = [shape(feature["geometry"]) for feature in features]
+    types = [(feature.get("properties") or {}).get("tipo", "zona_excluida") for feature in features]
+    return zones, types
+
+def exclusion_index(path=EXCLUSION_ZONES_FILE):
+    # (zonas preparadas, tipos, STRtree), armado una vez por archivo
+    with _exclusion_lock:
+        if path not in _exclusion_indexes:
+            zones, types = load_exclusion_zones(path)
+            zones = np.array(zones, dtype=object)
+            shapely.prepare(zones)
+            _exclusion_indexes[path] = (zones, np.array(types, dtype=object), shapely.STRtree(zones))
+        return _exclusion_indexes[path]
+
+def reload_exclusion_zones(path=EXCLUSION_ZONES_FILE):
+    # Descarta el índice en memoria para leer de nuevo el archivo de zonas
+    with _exclusion_lock:
+        _exclusion_indexes.pop(path, None)
+    return exclusion_index(path)
+
 def validate_coordinates(lat, lon):
     point = Point(lon, lat)
     if not URUGUAY_POLYGON.contains(point):
         return False, "Las coordenadas no están dentro de Uruguay."
-    for river in RIVERS:
-        if river.contains(point):
-            return False, "Las coordenadas están sobre un río."
+    zones, types, tree = exclusion_index()
+    hits = tree.query(point, predicate="within")
+    if len(hits):
+        kind = types[hits.min()]
+        return False, EXCLUSION_MESSAGES.get(kind, f"Las coordenadas están en una zona excluida ({kind}).")
     return True, "Ubicación válida."
 
+def excluded_zones_batch(lats, lons, path=EXCLUSION_ZONES_FILE):
+    # Índice de una zona excluida que contiene cada punto (-1 si ninguna). Los puntos se agrupan por tesela y el
+    # STRtree se consulta con una caja por tesela, sin crear un Point por punto; solo los pares (punto, zona) cuya
+    # tesela toca la zona se prueban con contains_xy sobre las zonas preparadas.
+    lats, lons = np.broadcast_arrays(np.asarray(lats, dtype=float), np.asarray(lons, dtype=float))
+    result = np.full(lats.shape, -1, dtype=np.int64)
+    zones, _, tree = exclusion_index(path)
+    finite = np.isfinite(lats) & np.isfinite(lons)
+    if not len(zones) or not finite.any():
+        return result
+
+    candidates = np.flatnonzero(finite)
+    flat_lats, flat_lons = lats.ravel()[candidates], lons.ravel()[candidates]
+    rows = np.floor(flat_lats / TILE_SIZE).astype(np.int64)
+    cols = np.floor(flat_lons / TILE_SIZE).astype(np.int64)
+    keys = (rows - rows.min()) * (cols.max() - cols.min() + 1) + (cols - cols.min())
+    order = np.argsort(keys, kind="stable")
+    _, starts, counts = np.unique(keys[order], return_index=True, return_counts=True)
+    first = order[starts]
+    boxes = shapely.box(cols[first] * TILE_SIZE, rows[first] * TILE_SIZE,
+                        (cols[first] + 1) * TILE_SIZE, (rows[first] + 1) * TILE_SIZE)
+
+    tiles, hit_zones = tree.query(boxes)
+    repeats = counts[tiles]
+    offsets = np.arange(repeats.sum()) - np.repeat(np.cumsum(repeats) - repeats, repeats)
+    points = order[np.repeat(starts[tiles], repeats) + offsets]
+    pair_zones = np.repeat(hit_zones, repeats)
+    inside = shapely.contains_xy(zones[pair_zones], flat_lons[points], flat_lats[points])
+    result.reshape(-1)[candidates[points[inside]]] = pair_zones[inside]
+    return result
+
+def validate_coordinates_batch(lats, lons):
+    # Máscara de coordenadas válidas (dentro de Uruguay y fuera de las zonas excluidas) para arreglos de cualquier
+    # forma; solo los puntos dentro del país se cruzan con las zonas
+    lats, lons = np.broadcast_arrays(np.asarray(lats, dtype=float), np.asarray(lons, dtype=float))
+    valid = np.asarray(shapely.contains_xy(URUGUAY_POLYGON, lons, lats))
+    inside = np.flatnonzero(valid)
+    if len(inside):
+        valid.reshape(-1)[inside] = excluded_zones_batch(lats.ravel()[inside], lons.ravel()[inside]) < 0
+    return valid
+
 def calculate_lcoe(capital_cost, operating_cost, energy_production, discount_rate, lifetime):
-    annual_cost = capital_cost * discount_rate / (1 - (1 + discount_rate) ** -lifetime)
-    annual_cost += operating_cost
-    return annual_cost / energy_production
+    # discount_rate como fracción; acepta escalares o arreglos
+    return lcoe_anualizado(capital_cost, operating_cost, energy_production, discount_rate, lifetime)
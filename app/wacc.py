@@ -1,40 +1,85 @@
 import numpy as np
-import matplotlib.pyplot as plt
 
-# Definir la función de cálculo del LCOE
-def calcular_lcoe(capital_cost, operating_cost, energy_production, discount_rate, lifetime):
-    discount_rate = discount_rate / 100  # Convertir porcentaje a decimal
-    num = capital_cost + operating_cost * sum(1 / ((1 + discount_rate) ** np.arange(1, lifetime + 1)))
-    denom = energy_production * sum(1 / ((1 + discount_rate) ** np.arange(1, lifetime + 1)))
-    return num / denom
+from app.lcoe import lcoe_anualizado, barrido_lcoe
 
 # Parámetros fijos
-capital_cost = 1500  # US$/kW
-operating_cost = 20  # US$/kW/año
-energy_production = 10000  # kWh/año
-lifetime = 25  # años
+CAPITAL_COST = 1500  # US$/kW
+OPERATING_COST = 20  # US$/kW/año
+ENERGY_PRODUCTION = 10000  # kWh/año
+LIFETIME = 25  # años
 
 # Escenarios de WAC (costo promedio ponderado de capital)
-wac_scenarios = [4.2, 7.5, 10]  # en porcentaje
+WAC_SCENARIOS = [4.2, 7.5, 10]  # en porcentaje
+
+# Tamaño máximo de la grilla de un barrido y vida útil máxima (años)
+MAXIMO_PUNTOS = 2_000_000
+VIDA_MAXIMA = 100
+
+
+# Definir la función de cálculo del LCOE
+def calcular_lcoe(capital_cost, operating_cost, energy_production, discount_rate, lifetime):
+    # discount_rate en porcentaje; acepta escalares o arreglos (una sola llamada vectorizada). La vida útil se
+    # redondea hacia arriba, como la suma original sobre np.arange(1, lifetime + 1)
+    return lcoe_anualizado(capital_cost, operating_cost, energy_production, np.asarray(discount_rate) / 100,
+                           np.ceil(lifetime))
+
+
+def eje(minimo, maximo, paso):
+    """
+    Valores de un eje del barrido entre `minimo` y `maximo` (inclusive) cada `paso`.
+    """
+    if paso <= 0 or maximo < minimo:
+        raise ValueError(f"Eje inválido: mínimo={minimo}, máximo={maximo}, paso={paso}")
+    if (maximo - minimo) / paso + 1 > MAXIMO_PUNTOS:
+        raise ValueError(f"El eje tiene más de {MAXIMO_PUNTOS} valores.")
+    return np.round(np.arange(minimo, maximo + paso / 2, paso), 10)
+
+
+def barrido_wacc(wacc, vidas, capital_costs, operating_cost=OPERATING_COST, energy_production=ENERGY_PRODUCTION):
+    """
+    LCOE sobre la grilla WACC × vida útil × CAPEX, con los factores de
+    anualidad de la forma cerrada sobre la grilla WACC × vida útil.
+
+    Parámetros:
+        wacc (array): WACC en porcentaje.
+        vidas (array): Vidas útiles enteras en años (hasta VIDA_MAXIMA).
+        capital_costs (array): CAPEX en US$/kW.
+        operating_cost (float): Costo operativo en US$/kW/año.
+        energy_production (float): Energía producida en kWh/año.
+
+    Retorna:
+        np.ndarray: Grilla (wacc, vidas, capex) de LCOE en US$/kWh.
+    """
+    wacc, vidas, capital_costs = (np.atleast_1d(np.asarray(v, dtype=float)) for v in (wacc, vidas, capital_costs))
+    puntos = len(wacc) * len(vidas) * len(capital_costs)
+    if puntos > MAXIMO_PUNTOS:
+        raise ValueError(f"La grilla tiene {puntos} puntos; el máximo es {MAXIMO_PUNTOS}.")
+    if np.any(vidas < 1) or np.any(vidas != np.round(vidas)) or np.any(vidas > VIDA_MAXIMA):
+        raise ValueError(f"Las vidas útiles deben ser enteros entre 1 y {VIDA_MAXIMA}.")
+    return barrido_lcoe(wacc / 100, vidas.astype(np.int64), capital_costs, operating_cost, energy_production)
+
+
+if __name__ == "__main__":
+    import matplotlib.pyplot as plt
 
-# Calcular LCOE para cada escenario de WAC
-lcoe_values = [calcular_lcoe(capital_cost, operating_cost, energy_production, wac, lifetime) for wac in wac_scenarios]
+    # Calcular LCOE para cada escenario de WAC
+    lcoe_values = calcular_lcoe(CAPITAL_COST, OPERATING_COST, ENERGY_PRODUCTION, np.array(WAC_SCENARIOS), LIFETIME)
 
-# Crear gráfico
-plt.figure(figsize=(8, 5))
-plt.plot(wac_scenarios, lcoe_values, marker='o', linestyle='-', color='b', label="LCOE")
+    # Crear gráfico
+    plt.figure(figsize=(8, 5))
+    plt.plot(WAC_SCENARIOS, lcoe_values, marker='o', linestyle='-', color='b', label="LCOE")
 
-# Líneas horizontales de referencia
-plt.axhline(y=min(lcoe_values), color='g', linestyle='--', label=f"Min: {min(lcoe_values):.4f} $/kWh")
-plt.axhline(y=max(lcoe_values), color='r', linestyle='--', label=f"Max: {max(lcoe_values):.4f} $/kWh")
+    # Líneas horizontales de referencia
+    plt.axhline(y=min(lcoe_values), color='g', linestyle='--', label=f"Min: {min(lcoe_values):.4f} $/kWh")
+    plt.axhline(y=max(lcoe_values), color='r', linestyle='--', label=f"Max: {max(lcoe_values):.4f} $/kWh")
 
-# Etiquetas y título
-plt.xlabel("WAC (%)")
-plt.ylabel("LCOE (US$/MWh)") # ver esto
-plt.title("Impacto del WAC en el LCOE")
-plt.xticks(wac_scenarios)
-plt.legend()
-plt.grid(True, linestyle="--", alpha=0.7)
+    # Etiquetas y título
+    plt.xlabel("WAC (%)")
+    plt.ylabel("LCOE (US$/MWh)") # ver esto
+    plt.title("Impacto del WAC en el LCOE")
+    plt.xticks(WAC_SCENARIOS)
+    plt.legend()
+    plt.grid(True, linestyle="--", alpha=0.7)
 
-# Mostrar gráfico
-plt.show()
+    # Mostrar gráfico
+    plt.show()
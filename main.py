@@ -1,13 +1,29 @@
-from flask import Flask, request, jsonify, render_template, send_from_directory, current_app
+from flask import Flask, Response, request, jsonify, render_template, send_from_directory, current_app
 import requests
 from flasgger import Swagger
-import matplotlib.pyplot as plt
 import os
-from app.generar_csv_climatico import generar_csv
-from app.calcular_proyeccion_lcoe import calcular_lcoe_r
+import json
+import struct
+import numpy as np
+from app.generar_csv_climatico import generar_csv, generar_clima
+from app.lcoe import lcoe_anualizado
+from app.modelo_fv import sistema_fv
+from app.sensibilidad import analizar_sensibilidad, definir_problema, energia_sitio, N_MUESTRAS
+from app.wacc import barrido_wacc, eje, OPERATING_COST, ENERGY_PRODUCTION
+from app.trabajos import ColaTrabajos, COMPLETADO, ERROR
+from app.cache_resultados import CacheResultados, clave_pedido
+from app.graficos import grafico_lcoe
+from app.indice_ubicaciones import celda, clave_celda, celda_en_uso
+from app.mapa_lcoe import parametros_mapa, clave_mapa, calcular_mapa, cargar_mapa, mapa_geojson, grilla, \
+    NSIM_MAXIMO_MAPA
+from app.calcular_proyeccion_lcoe import calcular_lcoe_r, calcular_lcoe_py, calcular_lcoe_montecarlo, BACKEND_SIMULACION, \
+    NSIM_MAXIMO
+from app.utils import validate_coordinates
 
 app = Flask(__name__, template_folder="app/templates")
 swagger = Swagger(app)
+cola_trabajos = ColaTrabajos()
+cache_resultados = CacheResultados()
 
 @app.route("/")
 def home():
@@ -43,6 +59,66 @@ def status():
     """
     return jsonify({"message": "La API de Flask está funcionando correctamente"}), 200
 
+def _validar_procesar(data):
+    """
+    Valida el pedido de /procesar y lo lleva a una forma canónica (coordenadas
+    ajustadas a la celda de la grilla), que también identifica pedidos repetidos.
+    """
+    lat, lon = celda(float(data["latitude"]), float(data["longitude"]))
+    return {
+        "lat": lat,
+        "lon": lon,
+        "projection_date": str(data["projection_date"]),
+        "capital_cost": float(data["capital_cost"]),
+        "operating_cost": float(data["operating_cost"]),
+        "energy_production": float(data["energy_production"]),
+        "discount_rate": float(data["discount_rate"]),
+        "lifetime": int(data["lifetime"]),
+    }
+
+def _ejecutar_procesar(parametros, informar=None):
+    """
+    Obtiene los datos climáticos, simula y calcula el LCOE. Los resultados
+    correctos quedan en la caché de resultados con la clave del pedido.
+
+    Retorna:
+        tuple: (diccionario con el resultado, código HTTP).
+    """
+    informar = informar or (lambda progreso, mensaje=None: None)
+    lat, lon = parametros["lat"], parametros["lon"]
+    projection_date = parametros["projection_date"]
+    financieros = {clave: parametros[clave] for clave in
+                   ("capital_cost", "operating_cost", "energy_production", "discount_rate", "lifetime")}
+    data_dir = "data"
+
+    informar(0.0, "Obteniendo datos climáticos")
+    with celda_en_uso(clave_celda(lat, lon)):  # Que el desalojo no borre la celda durante el pedido
+        if BACKEND_SIMULACION == "python":
+            if generar_clima(lat, lon, projection_date) is None:
+                return {"error": "No se pudieron obtener los datos climáticos"}, 500
+
+            informar(0.1, "Simulando escenarios")
+            resultado = calcular_lcoe_py(data_dir=data_dir, lat=lat, lon=lon, projection_date=projection_date,
+                                         progreso=lambda fraccion: informar(0.1 + 0.85 * fraccion), **financieros)
+        else:
+            csv_file = generar_csv(lat, lon, projection_date)
+            if csv_file is None:
+                return {"error": "No se pudieron obtener los datos climáticos"}, 500
+
+            informar(0.1, "Simulando escenarios en la API de R")
+            resultado = calcular_lcoe_r(data_dir=data_dir, input_file=os.path.basename(csv_file),
+                                        projection_date=projection_date, **financieros)
+
+    if "error" not in resultado:
+        cache_resultados.guardar(clave_pedido("procesar", parametros), resultado)
+    return resultado, 200
+
+def _trabajo_procesar(parametros, informar):
+    resultado, codigo = _ejecutar_procesar(parametros, informar)
+    if codigo != 200 or "error" in resultado:
+        raise RuntimeError(resultado.get("error", "Error interno"))
+    return resultado
+
 @app.route("/procesar", methods=["POST"])
 def procesar():
     """
@@ -50,7 +126,7 @@ def procesar():
     ---
     post:
       summary: Procesa los datos recibidos y calcula el LCOE.
-      description: Recibe parámetros, genera el CSV climático si no existe y llama a la API de R para calcular el LCOE.
+      description: Recibe parámetros, obtiene los datos climáticos si no existen y calcula el LCOE con el motor de simulación configurado (LCOE_BACKEND=python en proceso, o r para la API de R). Con "async" en true, encola el cálculo y responde 202 con el id del trabajo (ver /trabajos/{job_id}).
       parameters:
         - in: body
           name: body
@@ -74,11 +150,15 @@ def procesar():
                 type: number
               lifetime:
                 type: integer
+              async:
+                type: boolean
       responses:
         200:
-          description: Resultado del cálculo LCOE.
+          description: Resultado del cálculo LCOE (desde la caché si el mismo pedido ya se calculó; encabezado X-Cache HIT).
           schema:
             type: object
+        202:
+          description: Trabajo encolado (o reutilizado si ya había uno igual en curso).
         400:
           description: Error por parámetros faltantes.
         500:
@@ -89,38 +169,503 @@ def procesar():
         return jsonify({"error": "No se enviaron datos en la solicitud"}), 400
 
     try:
-        lat = data["latitude"]
-        lon = data["longitude"]
-        projection_date = data["projection_date"]
-
-        capital_cost = float(data["capital_cost"])
-        operating_cost = float(data["operating_cost"])
-        energy_production = float(data["energy_production"])
-        discount_rate = float(data["discount_rate"])
-        lifetime = int(data["lifetime"])
-
-        data_dir = "data"
-        csv_file = f"{data_dir}/clima_{lat}_{lon}.csv"
-        generar_csv(lat, lon, projection_date)
-
-        resultado = calcular_lcoe_r(
-            data_dir=data_dir,
-            input_file=f"clima_{lat}_{lon}.csv",
-            capital_cost=capital_cost,
-            operating_cost=operating_cost,
-            energy_production=energy_production,
-            discount_rate=discount_rate,
-            lifetime=lifetime,
-            projection_date=projection_date
-        )
+        parametros = _validar_procesar(data)
+
+        resultado = cache_resultados.obtener(clave_pedido("procesar", parametros))
+        if resultado is not None:
+            return jsonify(resultado), 200, {"X-Cache": "HIT"}
+
+        if data.get("async"):
+            return _encolar("procesar", _trabajo_procesar, parametros)
+
+        resultado, codigo = _ejecutar_procesar(parametros)
+        return jsonify(resultado), codigo
+
+    except KeyError as e:
+        return jsonify({"error": f"Falta el parámetro requerido: {str(e)}"}), 400
+    except (TypeError, ValueError) as e:
+        return jsonify({"error": f"Parámetro inválido: {str(e)}"}), 400
+    except Exception as e:
+        return jsonify({"error": f"Error interno: {str(e)}"}), 500
+
+def _encolar(tipo, funcion, parametros):
+    trabajo, reutilizado = cola_trabajos.enviar(tipo, funcion, parametros)
+    respuesta = jsonify({**trabajo.como_dict(), "reutilizado": reutilizado,
+                         "estado_url": f"/trabajos/{trabajo.id}",
+                         "resultado_url": f"/trabajos/{trabajo.id}/resultado"})
+    return respuesta, 202, {"Location": f"/trabajos/{trabajo.id}"}
+
+@app.route("/trabajos/procesar", methods=["POST"])
+def encolar_procesar():
+    """
+    Encola un cálculo de /procesar.
+    ---
+    post:
+      summary: Encola la simulación y el cálculo del LCOE.
+      description: Recibe los mismos parámetros que /procesar y responde de inmediato con el id del trabajo. Los pedidos idénticos (misma celda y parámetros) mientras un trabajo está en curso comparten ese trabajo.
+      parameters:
+        - in: body
+          name: body
+          required: true
+          schema:
+            type: object
+      responses:
+        202:
+          description: Trabajo encolado o reutilizado.
+        400:
+          description: Error por parámetros faltantes o inválidos.
+    """
+    data = request.get_json()
+    if not data:
+        return jsonify({"error": "No se enviaron datos en la solicitud"}), 400
+
+    try:
+        return _encolar("procesar", _trabajo_procesar, _validar_procesar(data))
+    except KeyError as e:
+        return jsonify({"error": f"Falta el parámetro requerido: {str(e)}"}), 400
+    except (TypeError, ValueError) as e:
+        return jsonify({"error": f"Parámetro inválido: {str(e)}"}), 400
+
+@app.route("/trabajos/<job_id>", methods=["GET"])
+def estado_trabajo(job_id):
+    """
+    Estado y progreso de un trabajo.
+    ---
+    get:
+      summary: Devuelve el estado (pendiente, en_curso, completado o error) y el progreso de un trabajo.
+      parameters:
+        - in: path
+          name: job_id
+          required: true
+          type: string
+      responses:
+        200:
+          description: Estado del trabajo.
+        404:
+          description: Trabajo inexistente o expirado.
+    """
+    trabajo = cola_trabajos.obtener(job_id)
+    if trabajo is None:
+        return jsonify({"error": "Trabajo inexistente o expirado"}), 404
+    return jsonify(trabajo.como_dict())
+
+@app.route("/trabajos/<job_id>/resultado", methods=["GET"])
+def resultado_trabajo(job_id):
+    """
+    Resultado de un trabajo.
+    ---
+    get:
+      summary: Devuelve el resultado de un trabajo terminado.
+      parameters:
+        - in: path
+          name: job_id
+          required: true
+          type: string
+      responses:
+        200:
+          description: Resultado del cálculo.
+        202:
+          description: El trabajo todavía no terminó.
+        404:
+          description: Trabajo inexistente o expirado.
+        500:
+          description: El trabajo terminó con error.
+    """
+    trabajo = cola_trabajos.obtener(job_id)
+    if trabajo is None:
+        return jsonify({"error": "Trabajo inexistente o expirado"}), 404
+    if trabajo.estado == COMPLETADO:
+        return jsonify(trabajo.resultado)
+    if trabajo.estado == ERROR:
+        return jsonify({"error": trabajo.error}), 500
+    return jsonify(trabajo.como_dict()), 202
+
+@app.route("/lcoe_montecarlo", methods=["POST"])
+def lcoe_montecarlo():
+    """
+    Simulación Monte Carlo del LCOE sin la API de R.
+    ---
+    post:
+      summary: Calcula la distribución del LCOE sobre escenarios de CAPEX, WACC y energía.
+      description: Muestrea CAPEX triangular y WACC uniforme (como src/scripts/LCOE.R) y calcula el LCOE de todos los escenarios. La energía anual se envía en el pedido o se simula para la ubicación.
+      parameters:
+        - in: body
+          name: body
+          required: true
+          schema:
+            type: object
+            properties:
+              latitude:
+                type: number
+              longitude:
+                type: number
+              projection_date:
+                type: string
+              energia_anual:
+                type: array
+                description: Energía anual en kWh (un perfil o una matriz nsim × años).
+              anios:
+                type: array
+                items:
+                  type: integer
+              nsim:
+                type: integer
+                description: Número de escenarios (1 a 100 000).
+              seed:
+                type: integer
+              capex:
+                type: array
+                description: Mínimo, moda y máximo del CAPEX en US$/kW.
+                items:
+                  type: number
+              wacc:
+                type: array
+                description: Mínimo y máximo del WACC como fracción.
+                items:
+                  type: number
+              incluir_escenarios:
+                type: boolean
+              sistema:
+                type: object
+                description: Sistema fotovoltaico usado al simular la energía (eficiencia, area, kwp, coef_temperatura, noct, temperatura_ambiente, perdidas_inversor, degradacion_anual). No se admite junto con energia_anual.
+      responses:
+        200:
+          description: Resumen del LCOE (US$/MWh) y, opcionalmente, el LCOE de cada escenario.
+          schema:
+            type: object
+        400:
+          description: Error por parámetros faltantes o inválidos.
+        500:
+          description: Error interno.
+    """
+    data = request.get_json()
+    if not data:
+        return jsonify({"error": "No se enviaron datos en la solicitud"}), 400
+
+    try:
+        parametros = {
+            "nsim": int(data.get("nsim", 1000)),
+            "seed": int(data.get("seed", 1995)),
+            "capex": tuple(float(v) for v in data.get("capex", (2230, 3190, 4150))),
+            "wacc": tuple(float(v) for v in data.get("wacc", (0.04, 0.10))),
+            "incluir_escenarios": bool(data.get("incluir_escenarios", False)),
+        }
+        if len(parametros["capex"]) != 3 or len(parametros["wacc"]) != 2:
+            return jsonify({"error": "capex debe tener [mínimo, moda, máximo] y wacc [mínimo, máximo]"}), 400
+        if not 1 <= parametros["nsim"] <= NSIM_MAXIMO:
+            return jsonify({"error": f"nsim debe estar entre 1 y {NSIM_MAXIMO}"}), 400
+
+        if "energia_anual" in data:
+            if "sistema" in data:
+                return jsonify({"error": "sistema no se aplica a energia_anual, que ya es energía del sistema"}), 400
+            resultado = calcular_lcoe_montecarlo(energia=data["energia_anual"], anios=data.get("anios"),
+                                                 **parametros)
+        else:
+            lat = float(data["latitude"])
+            lon = float(data["longitude"])
+            projection_date = data["projection_date"]
+            es_valida, mensaje = validate_coordinates(lat, lon)
+            if not es_valida:
+                return jsonify({"error": mensaje}), 400
+            sistema = sistema_fv(**data.get("sistema", {}))
+            with celda_en_uso(clave_celda(lat, lon)):
+                if generar_clima(lat, lon, projection_date) is None:
+                    return jsonify({"error": "No se pudieron obtener los datos climáticos"}), 500
+                resultado = calcular_lcoe_montecarlo(lat=lat, lon=lon, projection_date=projection_date,
+                                                     sistema=sistema, **parametros)
 
+        # Los parámetros inválidos ya se rechazaron con 400: un error en el resultado es interno
+        return jsonify(resultado), 500 if "error" in resultado else 200
+
+    except KeyError as e:
+        return jsonify({"error": f"Falta el parámetro requerido: {str(e)}"}), 400
+    except (TypeError, ValueError) as e:
+        return jsonify({"error": f"Parámetro inválido: {str(e)}"}), 400
+    except Exception as e:
+        return jsonify({"error": f"Error interno: {str(e)}"}), 500
+
+@app.route("/sensibilidad", methods=["POST"])
+def sensibilidad():
+    """
+    Análisis de sensibilidad de Sobol del LCOE.
+    ---
+    post:
+      summary: Calcula los índices de Sobol del LCOE respecto de sus parámetros.
+      description: Evalúa el LCOE sobre la matriz de muestras de SALib en una sola pasada vectorizada. Los resultados se guardan en caché por definición del problema. Si se indica una ubicación, la producción de energía se toma de la energía anual simulada del sitio, que también queda en caché por celda, modelo y fecha de proyección.
+      parameters:
+        - in: body
+          name: body
+          required: false
+          schema:
+            type: object
+            properties:
+              bounds:
+                type: object
+                description: Límites [mínimo, máximo] por variable ("Capital Cost", "Operating Cost", "Energy Production", "Discount Rate", "Lifetime").
+              n:
+                type: integer
+                description: Muestras base de Sobol (potencia de 2).
+              segundo_orden:
+                type: boolean
+              latitude:
+                type: number
+              longitude:
+                type: number
+              projection_date:
+                type: string
+      responses:
+        200:
+          description: Índices S1 y ST, contribuciones porcentuales y variable de mayor impacto.
+          schema:
+            type: object
+        400:
+          description: Parámetros inválidos.
+        500:
+          description: Error interno.
+    """
+    data = request.get_json(silent=True) or {}
+
+    try:
+        segundo_orden = data.get("segundo_orden", True)
+        if not isinstance(segundo_orden, bool):
+            return jsonify({"error": "segundo_orden debe ser true o false"}), 400
+
+        energia = None
+        if "latitude" in data or "longitude" in data:
+            lat = float(data["latitude"])
+            lon = float(data["longitude"])
+            projection_date = data.get("projection_date", "2044-12-31")
+            es_valida, mensaje = validate_coordinates(lat, lon)
+            if not es_valida:
+                return jsonify({"error": mensaje}), 400
+            with celda_en_uso(clave_celda(lat, lon)):
+                if generar_clima(lat, lon, projection_date) is None:
+                    return jsonify({"error": "No se pudieron obtener los datos climáticos"}), 500
+                energia = energia_sitio(lat, lon, projection_date)
+            if energia is None:
+                return jsonify({"error": "No hay datos climáticos para la ubicación"}), 500
+
+        problema = definir_problema(data.get("bounds"), energia)
+        resultado = analizar_sensibilidad(problema, int(data.get("n", N_MUESTRAS)), segundo_orden)
         return jsonify(resultado)
 
     except KeyError as e:
         return jsonify({"error": f"Falta el parámetro requerido: {str(e)}"}), 400
+    except (TypeError, ValueError) as e:
+        return jsonify({"error": f"Parámetro inválido: {str(e)}"}), 400
     except Exception as e:
         return jsonify({"error": f"Error interno: {str(e)}"}), 500
 
+def _respuesta_binaria(arreglo, encabezado):
+    """
+    Arreglo float32 little-endian en orden C precedido de un encabezado JSON
+    (con la forma y los ejes): 4 bytes con el largo del JSON (uint32
+    little-endian) y el JSON rellenado con espacios hasta un múltiplo de 4,
+    para que los datos queden alineados. La forma también va en X-Forma.
+    """
+    cabecera = json.dumps({**encabezado, "forma": list(arreglo.shape)}).encode()
+    cabecera += b" " * (-len(cabecera) % 4)
+    cuerpo = struct.pack("<I", len(cabecera)) + cabecera + np.asarray(arreglo, dtype="<f4").tobytes()
+    return Response(cuerpo, mimetype="application/octet-stream",
+                    headers={"X-Forma": ",".join(str(n) for n in arreglo.shape)})
+
+def _eje_barrido(valor, por_defecto):
+    """
+    Un eje del barrido puede ser una lista de valores o {"min", "max", "paso"}.
+    """
+    valor = por_defecto if valor is None else valor
+    if isinstance(valor, dict):
+        return eje(float(valor["min"]), float(valor["max"]), float(valor.get("paso", 1)))
+    return [float(v) for v in valor]
+
+@app.route("/wacc_sweep", methods=["POST"])
+def wacc_sweep():
+    """
+    Barrido del LCOE sobre WACC, vida útil y CAPEX.
+    ---
+    post:
+      summary: Calcula el LCOE sobre una grilla WACC × vida útil × CAPEX.
+      description: Evalúa toda la grilla de una vez con la forma cerrada del factor de anualidad. Cada eje es una lista de valores o un objeto con min, max y paso; la vida útil va de 1 a 100 años. Con formato "binario" devuelve un encabezado JSON (uint32 little-endian con su largo, seguido del JSON con la forma y los ejes) y luego la grilla como float32 little-endian en orden C (wacc, vida útil, CAPEX); la forma también va en X-Forma.
+      parameters:
+        - in: body
+          name: body
+          required: false
+          schema:
+            type: object
+            properties:
+              wacc:
+                type: object
+                description: WACC en porcentaje (por defecto de 2 a 12 cada 0.25).
+              lifetime:
+                type: object
+                description: Vida útil en años (por defecto de 10 a 40).
+              capital_cost:
+                type: object
+                description: CAPEX en US$/kW (por defecto de 500 a 5000 cada 100).
+              operating_cost:
+                type: number
+              energy_production:
+                type: number
+              formato:
+                type: string
+                enum: [json, binario]
+      responses:
+        200:
+          description: Ejes y grilla de LCOE en US$/kWh.
+        400:
+          description: Parámetros inválidos.
+        500:
+          description: Error interno.
+    """
+    data = request.get_json(silent=True) or {}
+
+    try:
+        ejes = {
+            "wacc": _eje_barrido(data.get("wacc"), {"min": 2, "max": 12, "paso": 0.25}),
+            "lifetime": _eje_barrido(data.get("lifetime"), {"min": 10, "max": 40, "paso": 1}),
+            "capital_cost": _eje_barrido(data.get("capital_cost"), {"min": 500, "max": 5000, "paso": 100}),
+        }
+        grilla = barrido_wacc(ejes["wacc"], ejes["lifetime"], ejes["capital_cost"],
+                              float(data.get("operating_cost", OPERATING_COST)),
+                              float(data.get("energy_production", ENERGY_PRODUCTION)))
+        ejes = {nombre: [float(v) for v in valores] for nombre, valores in ejes.items()}
+
+        if data.get("formato", "json") == "binario":
+            return _respuesta_binaria(grilla, {"ejes": ejes})
+        return jsonify({"ejes": ejes, "forma": list(grilla.shape), "lcoe": grilla.round(6).tolist()})
+
+    except KeyError as e:
+        return jsonify({"error": f"Falta el parámetro requerido: {str(e)}"}), 400
+    except (TypeError, ValueError) as e:
+        return jsonify({"error": f"Parámetro inválido: {str(e)}"}), 400
+    except Exception as e:
+        return jsonify({"error": f"Error interno: {str(e)}"}), 500
+
+def _trabajo_mapa(parametros, informar):
+    meta = calcular_mapa(parametros["parametros"], descargar=parametros["descargar"],
+                         recalcular=parametros["recalcular"], progreso=lambda fraccion: informar(fraccion))
+    return {**meta, "geojson_url": f"/mapa_lcoe/{meta['clave']}"}
+
+@app.route("/mapa_lcoe", methods=["POST"])
+def mapa_lcoe():
+    """
+    Mapa de LCOE sobre una grilla de Uruguay.
+    ---
+    post:
+      summary: Calcula (o devuelve) el mapa P10/P50/P90 del LCOE sobre una grilla.
+      description: Filtra las celdas válidas del recuadro, simula cada una en paralelo con su modelo de la caché y guarda el raster de cuantiles del LCOE (US$/MWh). Si el mapa ya existe responde 200 con sus metadatos; si no, encola el cálculo y responde 202 con el id del trabajo (ver /trabajos/{job_id}). La capa se obtiene en /mapa_lcoe/{clave}.
+      parameters:
+        - in: body
+          name: body
+          required: false
+          schema:
+            type: object
+            properties:
+              bbox:
+                type: array
+                description: Oeste, sur, este y norte en grados (por defecto Uruguay).
+                items:
+                  type: number
+              resolucion:
+                type: number
+                description: Paso de la grilla en grados (por defecto 0.1).
+              projection_date:
+                type: string
+              nsim:
+                type: integer
+              seed:
+                type: integer
+              capex:
+                type: array
+                items:
+                  type: number
+              wacc:
+                type: array
+                items:
+                  type: number
+              sistema:
+                type: object
+              descargar:
+                type: boolean
+                description: Sincronizar antes el clima de las celdas.
+              recalcular:
+                type: boolean
+                description: Ignorar el mapa guardado.
+      responses:
+        200:
+          description: Metadatos del mapa ya calculado.
+        202:
+          description: Cálculo encolado (o reutilizado si ya había uno igual en curso).
+        400:
+          description: Parámetros inválidos.
+    """
+    data = request.get_json(silent=True) or {}
+
+    try:
+        parametros = parametros_mapa(
+            bbox=data.get("bbox"),
+            resolucion=float(data.get("resolucion", 0.1)),
+            hasta=str(data.get("projection_date", "2044-12-31")),
+            nsim=int(data.get("nsim", 256)),
+            semilla=int(data.get("seed", 1995)),
+            capex=tuple(float(v) for v in data.get("capex", (2230, 3190, 4150))),
+            wacc=tuple(float(v) for v in data.get("wacc", (0.04, 0.10))),
+            sistema=sistema_fv(**data["sistema"]) if "sistema" in data else None,
+        )
+        if len(parametros["bbox"]) != 4 or len(parametros["capex"]) != 3 or len(parametros["wacc"]) != 2:
+            return jsonify({"error": "bbox debe tener [oeste, sur, este, norte], capex [mínimo, moda, máximo] "
+                                     "y wacc [mínimo, máximo]"}), 400
+        if not 1 <= parametros["nsim"] <= NSIM_MAXIMO_MAPA:
+            return jsonify({"error": f"nsim debe estar entre 1 y {NSIM_MAXIMO_MAPA}"}), 400
+        grilla(parametros["bbox"], parametros["resolucion"])  # Valida el recuadro y el tamaño de la grilla
+
+        recalcular = bool(data.get("recalcular", False))
+        existente = None if recalcular else cargar_mapa(clave_mapa(parametros))
+        if existente is not None:
+            return jsonify({**existente[1], "geojson_url": f"/mapa_lcoe/{existente[1]['clave']}"})
+        return _encolar("mapa_lcoe", _trabajo_mapa, {"parametros": parametros, "recalcular": recalcular,
+                                                     "descargar": bool(data.get("descargar", False))})
+
+    except KeyError as e:
+        return jsonify({"error": f"Falta el parámetro requerido: {str(e)}"}), 400
+    except (TypeError, ValueError) as e:
+        return jsonify({"error": f"Parámetro inválido: {str(e)}"}), 400
+    except Exception as e:
+        return jsonify({"error": f"Error interno: {str(e)}"}), 500
+
+@app.route("/mapa_lcoe/<clave>", methods=["GET"])
+def capa_mapa_lcoe(clave):
+    """
+    Capa del mapa de LCOE.
+    ---
+    get:
+      summary: Devuelve un mapa calculado como capa GeoJSON o como raster binario.
+      description: La capa GeoJSON tiene un polígono por celda con datos y sus cuantiles (p10, p50, p90) en US$/MWh. Con formato=binario el cuerpo empieza con 4 bytes (uint32 little-endian) con el largo de un encabezado JSON con la forma, las latitudes, las longitudes y los cuantiles; le sigue el raster float32 little-endian en orden C (cuantiles, filas de norte a sur, columnas de oeste a este).
+      parameters:
+        - in: path
+          name: clave
+          required: true
+          type: string
+        - in: query
+          name: formato
+          type: string
+          enum: [geojson, binario]
+      responses:
+        200:
+          description: Capa del mapa.
+        404:
+          description: Mapa inexistente.
+    """
+    mapa = cargar_mapa(clave)
+    if mapa is None:
+        return jsonify({"error": "Mapa inexistente"}), 404
+    raster, meta = mapa
+
+    if request.args.get("formato", "geojson") == "binario":
+        return _respuesta_binaria(raster, {"lats": meta["lats"], "lons": meta["lons"],
+                                           "cuantiles": meta["parametros"]["cuantiles"]})
+    return Response(json.dumps(mapa_geojson(raster, meta)), mimetype="application/geo+json")
+
 @app.route("/calcular_lcoe", methods=["POST"])
 def calcular_lcoe():
     """
@@ -128,7 +673,7 @@ def calcular_lcoe():
     ---
     post:
       summary: Calcula el LCOE y genera una imagen de la proyección.
-      description: Calcula el LCOE promedio y guarda una gráfica en la carpeta images, devolviendo la URL de la imagen.
+      description: Calcula el LCOE promedio y guarda una gráfica en la carpeta images, devolviendo la URL de la imagen. El nombre de la imagen se deriva de su contenido (y de image_name, si se indica), por lo que pedidos equivalentes reutilizan el mismo archivo.
       parameters:
         - in: body
           name: body
@@ -158,19 +703,35 @@ def calcular_lcoe():
                 type: string
     """
     data = request.get_json()
-    image_name = data.get("image_name", f'lcoe_{os.urandom(4).hex()}.png')
-    lcoe = (data['capital_cost'] + data['operating_cost'] * data['lifetime']) / (
-        data['energy_production'] * data['lifetime']
-    )
-    plt.figure()
-    plt.plot([1, 2, 3], [lcoe, lcoe * 1.1, lcoe * 0.9])
-    plt.title('LCOE Proyección')
-    images_dir = os.path.join(current_app.root_path, 'images')
-    os.makedirs(images_dir, exist_ok=True)
-    image_path = os.path.join(images_dir, image_name)
-    plt.savefig(image_path)
-    plt.close()
-    return jsonify({'LCOE': round(lcoe, 2), 'image_url': f'/images/{image_name}'})
+    if not data:
+        return jsonify({"error": "No se enviaron datos en la solicitud"}), 400
+    try:
+        parametros = {campo: float(data[campo]) for campo in
+                      ("capital_cost", "operating_cost", "energy_production", "lifetime")}
+        parametros["image_name"] = data.get("image_name")
+        images_dir = os.path.join(current_app.root_path, 'images')
+
+        clave = clave_pedido("calcular_lcoe", parametros)
+        resultado = cache_resultados.obtener(clave)
+        if resultado is not None and os.path.exists(os.path.join(images_dir, os.path.basename(resultado['image_url']))):
+            return jsonify(resultado), 200, {"X-Cache": "HIT"}
+
+        # Sin descuento (tasa 0): (C + O·n) / (E·n)
+        lcoe = lcoe_anualizado(parametros['capital_cost'], parametros['operating_cost'],
+                               parametros['energy_production'], 0, parametros['lifetime'])
+        image_name = grafico_lcoe(lcoe, images_dir, parametros["image_name"])
+        resultado = {'LCOE': round(lcoe, 2), 'image_url': f'/images/{image_name}'}
+        cache_resultados.guardar(clave, resultado)
+        return jsonify(resultado)
+
+    except KeyError as e:
+        return jsonify({"error": f"Falta el parámetro requerido: {str(e)}"}), 400
+    except (TypeError, ValueError) as e:
+        return jsonify({"error": f"Parámetro inválido: {str(e)}"}), 400
+    except TimeoutError:
+        return jsonify({"error": "El gráfico no se generó a tiempo"}), 500
+    except Exception as e:
+        return jsonify({"error": f"Error interno: {str(e)}"}), 500
 
 @app.route("/images/<filename>")
 def serve_image(filename):
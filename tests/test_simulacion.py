@@ -0,0 +1,60 @@
+import os
+import json
+import numpy as np
+import pandas as pd
+import pytest
+
+from app.almacen_simulaciones import guardar_simulaciones
+from app.simulacion import ajustar_modelo, simular_modelo, estadisticas_mensuales, estructura_acs, comparar_con_r
+
+RUTA_REFERENCIA = os.path.join(os.path.dirname(__file__), "datos", "serie_diaria_referencia.json")
+# Almacén de CoSMoS generado con tests/datos/generar_simulaciones_r.R sobre la misma serie de referencia
+RUTA_SIMULACIONES_R = os.path.join(os.path.dirname(__file__), "datos", "simulaciones_r")
+
+# Tolerancias de la comparación mensual de los escenarios simulados con la serie de referencia (media y
+# desvío) y con la autocorrelación de lag 1 del modelo ajustado, que es la que reproduce CoSMoS::simulateTS
+TOLERANCIA_MEDIA = 0.03  # Relativa
+TOLERANCIA_DESVIO = 0.05  # Relativa
+TOLERANCIA_ACF1 = 0.05  # Absoluta
+
+
+@pytest.fixture(scope="module")
+def serie_referencia():
+    with open(RUTA_REFERENCIA) as f:
+        referencia = json.load(f)
+    valores = np.asarray(referencia["valores"], dtype=float)
+    fechas = pd.date_range(referencia["inicio"], periods=len(valores), freq="D")
+    return pd.DataFrame({"date": fechas, "value": valores})
+
+
+def test_simulacion_reproduce_estadisticas_mensuales(serie_referencia):
+    modelo = ajustar_modelo(serie_referencia)
+    fechas, escenarios = simular_modelo(modelo, "2024-01-01", "2026-12-31", nsim=200, rng=123)
+
+    observadas = estadisticas_mensuales(serie_referencia["value"], pd.DatetimeIndex(serie_referencia["date"]))
+    simuladas = estadisticas_mensuales(escenarios, fechas)
+    acf1_modelo = [estructura_acs(modelo)[str(mes)][1] for mes in simuladas.index]
+
+    np.testing.assert_allclose(simuladas["media"], observadas["media"], rtol=TOLERANCIA_MEDIA)
+    np.testing.assert_allclose(simuladas["desvio"], observadas["desvio"], rtol=TOLERANCIA_DESVIO)
+    np.testing.assert_allclose(simuladas["acf1"], acf1_modelo, atol=TOLERANCIA_ACF1)
+
+
+def test_ajuste_rechaza_historia_incompleta(serie_referencia):
+    corta = serie_referencia[serie_referencia["date"] < "2015-09-01"]
+    with pytest.raises(ValueError, match=r"temporadas \[9, 10, 11, 12\]"):
+        ajustar_modelo(corta)
+
+
+@pytest.mark.skipif(not os.path.isdir(RUTA_SIMULACIONES_R),
+                    reason="Falta el almacén de R: Rscript tests/datos/generar_simulaciones_r.R")
+def test_paridad_con_r(serie_referencia, tmp_path):
+    modelo = ajustar_modelo(serie_referencia)
+    fechas, escenarios = simular_modelo(modelo, "2024-01-01", "2026-12-31", nsim=200, rng=123)
+    guardar_simulaciones(str(tmp_path), escenarios, fechas)
+
+    tabla = comparar_con_r(RUTA_SIMULACIONES_R, str(tmp_path))
+
+    assert (tabla[("media", "dif_rel")] <= TOLERANCIA_MEDIA).all()
+    assert (tabla[("desvio", "dif_rel")] <= TOLERANCIA_DESVIO).all()
+    np.testing.assert_allclose(tabla[("acf1", "py")], tabla[("acf1", "r")], atol=TOLERANCIA_ACF1)